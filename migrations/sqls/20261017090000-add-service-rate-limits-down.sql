@@ -0,0 +1,2 @@
+ALTER TABLE service_config DROP COLUMN rate_limit;
+ALTER TABLE service_config DROP COLUMN rate_limit_period;
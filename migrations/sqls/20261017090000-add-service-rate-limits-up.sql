@@ -0,0 +1,9 @@
+ALTER TABLE service_config ADD COLUMN rate_limit SMALLINT NOT NULL DEFAULT 1;
+ALTER TABLE service_config ADD COLUMN rate_limit_period INTERVAL NOT NULL DEFAULT INTERVAL '6 seconds';
+
+-- MangaDex
+UPDATE service_config SET rate_limit=5, rate_limit_period=INTERVAL '1 second' WHERE service_id=2;
+-- Comick
+UPDATE service_config SET rate_limit=5, rate_limit_period=INTERVAL '2 seconds' WHERE service_id=10;
+-- KManga
+UPDATE service_config SET rate_limit=1, rate_limit_period=INTERVAL '3 seconds' WHERE service_id=12;
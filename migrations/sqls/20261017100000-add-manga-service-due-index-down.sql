@@ -0,0 +1 @@
+DROP INDEX manga_service_next_update_due_index;
@@ -0,0 +1,2 @@
+-- Used to find the most overdue series of each service
+CREATE INDEX manga_service_next_update_due_index ON manga_service (service_id, next_update NULLS FIRST) WHERE NOT disabled;
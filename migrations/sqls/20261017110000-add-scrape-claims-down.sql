@@ -0,0 +1,2 @@
+ALTER TABLE manga_service DROP COLUMN claimed_until;
+ALTER TABLE service_whole DROP COLUMN claimed_until;
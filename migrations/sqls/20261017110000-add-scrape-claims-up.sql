@@ -0,0 +1,2 @@
+ALTER TABLE manga_service ADD COLUMN claimed_until TIMESTAMP WITH TIME ZONE DEFAULT NULL;
+ALTER TABLE service_whole ADD COLUMN claimed_until TIMESTAMP WITH TIME ZONE DEFAULT NULL;
@@ -0,0 +1 @@
+DROP TABLE scheduler_run_state;
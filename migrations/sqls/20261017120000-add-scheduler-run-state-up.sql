@@ -0,0 +1,9 @@
+-- Single row table shared by all scheduler instances
+CREATE TABLE scheduler_run_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    rerun_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    overlap_count INTEGER NOT NULL DEFAULT 0,
+    last_overlap TIMESTAMP WITH TIME ZONE DEFAULT NULL
+);
+
+INSERT INTO scheduler_run_state DEFAULT VALUES;
@@ -0,0 +1,2 @@
+DROP TRIGGER scheduled_runs_notify ON scheduled_runs;
+DROP FUNCTION notify_scheduled_runs();
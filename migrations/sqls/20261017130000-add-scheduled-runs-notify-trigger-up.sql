@@ -0,0 +1,14 @@
+-- Wakes up the scheduler daemon when scheduled runs are added
+CREATE OR REPLACE FUNCTION notify_scheduled_runs()
+RETURNS TRIGGER AS
+$$
+BEGIN
+    PERFORM pg_notify('scheduled_runs', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER scheduled_runs_notify
+    AFTER INSERT ON scheduled_runs
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_scheduled_runs();
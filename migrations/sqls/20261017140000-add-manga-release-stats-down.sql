@@ -0,0 +1,4 @@
+DROP TRIGGER chapters_release_stats ON chapters;
+DROP FUNCTION update_manga_release_stats();
+DROP FUNCTION rebuild_manga_release_stats(INT[]);
+DROP TABLE manga_release_stats;
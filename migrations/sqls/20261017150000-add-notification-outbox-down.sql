@@ -0,0 +1,3 @@
+DROP TRIGGER chapters_notification_outbox ON chapters;
+DROP FUNCTION add_chapters_to_notification_outbox();
+DROP TABLE notification_outbox;
@@ -0,0 +1,29 @@
+-- Chapters waiting for their notifications to be delivered.
+-- Rows without a notification id are sent to every notification following the manga.
+-- Rows with a notification id are retries of a failed delivery to that notification only.
+CREATE TABLE notification_outbox (
+    outbox_id       BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    chapter_id      BIGINT NOT NULL REFERENCES chapters ON DELETE CASCADE,
+    manga_id        INT NOT NULL,
+    notification_id INT REFERENCES user_notifications ON DELETE CASCADE,
+    attempts        INT NOT NULL DEFAULT 0,
+    next_attempt    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX notification_outbox_next_attempt_index ON notification_outbox (next_attempt);
+
+-- New chapters are added to the outbox in the same transaction that inserts them
+CREATE OR REPLACE FUNCTION add_chapters_to_notification_outbox()
+RETURNS TRIGGER AS
+$$
+BEGIN
+    INSERT INTO notification_outbox (chapter_id, manga_id)
+    SELECT chapter_id, manga_id FROM new_chapters;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chapters_notification_outbox
+    AFTER INSERT ON chapters
+    REFERENCING NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION add_chapters_to_notification_outbox();
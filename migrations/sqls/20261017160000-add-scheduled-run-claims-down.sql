@@ -0,0 +1 @@
+ALTER TABLE scheduled_runs DROP COLUMN claimed_until;
@@ -0,0 +1 @@
+ALTER TABLE scheduled_runs ADD COLUMN claimed_until TIMESTAMP WITH TIME ZONE DEFAULT NULL;
@@ -0,0 +1,100 @@
+DROP TRIGGER chapters_release_stats_update ON chapters;
+DROP TRIGGER chapters_release_stats_delete ON chapters;
+DROP FUNCTION mark_updated_release_stats_stale();
+DROP FUNCTION mark_deleted_release_stats_stale();
+
+CREATE OR REPLACE FUNCTION rebuild_manga_release_stats(manga_ids INT[])
+RETURNS VOID AS
+$$
+    DELETE FROM manga_release_stats WHERE manga_id = ANY(manga_ids);
+
+    INSERT INTO manga_release_stats (manga_id, last_chapter_number, last_release_date, recent_intervals)
+    SELECT
+        manga_id,
+        MAX(chapter_number),
+        (ARRAY_AGG(release_date ORDER BY chapter_number DESC))[1],
+        COALESCE(
+            ARRAY_AGG(newer_release_date - release_date ORDER BY chapter_number) FILTER (WHERE newer_release_date IS NOT NULL),
+            '{}'
+        )
+    FROM (
+        SELECT
+            *,
+            -- A gap of over 2 chapters ends the run of consecutive chapters
+            COUNT(*) FILTER (WHERE newer_chapter_number - chapter_number > 2)
+                OVER (PARTITION BY manga_id ORDER BY chapter_number DESC) AS gaps
+        FROM (
+            SELECT
+                manga_id,
+                chapter_number,
+                release_date,
+                LAG(chapter_number) OVER w AS newer_chapter_number,
+                LAG(release_date) OVER w AS newer_release_date,
+                ROW_NUMBER() OVER w AS rn
+            FROM (
+                SELECT manga_id, chapter_number, MIN(release_date) AS release_date
+                FROM chapters
+                WHERE manga_id = ANY(manga_ids) AND chapter_decimal IS NULL AND release_date IS NOT NULL
+                GROUP BY manga_id, chapter_number
+            ) grouped
+            WINDOW w AS (PARTITION BY manga_id ORDER BY chapter_number DESC)
+        ) latest
+        WHERE rn <= 30
+    ) consecutive
+    WHERE gaps = 0
+    GROUP BY manga_id;
+$$ LANGUAGE sql;
+
+-- Updates the statistics in constant time when a chapter is added
+CREATE OR REPLACE FUNCTION update_manga_release_stats()
+RETURNS TRIGGER AS
+$$
+DECLARE
+    stats manga_release_stats%ROWTYPE;
+    intervals INTERVAL[];
+    last_idx INT;
+BEGIN
+    SELECT * INTO stats FROM manga_release_stats WHERE manga_id = NEW.manga_id FOR UPDATE;
+
+    IF NOT FOUND THEN
+        INSERT INTO manga_release_stats (manga_id, last_chapter_number, last_release_date)
+        VALUES (NEW.manga_id, NEW.chapter_number, NEW.release_date)
+        ON CONFLICT (manga_id) DO NOTHING;
+        RETURN NULL;
+    END IF;
+
+    intervals := stats.recent_intervals;
+    last_idx := cardinality(intervals);
+
+    IF NEW.chapter_number = stats.last_chapter_number THEN
+        -- The same chapter released again uses the earliest release date
+        IF NEW.release_date >= stats.last_release_date THEN
+            RETURN NULL;
+        END IF;
+
+        IF last_idx > 0 THEN
+            intervals[last_idx] := intervals[last_idx] - (stats.last_release_date - NEW.release_date);
+        END IF;
+    ELSIF NEW.chapter_number > stats.last_chapter_number THEN
+        IF NEW.chapter_number - stats.last_chapter_number > 2 THEN
+            intervals := '{}';
+        ELSE
+            intervals := intervals || (NEW.release_date - stats.last_release_date);
+            intervals := intervals[GREATEST(1, cardinality(intervals) - 28):];
+        END IF;
+    ELSE
+        -- Older chapters require rebuilding the statistics
+        RETURN NULL;
+    END IF;
+
+    UPDATE manga_release_stats
+    SET last_chapter_number = NEW.chapter_number,
+        last_release_date = NEW.release_date,
+        recent_intervals = intervals
+    WHERE manga_id = NEW.manga_id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE manga_release_stats DROP COLUMN stale;
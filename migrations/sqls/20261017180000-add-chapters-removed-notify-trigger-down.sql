@@ -0,0 +1,4 @@
+DROP TRIGGER chapters_removed_notify_update ON chapters;
+DROP TRIGGER chapters_removed_notify_delete ON chapters;
+DROP FUNCTION notify_updated_chapters();
+DROP FUNCTION notify_deleted_chapters();
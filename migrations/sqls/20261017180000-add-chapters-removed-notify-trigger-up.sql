@@ -0,0 +1,41 @@
+-- Tells the scheduler daemon which services had chapter identifiers removed,
+-- so that it can drop its cache of known chapter identifiers of those services
+CREATE OR REPLACE FUNCTION notify_deleted_chapters()
+RETURNS TRIGGER AS
+$$
+BEGIN
+    PERFORM pg_notify('chapters_removed', service_id::text)
+    FROM (SELECT DISTINCT service_id FROM old_chapters) s;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_updated_chapters()
+RETURNS TRIGGER AS
+$$
+BEGIN
+    PERFORM pg_notify('chapters_removed', service_id::text)
+    FROM (
+        SELECT DISTINCT o.service_id
+        FROM old_chapters o
+        INNER JOIN new_chapters n ON n.chapter_id = o.chapter_id
+        WHERE o.chapter_identifier IS DISTINCT FROM n.chapter_identifier
+           OR o.service_id IS DISTINCT FROM n.service_id
+    ) s;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chapters_removed_notify_delete
+    AFTER DELETE ON chapters
+    REFERENCING OLD TABLE AS old_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_deleted_chapters();
+
+CREATE TRIGGER chapters_removed_notify_update
+    AFTER UPDATE ON chapters
+    REFERENCING OLD TABLE AS old_chapters NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_updated_chapters();
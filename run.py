@@ -1,11 +1,33 @@
 import os
+import signal
+from argparse import ArgumentParser
+from types import FrameType
 
 import sentry_sdk
 
 from src import setup_logging
+from src.run_guard import RunOverlapPolicy
 from src.scheduler import UpdateScheduler
 from src.utils.utilities import utcnow
 
+parser = ArgumentParser()
+parser.add_argument(
+    '--daemon',
+    '-d',
+    action='store_true',
+    help='Keep running and sleep until the next update instead of running once',
+)
+parser.add_argument(
+    '--overlap-policy',
+    type=RunOverlapPolicy,
+    choices=list(RunOverlapPolicy),
+    default=RunOverlapPolicy.COALESCE,
+    help='What to do when another instance is already running. '
+         'Use concurrent when several workers share the backlog',
+)
+
+args = parser.parse_args()
+
 logger = setup_logging.setup()
 
 if 'SENTRY_URL' in os.environ:
@@ -16,12 +38,26 @@ if 'SENTRY_URL' in os.environ:
 else:
     logger.info('Skipping sentry initialization')
 
-scheduler = UpdateScheduler()
-try:
-    logger.debug('Next update in %s', scheduler.run_once()-utcnow())
-except Exception:
-    logger.exception('Failed to run once')
+scheduler = UpdateScheduler(args.overlap_policy)
+
+if args.daemon:
+    def handle_stop(signum: int, _frame: FrameType | None) -> None:
+        logger.info('Received signal %s. Stopping after the current run', signum)
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    scheduler.run_forever()
+else:
+    try:
+        next_update = scheduler.run_guarded()
+        if next_update is None:
+            logger.info('Did not run as another instance is already running')
+        else:
+            logger.debug('Next update in %s', next_update-utcnow())
+    except Exception:
+        logger.exception('Failed to run once')
 
-scheduler.es.close()
-scheduler.pool.close()
+scheduler.close()
 sentry_sdk.flush()
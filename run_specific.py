@@ -15,5 +15,4 @@ setup_logging.setup()
 scheduler = UpdateScheduler()
 scheduler.force_run(args.service, args.manga)
 
-scheduler.es.close()
-scheduler.pool.close()
+scheduler.close()
@@ -0,0 +1,113 @@
+import math
+import threading
+from collections.abc import Sequence
+from datetime import timedelta
+
+from src.db.models.services import ServiceConfig
+
+
+class BatchPlanner:
+    """
+    Decides how many series of each service are scraped in a single run.
+    Batch sizes are based on the amount of overdue series, the rate limit of the service,
+    the measured time it takes to scrape a single series and the time until the next run.
+    """
+
+    MIN_BATCH_SIZE = 1
+    MAX_BATCH_SIZE = 100
+
+    DEFAULT_LATENCY = timedelta(seconds=5)
+    """Assumed scrape time of a single series when no measurements exist for the service"""
+
+    LATENCY_SMOOTHING = 0.3
+    """Weight of the latest measurement in the exponential moving average of scrape latencies"""
+
+    def __init__(self) -> None:
+        self._latencies: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def record_latency(self, service_id: int, latency: timedelta) -> None:
+        """
+        Records how long it took to scrape a single series of the given service
+        """
+        seconds = latency.total_seconds()
+        with self._lock:
+            previous = self._latencies.get(service_id)
+            if previous is None:
+                self._latencies[service_id] = seconds
+            else:
+                self._latencies[service_id] = (
+                    self.LATENCY_SMOOTHING * seconds + (1 - self.LATENCY_SMOOTHING) * previous
+                )
+
+    def get_latency(self, service_id: int) -> timedelta:
+        with self._lock:
+            latency = self._latencies.get(service_id)
+
+        if latency is None:
+            return self.DEFAULT_LATENCY
+
+        return timedelta(seconds=latency)
+
+    def time_per_series(self, config: ServiceConfig) -> timedelta:
+        """
+        Expected time between the starts of two series scrapes of the service.
+        Series are scraped one after another, and the rate limit of the service
+        also limits how often a new scrape can be started.
+        """
+        rate_limit_interval = config.rate_limit_period / max(config.rate_limit, 1)
+        return max(self.get_latency(config.service_id), rate_limit_interval)
+
+    def batch_sizes(
+        self,
+        services: Sequence[tuple[ServiceConfig, int]],
+        time_budget: timedelta,
+        workers: int,
+    ) -> list[int]:
+        """
+        Get the amount of series to scrape from each service in this run.
+        Series of a service are scraped one after another, so a single service can scrape
+        at most the series that fit in the time budget. All services share the given workers,
+        and the worker time of the run is divided evenly between the services.
+        Worker time left unused by services with small backlogs is given to the others.
+
+        Args:
+            services: Config of each service and the amount of its series that are due for an update
+            time_budget: Expected time until the next run starts
+            workers: How many series can be scraped at the same time by all services together
+
+        Returns:
+            The batch sizes in the same order as the services
+        """
+        sizes = [0] * len(services)
+        wall_capacities: list[int] = []
+        for config, backlog in services:
+            capacity = math.floor(time_budget / self.time_per_series(config))
+            wall_capacities.append(min(backlog, capacity))
+
+        worker_time = time_budget * max(workers, 1)
+
+        def needed_time(idx: int) -> timedelta:
+            return self.get_latency(services[idx][0].service_id) * wall_capacities[idx]
+
+        # Services needing the least worker time are sized first,
+        # so that the time they do not use is divided between the rest
+        order = sorted(range(len(services)), key=needed_time)
+        remaining = len(order)
+        for idx in order:
+            config, backlog = services[idx]
+            share = max(worker_time / remaining, timedelta())
+            remaining -= 1
+            if backlog <= 0:
+                continue
+
+            latency = self.get_latency(config.service_id)
+            capacity = wall_capacities[idx]
+            if latency > timedelta():
+                capacity = min(capacity, math.floor(share / latency))
+
+            size = min(max(capacity, self.MIN_BATCH_SIZE), self.MAX_BATCH_SIZE, backlog)
+            sizes[idx] = size
+            worker_time -= latency * size
+
+        return sizes
@@ -34,6 +34,14 @@ class UserNotification(NotificationOptions):
     created: datetime
 
 
+class NotificationOutboxEntry(BaseModel):
+    outbox_id: int
+    chapter_id: int
+    manga_id: int
+    notification_id: int | None = None
+    attempts: int
+
+
 class NotificationField(BaseModel):
     field_id: int
     notification_type: NotificationType
@@ -28,3 +28,6 @@ class ServiceConfig(BaseModel):
     scheduled_run_limit: int = 5
     scheduled_runs_enabled: bool = True
     scheduled_run_min_interval: timedelta = timedelta(hours=1)
+    rate_limit: int = 1
+    """How many requests can be made to the service within rate_limit_period"""
+    rate_limit_period: timedelta = timedelta(seconds=6)
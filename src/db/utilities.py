@@ -57,7 +57,10 @@ def execute_values[T](
     """
     Execute multiple values in a VALUES statement.
     Unlike psycopg2 execute_values, this requires syntax like this "VALUES (%s)".
-    This is to make it play nicer with syntax checkers
+    This is to make it play nicer with syntax checkers.
+
+    The sql depends on the amount of values, so statements that are executed often
+    with many rows should pass the values as arrays with "unnest(%s::int[], ...)" instead.
     Args:
         cur: Cursor object
         sql: The sql statement with a single "VALUES %s"
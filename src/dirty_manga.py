@@ -0,0 +1,219 @@
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from src.utils.dbutils import CursorType, DbUtil
+from src.utils.utilities import utcnow
+
+logger = logging.getLogger(__name__)
+
+type MangaServiceKey = tuple[int, int]
+"""(service_id, manga_id) pair identifying a manga_service row"""
+
+
+class DirtyManga:
+    """
+    Run scoped collection of pending manga, manga_service and services updates.
+    Series scraped during a run only mark what needs updating and the updates are
+    written with a few set based statements when flushed, instead of updating
+    the same rows separately for every series. Repeated updates of the same row
+    are coalesced, so each row is written at most once per flush.
+    Thread safe as series are scraped concurrently.
+    """
+
+    NEXT_UPDATE_MARGIN = timedelta(minutes=10)
+    """Added to the calculated next updates so that the release is likely out when the series is checked"""
+
+    FLUSH_INTERVAL = timedelta(minutes=1)
+    """How often flush_if_due writes the collected updates during a run"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Held while writing, so that an older flush cannot overwrite the values of a newer one
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._release_manga_ids: set[int] = set()
+        self._interval_manga_ids: set[int] = set()
+        self._latest_chapters: dict[int, tuple[int, datetime]] = {}
+        self._last_checked: dict[MangaServiceKey, datetime] = {}
+        self._next_updates: dict[MangaServiceKey, datetime] = {}
+        self._scheduled: dict[MangaServiceKey, timedelta] = {}
+        self._services_checked: dict[int, tuple[datetime, datetime]] = {}
+        self._released_claims: set[MangaServiceKey] = set()
+        self._disabled: set[MangaServiceKey] = set()
+
+    def mark_updated(self, manga_ids: Iterable[int]) -> None:
+        """
+        Marks manga that got new chapters. Their latest release and release interval are recalculated.
+        """
+        with self._lock:
+            self._release_manga_ids.update(manga_ids)
+            self._interval_manga_ids.update(manga_ids)
+
+    def add_latest_chapters(self, data: Iterable[tuple[int, int, datetime]]) -> None:
+        """
+        Args:
+            data: iterable of tuples [manga_id, latest_chapter, release_date]
+                like DbUtil.update_latest_chapter takes
+        """
+        with self._lock:
+            for manga_id, chapter_number, release_date in data:
+                current = self._latest_chapters.get(manga_id)
+                if current is None or current[0] < chapter_number:
+                    self._latest_chapters[manga_id] = (chapter_number, release_date)
+
+    def set_last_checked(self, service_id: int, manga_id: int, last_checked: datetime) -> None:
+        with self._lock:
+            self._last_checked[(service_id, manga_id)] = last_checked
+
+    def set_next_update(self, service_id: int, manga_id: int, next_update: datetime) -> None:
+        with self._lock:
+            self._scheduled.pop((service_id, manga_id), None)
+            self._next_updates[(service_id, manga_id)] = next_update
+
+    def set_service_checked(
+        self, service_id: int, last_check: datetime, disabled_until: datetime
+    ) -> None:
+        with self._lock:
+            self._services_checked[service_id] = (last_check, disabled_until)
+
+    def release_claims(self, service_id: int, manga_ids: Iterable[int]) -> None:
+        """
+        Releases the scheduler claims of the given series when flushing.
+        The claims are released in the same statement that writes the next updates,
+        so other workers never see the scraped series as due and unclaimed.
+        """
+        with self._lock:
+            self._released_claims.update((service_id, manga_id) for manga_id in manga_ids)
+
+    def disable(self, service_id: int, manga_id: int) -> None:
+        """
+        Disables automatic updates of the series when flushing
+        """
+        with self._lock:
+            self._disabled.add((service_id, manga_id))
+
+    def schedule_next_update(
+        self, service_id: int, manga_id: int, min_update_interval: timedelta
+    ) -> None:
+        """
+        Sets the next update of the series based on the release schedule of the manga.
+        The schedule is calculated when flushing, after the latest release has been updated.
+
+        Args:
+            min_update_interval: Minimum time until the next update when the expected release is late
+        """
+        with self._lock:
+            self._next_updates.pop((service_id, manga_id), None)
+            self._scheduled[(service_id, manga_id)] = min_update_interval
+            self._release_manga_ids.add(manga_id)
+
+    @staticmethod
+    def calculate_next_update(
+        latest_release: datetime,
+        release_interval: timedelta,
+        min_update_interval: timedelta,
+        now: datetime,
+    ) -> datetime:
+        next_date = latest_release + release_interval
+
+        if latest_release < now:
+            # If the expected update did not happen yet, postpone it slightly.
+            # This prevents the same manga from not being updated for a long time
+            # in case the update is done a bit later.
+            if (next_date - now) < timedelta(days=3):
+                next_date = now + max(min_update_interval, timedelta(hours=6))
+            else:
+                # Default to the release interval multiplied until it is after the current time.
+                interval_multiplier = math.ceil((now - latest_release) / release_interval)
+                next_date = latest_release + release_interval * interval_multiplier
+
+        return next_date
+
+    def flush_if_due(self, dbutil: DbUtil) -> None:
+        """
+        Flushes the collected updates if FLUSH_INTERVAL has passed since the last flush.
+        Must be called between transactions of the given connection.
+        """
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL.total_seconds():
+            self.flush(dbutil)
+
+    def flush(self, dbutil: DbUtil) -> None:
+        """
+        Writes the collected updates in a single transaction and clears them.
+        The updates are done in dependency order. Latest chapters and releases are updated first,
+        so that the release intervals and next updates are calculated from the new data.
+        """
+        with self._flush_lock:
+            with self._lock:
+                release_manga_ids = self._release_manga_ids
+                interval_manga_ids = self._interval_manga_ids
+                latest_chapters = self._latest_chapters
+                last_checked = self._last_checked
+                next_updates = self._next_updates
+                scheduled = self._scheduled
+                services_checked = self._services_checked
+                released_claims = self._released_claims
+                disabled = self._disabled
+
+                self._release_manga_ids = set()
+                self._interval_manga_ids = set()
+                self._latest_chapters = {}
+                self._last_checked = {}
+                self._next_updates = {}
+                self._scheduled = {}
+                self._services_checked = {}
+                self._released_claims = set()
+                self._disabled = set()
+                self._last_flush = time.monotonic()
+
+            with dbutil.conn.transaction(), dbutil.conn.cursor() as cur:
+                dbutil.update_latest_chapter(
+                    [(manga_id, *chapter) for manga_id, chapter in latest_chapters.items()], cur=cur
+                )
+
+                if release_manga_ids:
+                    dbutil.update_latest_release(list(release_manga_ids), cur=cur)
+
+                if interval_manga_ids:
+                    logger.debug(f'Updating interval of {len(interval_manga_ids)} manga')
+                    dbutil.update_chapter_intervals(interval_manga_ids, cur=cur)
+
+                if scheduled:
+                    next_updates.update(self._calculate_scheduled(dbutil, scheduled, cur=cur))
+
+                # All columns and the claim release are written with a single row update
+                dbutil.update_manga_service_checks(
+                    [
+                        (*key, last_checked.get(key), next_updates.get(key), key in disabled, key in released_claims)
+                        for key in sorted(last_checked.keys() | next_updates.keys() | disabled | released_claims)
+                    ],
+                    cur=cur,
+                )
+                dbutil.update_services_checked(
+                    [(service_id, *checked) for service_id, checked in sorted(services_checked.items())],
+                    cur=cur,
+                )
+
+    def _calculate_scheduled(
+        self, dbutil: DbUtil, scheduled: dict[MangaServiceKey, timedelta], *, cur: CursorType
+    ) -> dict[MangaServiceKey, datetime]:
+        schedules = dbutil.get_release_schedules({manga_id for _, manga_id in scheduled}, cur=cur)
+        now = utcnow()
+        next_updates: dict[MangaServiceKey, datetime] = {}
+
+        for (service_id, manga_id), min_update_interval in scheduled.items():
+            latest_release, release_interval = schedules.get(manga_id, (None, None))
+            if latest_release is None or release_interval is None:
+                logger.warning(f'Cannot schedule manga {manga_id} on service {service_id} without a release schedule')
+                next_updates[(service_id, manga_id)] = now + min_update_interval
+                continue
+
+            next_date = self.calculate_next_update(latest_release, release_interval, min_update_interval, now)
+            logger.info(f'Next update for manga {manga_id} on service {service_id} is {next_date}')
+            next_updates[(service_id, manga_id)] = next_date + self.NEXT_UPDATE_MARGIN
+
+        return next_updates
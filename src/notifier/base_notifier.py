@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 from itertools import groupby
 from string import Template
 from typing import Any, Self, TypeVar
@@ -7,6 +8,7 @@ from typing import Any, Self, TypeVar
 from pydantic import BaseModel
 
 from src.db.models.notifications import InputField, NotificationOptions
+from src.utils.utilities import utcnow
 
 T = TypeVar('T', str, str | None)
 TEmbedInputs = TypeVar('TEmbedInputs')
@@ -91,6 +93,27 @@ class NotificationChapter(BaseModel):
         }
 
 
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses the value of a Retry-After header
+
+    Returns:
+        The amount of seconds to wait or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        return max((parsedate_to_datetime(value) - utcnow()).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
 def get_manga_id(chapter: NotificationChapter) -> int:
     return chapter.manga.manga_id
 
@@ -103,6 +103,8 @@ class DiscordEmbedWebhookNotifier(NotifierBase):
                     username=username,  # noqa: B023 Function is only called inside this loop
                     avatar_url=embed_inputs.avatar_url,  # noqa: B023
                     timeout=10,
+                    # Waits for the time given by discord when rate limited
+                    rate_limit_retry=True,
                 )
 
             for i in range(0, len(embeds), WebhookLimits.EMBEDS):
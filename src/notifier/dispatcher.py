@@ -0,0 +1,106 @@
+import logging
+import threading
+from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from src.db.models.notifications import InputField, UserNotification
+from src.notifier.base_notifier import NotificationChapter, NotifierBase
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationJob(NamedTuple):
+    notifier: NotifierBase
+    chapters: list[NotificationChapter]
+    notification: UserNotification
+    input_fields: list[InputField]
+
+
+class NotificationResult(NamedTuple):
+    notification_id: int
+    sent: int
+    success: bool
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications concurrently.
+    Notifications to the same destination are sent one after another in the given order.
+    Different destinations are sent in parallel, but only a limited amount of
+    destinations on the same host are sent to at the same time.
+    Rate limits of a single destination, like discord webhook buckets,
+    are handled by the notifiers by waiting for the time given by the server.
+    """
+
+    MAX_WORKERS = 8
+    """How many destinations are sent to at the same time"""
+
+    MAX_PER_HOST = 4
+    """How many destinations on a single host are sent to at the same time"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_per_host: int = MAX_PER_HOST):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='notification-dispatch'
+        )
+        self._max_per_host = max_per_host
+        self._host_limits: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    @contextmanager
+    def _host_limit(self, destination: str) -> Generator[None]:
+        host = urlsplit(destination).hostname or ''
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self._max_per_host)
+                self._host_limits[host] = limit
+
+        with limit:
+            yield
+
+    def dispatch(self, jobs: Iterable[NotificationJob]) -> list[NotificationResult]:
+        """
+        Sends the given notifications and waits for all of them to finish
+
+        Returns:
+            The results of the notifications grouped by destination
+        """
+        by_destination: dict[str, list[NotificationJob]] = {}
+        for job in jobs:
+            by_destination.setdefault(job.notification.destination, []).append(job)
+
+        futures = [
+            self._executor.submit(self._send_in_order, destination, destination_jobs)
+            for destination, destination_jobs in by_destination.items()
+        ]
+
+        results: list[NotificationResult] = []
+        for future in futures:
+            results.extend(future.result())
+
+        return results
+
+    def _send_in_order(
+        self, destination: str, jobs: list[NotificationJob]
+    ) -> list[NotificationResult]:
+        with self._host_limit(destination):
+            return [self._send(job) for job in jobs]
+
+    @staticmethod
+    def _send(job: NotificationJob) -> NotificationResult:
+        try:
+            sent, success = job.notifier.send_notification(
+                job.chapters, job.notification, job.input_fields
+            )
+        except Exception:
+            logger.exception('Failed to send notification')
+            sent = 0
+            success = False
+
+        return NotificationResult(job.notification.notification_id, sent, success)
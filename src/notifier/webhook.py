@@ -1,12 +1,18 @@
 import json
 import logging
+import time
 from typing import override
 
 import requests
 from pydantic import Field
 
 from src.db.models.notifications import InputField, NotificationOptions
-from src.notifier.base_notifier import BaseEmbedInputs, NotificationChapter, NotifierBase
+from src.notifier.base_notifier import (
+    BaseEmbedInputs,
+    NotificationChapter,
+    NotifierBase,
+    parse_retry_after,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +29,12 @@ class JsonFields:
 class WebhookNotifier(NotifierBase):
     MAX_DEPTH = 5
 
+    MAX_RETRIES = 3
+    """How many times a rate limited request is retried"""
+
+    MAX_RETRY_AFTER = 60
+    """Rate limited requests that should be retried later than this many seconds are not retried"""
+
     def format_dict(self, d: dict, chapter: NotificationChapter, depth: int = 0) -> dict:
         """
         Recursively formats all strings in the dict with the given chapter
@@ -60,6 +72,25 @@ class WebhookNotifier(NotifierBase):
 
         return data
 
+    def post(self, url: str, data: dict) -> requests.Response:
+        """
+        Posts the data to the url. Retries rate limited requests after the time given in the Retry-After header.
+        """
+        r = requests.post(url, json=data, timeout=10)
+        for _ in range(self.MAX_RETRIES):
+            if r.status_code != 429:
+                break
+
+            retry_after = parse_retry_after(r.headers.get('Retry-After'))
+            if retry_after is None or retry_after > self.MAX_RETRY_AFTER:
+                break
+
+            logger.info(f'Rate limited by {url}. Retrying after {retry_after} seconds')
+            time.sleep(retry_after)
+            r = requests.post(url, json=data, timeout=10)
+
+        return r
+
     @override
     def send_notification(
         self,
@@ -84,7 +115,7 @@ class WebhookNotifier(NotifierBase):
             data[chapters_array_key] = chapters_array
 
             try:
-                r = requests.post(options.destination, json=data)
+                r = self.post(options.destination, data)
                 times_executed += 1
                 if not r.ok:
                     return times_executed, False
@@ -0,0 +1,132 @@
+import logging
+from collections.abc import Callable
+from enum import StrEnum
+
+from psycopg import Connection
+from psycopg.rows import DictRow
+from psycopg_pool import ConnectionPool
+
+from src.utils.utilities import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class RunOverlapPolicy(StrEnum):
+    SKIP = 'skip'
+    """Exit without running when another instance is already running"""
+
+    WAIT = 'wait'
+    """Wait for the running instance to finish and run after it"""
+
+    COALESCE = 'coalesce'
+    """Ask the running instance to run once more after it finishes and exit"""
+
+    CONCURRENT = 'concurrent'
+    """
+    Run without taking the run lock. Used when several workers share the backlog,
+    as the series and services claimed by each run already prevent double scraping.
+    """
+
+
+class RunGuard:
+    """
+    Prevents scheduler runs from overlapping across all instances connected to the same database.
+    A run holds a session level advisory lock for its whole duration.
+    Overlapping runs are handled according to the policy and counted in the scheduler_run_state table.
+    The lock allows only one run in the whole deployment at a time, so setups with
+    several workers must use the concurrent policy to scrape in parallel.
+    """
+
+    LOCK_KEY = 0x6D616E6761_7472
+    """Advisory lock key used for scheduler runs"""
+
+    def __init__(self, pool: ConnectionPool[Connection[DictRow]], policy: RunOverlapPolicy):
+        self.pool = pool
+        self.policy = policy
+
+    def run[T](self, fn: Callable[[], T]) -> T | None:
+        """
+        Runs the given function while holding the run lock.
+        With the coalesce policy the function is called again
+        if other instances requested a run while it was running.
+
+        Returns:
+            The return value of the last call or None if the run was not done by this instance
+        """
+        if self.policy == RunOverlapPolicy.CONCURRENT:
+            return fn()
+
+        with self.pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                if not self._acquire(conn):
+                    return None
+
+                while True:
+                    try:
+                        retval = fn()
+                    finally:
+                        self._unlock(conn)
+
+                    # The request is checked only after unlocking. Otherwise a request made between
+                    # the check and the unlock would be lost as the requester could not take the lock.
+                    if not self._pop_rerun_request(conn) or not self._try_lock(conn):
+                        return retval
+
+                    logger.info('Running again for runs coalesced into this one')
+            finally:
+                conn.autocommit = False
+
+    def _acquire(self, conn: Connection[DictRow]) -> bool:
+        if self._try_lock(conn):
+            self._pop_rerun_request(conn)
+            return True
+
+        overlaps = self._record_overlap(conn)
+        logger.warning(
+            'Scheduler run overlapped with a running instance. Policy: %s, overlaps in total: %s',
+            self.policy, overlaps
+        )
+
+        match self.policy:
+            case RunOverlapPolicy.SKIP:
+                return False
+
+            case RunOverlapPolicy.WAIT:
+                start = utcnow()
+                conn.execute('SELECT pg_advisory_lock(%s)', (self.LOCK_KEY,))
+                logger.info('Waited %s for the running instance to finish', utcnow() - start)
+                self._pop_rerun_request(conn)
+                return True
+
+            case RunOverlapPolicy.COALESCE:
+                # The running instance might have finished before it saw the request
+                if self._try_lock(conn):
+                    self._pop_rerun_request(conn)
+                    return True
+
+                logger.info('Coalesced run into the running instance')
+                return False
+
+            case RunOverlapPolicy.CONCURRENT:
+                raise ValueError('Concurrent runs do not take the run lock')
+
+    def _try_lock(self, conn: Connection[DictRow]) -> bool:
+        row = conn.execute('SELECT pg_try_advisory_lock(%s) AS locked', (self.LOCK_KEY,)).fetchone()
+        return row is not None and row['locked']
+
+    def _unlock(self, conn: Connection[DictRow]) -> None:
+        conn.execute('SELECT pg_advisory_unlock(%s)', (self.LOCK_KEY,))
+
+    def _record_overlap(self, conn: Connection[DictRow]) -> int:
+        sql = """
+            UPDATE scheduler_run_state
+            SET overlap_count=overlap_count + 1, last_overlap=NOW(), rerun_requested=rerun_requested OR %s
+            RETURNING overlap_count
+        """
+        row = conn.execute(sql, (self.policy == RunOverlapPolicy.COALESCE,)).fetchone()
+        return row['overlap_count'] if row else 0
+
+    def _pop_rerun_request(self, conn: Connection[DictRow]) -> bool:
+        sql = 'UPDATE scheduler_run_state SET rerun_requested=FALSE WHERE rerun_requested RETURNING id'
+        return conn.execute(sql).fetchone() is not None
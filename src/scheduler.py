@@ -1,12 +1,12 @@
+import asyncio
 import inspect
 import logging
-import math
 import os
-import random
+import threading
 import time
 from collections import Counter
 from collections.abc import Collection, Generator
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from itertools import groupby
@@ -18,19 +18,26 @@ import psycopg
 import psycopg.rows
 from psycopg import Connection
 from psycopg.abc import Params, Query, QueryNoTemplate
+from psycopg.conninfo import make_conninfo
 from psycopg.cursor import Cursor
-from psycopg.rows import DictRow
+from psycopg.rows import DictRow, TupleRow
 from psycopg_pool import ConnectionPool
 
 from elasticsearch import Elasticsearch
+from src.batch_planner import BatchPlanner
 from src.db.mappers.notifications_mapper import NotificationsMapper
 from src.db.models.chapter import Chapter
+from src.db.models.notifications import NotificationOutboxEntry
+from src.dirty_manga import DirtyManga
 from src.elasticsearch.configuration import get_client
 from src.elasticsearch.methods import ElasticMethods
 from src.notifier import NOTIFIERS
+from src.notifier.dispatcher import NotificationDispatcher, NotificationJob
+from src.run_guard import RunGuard, RunOverlapPolicy
 from src.scrapers import SCRAPERS, SCRAPERS_ID
 from src.scrapers.base_scraper import BaseScraper
 from src.utils.dbutils import DbUtil
+from src.utils.known_chapters import clear_known_chapters, set_known_chapters_enabled
 from src.utils.utilities import inject_service_values, utcnow
 
 logger = logging.getLogger(__name__)
@@ -85,28 +92,108 @@ class LoggingCursor(Cursor[DictRow]):
 class UpdateScheduler:
     MAX_POOLS = 5
 
-    def __init__(self) -> None:
-        config = {
-            'host':        os.environ['DB_HOST'],
-            'dbname':      os.environ['DB_NAME'],
-            'user':        os.environ['DB_USER'],
-            'password':    os.environ['DB_PASSWORD'],
-            'port':        os.environ['DB_PORT'],
-            'row_factory': psycopg.rows.dict_row,
-        }
+    MAX_SERVICE_WORKERS = 3
+    """How many whole services can be scraped concurrently. Each one uses its own connection"""
+
+    SCRAPE_WORKERS = MAX_POOLS - 1
+    """How many series can be scraped concurrently. Shared by all per series batches and scheduled runs"""
+
+    RUN_INTERVAL = timedelta(minutes=1)
+    """
+    Expected time between two runs started by a timer. Matches the example systemd timer.
+    Batch sizes are selected so that the per series scrapes are done before the next run.
+    """
+
+    CLAIM_LEASE = timedelta(minutes=30)
+    """
+    How long claimed series, services and scheduled runs are reserved for this worker.
+    Claims are normally released after scraping. The lease only matters if the worker dies.
+    """
+
+    SCHEDULED_RUNS_CHANNEL: LiteralString = 'scheduled_runs'
+    """Channel notified by the database when scheduled runs are added"""
+
+    CHAPTERS_REMOVED_CHANNEL: LiteralString = 'chapters_removed'
+    """Channel notified by the database with the service id when chapters are deleted or their identifiers change"""
+
+    SCHEDULED_RUN_DEBOUNCE = timedelta(seconds=1)
+    """How long to wait for more scheduled runs after a notification before running them"""
+
+    LISTEN_TIMEOUT = timedelta(seconds=5)
+    """How often the scheduled run listener checks if the scheduler has been stopped"""
+
+    NOTIFICATION_BATCH_SIZE = 500
+    """How many notification outbox entries are delivered at once"""
+
+    NOTIFICATION_LEASE = timedelta(minutes=10)
+    """
+    How long claimed notification outbox entries are reserved for the delivering worker.
+    Entries are deleted after delivery. The lease only matters if the worker dies.
+    """
+
+    NOTIFICATION_MAX_ATTEMPTS = 5
+    """How many times a notification is tried before it is dropped"""
+
+    NOTIFICATION_RETRY_DELAY = timedelta(minutes=1)
+    """Delay before the first retry of a failed notification. Doubled on every retry."""
+
+    NOTIFICATION_MAX_RETRY_DELAY = timedelta(hours=1)
+    """Maximum delay between retries of a failed notification"""
+
+    MIN_SLEEP = timedelta(seconds=5)
+    """Minimum time slept between two runs in daemon mode"""
+
+    MAX_SLEEP = timedelta(minutes=5)
+    """
+    Maximum time slept between two runs in daemon mode.
+    Limits the delay of scheduled runs and changes made directly to the database.
+    """
+
+    def __init__(self, overlap_policy: RunOverlapPolicy = RunOverlapPolicy.COALESCE) -> None:
+        self._conninfo = make_conninfo(
+            host=os.environ['DB_HOST'],
+            dbname=os.environ['DB_NAME'],
+            user=os.environ['DB_USER'],
+            password=os.environ['DB_PASSWORD'],
+            port=os.environ['DB_PORT'],
+        )
 
         self.pool = ConnectionPool[Connection[DictRow]](
+            self._conninfo,
             connection_class=Connection[DictRow],
             min_size=1,
-            max_size=self.MAX_POOLS,
-            kwargs=config,
+            # Extra connections hold the run lock and send notifications
+            max_size=self.MAX_POOLS + self.MAX_SERVICE_WORKERS + 2,
+            kwargs={'row_factory': psycopg.rows.dict_row},
             open=True,
         )
-        self.thread_pool = ThreadPoolExecutor(max_workers=self.MAX_POOLS - 1)
+        self.thread_pool = ThreadPoolExecutor(
+            max_workers=self.MAX_SERVICE_WORKERS, thread_name_prefix='service-scraper'
+        )
+        # Notifications are delivered from the outbox in the background,
+        # so scraping never waits for the notifiers
+        self.notification_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='notification-sender'
+        )
+        self.notification_dispatcher = NotificationDispatcher()
+        self._delivery_lock = threading.Lock()
+        self._pending_delivery: Future[None] | None = None
+
+        # Per series scraping is done in an event loop running in its own thread.
+        # The semaphore limits the amount of concurrent scrapes to the available connections.
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name='scheduler-event-loop', daemon=True
+        )
+        self._loop_thread.start()
+        self._scrape_semaphore = asyncio.Semaphore(self.SCRAPE_WORKERS)
         self._es: Elasticsearch = get_client()
+        self.batch_planner = BatchPlanner()
+        self._stop_event = threading.Event()
+        self._scheduled_runs_lock = threading.Lock()
+        self.run_guard = RunGuard(self.pool, overlap_policy)
 
-        with self.conn() as conn:
-            inject_service_values(DbUtil(conn, self.es_methods))
+        self.refresh_service_values()
 
     @property
     def es(self) -> Elasticsearch:
@@ -116,11 +203,146 @@ class UpdateScheduler:
     def es_methods(self) -> ElasticMethods:
         return ElasticMethods(self._es)
 
+    def refresh_service_values(self) -> None:
+        """
+        Loads service configs from the database and injects them into the scraper classes
+        """
+        with self.conn() as conn:
+            inject_service_values(DbUtil(conn, self.es_methods))
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the scheduler
+        """
+        self.thread_pool.shutdown()
+        self.notification_pool.shutdown()
+        self.notification_dispatcher.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self.es.close()
+        self.pool.close()
+
+    def stop(self) -> None:
+        """
+        Stops the daemon loop started with run_forever after the current run finishes.
+        Safe to call from signal handlers and other threads.
+        """
+        self._stop_event.set()
+
+    def get_sleep_time(self, next_update: datetime | None) -> timedelta:
+        """
+        Get the time to sleep until the given next update clamped between MIN_SLEEP and MAX_SLEEP
+        """
+        if next_update is None:
+            return self.MAX_SLEEP
+
+        return min(max(next_update - utcnow(), self.MIN_SLEEP), self.MAX_SLEEP)
+
+    def run_forever(self) -> None:
+        """
+        Runs the scheduler as a long-running daemon.
+        The connection pool, elasticsearch client and scraper classes are kept alive between runs
+        and the scheduler sleeps until the next update time returned by run_once.
+        Scheduled runs are started as soon as they are added without waiting for the next run.
+        """
+        listener = threading.Thread(
+            target=self.listen_scheduled_runs, name='scheduled-run-listener', daemon=True
+        )
+        listener.start()
+
+        while not self._stop_event.is_set():
+            next_update: datetime | None
+            try:
+                self.refresh_service_values()
+                # Batches are sized for RUN_INTERVAL even though the daemon might sleep longer,
+                # so that a single run does not delay whole service feeds and notifications
+                next_update = self.run_guarded(self.RUN_INTERVAL)
+            except Exception:
+                logger.exception('Failed to run once')
+                next_update = None
+
+            sleep_time = self.get_sleep_time(next_update)
+            logger.debug('Next update in %s', sleep_time)
+            self._stop_event.wait(sleep_time.total_seconds())
+
+        listener.join()
+        logger.info('Scheduler stopped')
+
+    def listen_scheduled_runs(self) -> None:
+        """
+        Listens for notifications of new scheduled runs and runs them right away.
+        Notifications received during the debounce period are handled with a single run.
+        Also clears the known chapters of services whose chapters were removed. The known chapters
+        caches are only enabled while listening, as removed chapters are not seen otherwise.
+        Runs until the scheduler is stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                with psycopg.connect(self._conninfo, autocommit=True) as conn:
+                    conn.execute(f'LISTEN {self.SCHEDULED_RUNS_CHANNEL}')
+                    conn.execute(f'LISTEN {self.CHAPTERS_REMOVED_CHANNEL}')
+                    set_known_chapters_enabled(True)
+                    try:
+                        self._handle_notifications(conn)
+                    finally:
+                        set_known_chapters_enabled(False)
+            except psycopg.Error:
+                logger.exception('Scheduled run listener lost its connection')
+                self._stop_event.wait(self.LISTEN_TIMEOUT.total_seconds())
+            except Exception:
+                logger.exception('Failed to run scheduled runs')
+
+    def _handle_notifications(self, conn: Connection[TupleRow]) -> None:
+        while not self._stop_event.is_set():
+            notifies = conn.notifies(timeout=self.LISTEN_TIMEOUT.total_seconds(), stop_after=1)
+            notify = next(notifies, None)
+            if notify is None or not self.handle_notify(notify):
+                continue
+
+            for notify in conn.notifies(timeout=self.SCHEDULED_RUN_DEBOUNCE.total_seconds()):
+                self.handle_notify(notify)
+
+            self.run_scheduled_runs()
+
+    def handle_notify(self, notify: psycopg.Notify) -> bool:
+        """
+        Handles a notification received by the listener
+
+        Returns:
+            True if scheduled runs should be run
+        """
+        if notify.channel == self.CHAPTERS_REMOVED_CHANNEL:
+            clear_known_chapters(int(notify.payload))
+            return False
+
+        return notify.channel == self.SCHEDULED_RUNS_CHANNEL
+
+    def run_scheduled_runs(self) -> None:
+        """
+        Runs the scheduled runs outside of a regular run and processes their results
+        """
+        manga_ids, _ = self.do_scheduled_runs()
+        if not manga_ids:
+            return
+
+        with self.conn() as conn:
+            self.process_updates(conn, DirtyManga(), set(manga_ids))
+
     @contextmanager
-    def conn(self) -> Generator[Connection[DictRow]]:
+    def conn(self, autocommit: bool = False) -> Generator[Connection[DictRow]]:
+        """
+        Get a connection from the pool.
+
+        Args:
+            autocommit: Use autocommit mode. Scraping connections use this so that
+                only explicit transactions are opened and no transaction stays open
+                during network requests.
+        """
         conn: Connection[DictRow] = self.pool.getconn()
         try:
             conn.cursor_factory = LoggingCursor
+            conn.autocommit = autocommit
             yield conn
         except Exception:
             conn.rollback()
@@ -128,15 +350,30 @@ class UpdateScheduler:
         else:
             conn.commit()
         finally:
+            if autocommit and not conn.closed:
+                conn.autocommit = False
             self.pool.putconn(conn)
 
     def do_scheduled_runs(self) -> tuple[list[int], list[int]]:
+        """
+        Runs the scheduled runs requested by users.
+        The runs are scraped concurrently on the event loop and share
+        the rate limits and connections with the per series batches.
+        """
+        # Scheduled runs are claimed, so other workers do not run them.
+        # The lock only keeps the listener and regular runs of this process from competing for them.
+        with self._scheduled_runs_lock:
+            return self._do_scheduled_runs()
+
+    def _do_scheduled_runs(self) -> tuple[list[int], list[int]]:
+        delete = []
+        runs: list[tuple[int, int]] = []
+        manga_ids = []
+        chapter_ids = []
+        service_counter: Counter = Counter()
+
         with self.conn() as conn:
             dbutil = DbUtil(conn, self.es_methods)
-            delete = []
-            manga_ids = []
-            chapter_ids = []
-            service_counter: Counter = Counter()
 
             disabled_services = set(
                 map(attrgetter('service_id'), filter(attrgetter('disabled'), dbutil.get_services()))
@@ -167,119 +404,241 @@ class UpdateScheduler:
                     continue
 
                 service_counter.update((service_id,))
+                runs.append((manga_id, service_id))
+
+            # Committed when the connection is returned, after which other workers skip the claimed runs
+            dbutil.claim_scheduled_runs(runs, self.CLAIM_LEASE)
 
-                retval = self.force_run(service_id, manga_id)
-                delete.append((manga_id, service_id))
-                manga_ids.append(manga_id)
-                if retval:
-                    _, chs = retval
-                    chapter_ids.extend(chs)
+        futures = [
+            asyncio.run_coroutine_threadsafe(self.force_run_async(service_id, manga_id), self._loop)
+            for manga_id, service_id in runs
+        ]
 
+        for (manga_id, service_id), future in zip(runs, futures, strict=True):
+            delete.append((manga_id, service_id))
+            manga_ids.append(manga_id)
+            try:
+                retval = future.result()
+            except Exception:
+                logger.exception(f'Failed to do scheduled run of manga {manga_id} on service {service_id}')
+                continue
+
+            if retval:
+                _, chs = retval
+                chapter_ids.extend(chs)
+
+        with self.conn() as conn:
+            dbutil = DbUtil(conn, self.es_methods)
             dbutil.delete_scheduled_runs(delete)
             dbutil.update_scheduled_run_disabled(list(service_counter.keys()))
 
-            return manga_ids, chapter_ids
+        return manga_ids, chapter_ids
+
+    def scrape_title(
+        self,
+        scraper: BaseScraper,
+        service_id: int,
+        info: MangaServiceInfo,
+        dirty_manga: DirtyManga,
+    ) -> tuple[Collection[int], int]:
+        """
+        Scrapes a single series and schedules its next update.
+        The bookkeeping writes of the series are collected into dirty_manga
+        and written when it is flushed at the end of the run.
+
+        Returns:
+            The new chapter ids and the amount of errors that occurred
+        """
+        title_id = info['title_id']
+        manga_id = info['manga_id']
+        feed_url = info['feed_url']
+        chapter_ids: Collection[int] = []
+        errors = 0
+
+        logger.info(f'Updating {title_id} on service {scraper.NAME}')
+        try:
+            # Scrapers keep their network requests out of transactions
+            scraper.dirty_manga = dirty_manga
+            if res := scraper.scrape_series(title_id, service_id, manga_id, feed_url):
+                chapter_ids = res
+
+            elif res is None:
+                errors += 1
+                logger.error(f'Failed to scrape series title_id: {title_id} manga_id: {manga_id} for service {scraper.NAME}')
+
+            ms = scraper.dbutil.get_manga_service(service_id, title_id)
+            if ms is None:
+                logger.error(f'Manga {title_id} not found on service {scraper.NAME}')
+                return chapter_ids, errors + 1
+
+            # release_interval gets recalculated when the dirty manga are flushed.
+            # It is likely that it has already been set before, as this feature
+            # requires manual configuration, so the old value is used to decide
+            # whether the series can be scheduled.
+            if not ms.disabled and (
+                ms.next_update is None or ms.next_update < utcnow()
+            ):
+                if ms.release_interval is None:
+                    logger.warning(f'Release interval is None for manga {title_id} on service {scraper.NAME}. Disabling automatic updates for it.')
+                    dirty_manga.disable(service_id, manga_id)
+                else:
+                    # The next update is calculated from the latest release when flushing
+                    dirty_manga.schedule_next_update(
+                        service_id, manga_id, scraper.min_update_interval()
+                    )
+        except psycopg.Error:
+            logger.exception(f'Database error while updating manga {title_id} on service {scraper.NAME}')
+            dirty_manga.set_next_update(service_id, manga_id, scraper.next_update())
+            errors += 1
+        except Exception:
+            logger.exception(f'Unknown error while updating manga {title_id} on service {scraper.NAME}')
+            dirty_manga.set_next_update(service_id, manga_id, scraper.next_update())
+            errors += 1
+
+        dirty_manga.set_last_checked(service_id, manga_id, utcnow())
+
+        return chapter_ids, errors
 
     # noinspection PyPep8Naming
-    def scrape_series(
-        self, service_id: int, Scraper: type[BaseScraper], manga_info: Collection[MangaServiceInfo]
-    ) -> tuple[set[int], list[int]]:
+    def _scrape_title_with_conn(
+        self,
+        service_id: int,
+        Scraper: type[BaseScraper],
+        info: MangaServiceInfo,
+        dirty_manga: DirtyManga,
+    ) -> tuple[Collection[int], int]:
+        with self.conn(autocommit=True) as conn:
+            scraper = Scraper(conn, DbUtil(conn, self.es_methods))
+            retval = self.scrape_title(scraper, service_id, info, dirty_manga)
+            # The connection is between transactions here, so it can be used for flushing
+            dirty_manga.flush_if_due(scraper.dbutil)
+            return retval
+
+    # noinspection PyPep8Naming
+    def _finish_batch_with_conn(
+        self,
+        service_id: int,
+        Scraper: type[BaseScraper],
+        manga_ids: Collection[int],
+        dirty_manga: DirtyManga,
+    ) -> None:
         with self.conn() as conn:
             scraper = Scraper(conn, DbUtil(conn, self.es_methods))
-            rng = random.Random()
-            manga_ids: set[int] = set()
-            chapter_ids: list[int] = []
-            errors = 0
-
-            idx = 0
-            for info in manga_info:
-                title_id = info['title_id']
-                manga_id = info['manga_id']
-                feed_url = info['feed_url']
-                logger.info(f'Updating {title_id} on service {scraper.NAME}')
-                try:
-                    with conn.transaction():
-                        if res := scraper.scrape_series(title_id, service_id, manga_id, feed_url):
-                            manga_ids.add(manga_id)
-                            chapter_ids.extend(res)
-
-                        elif res is None:
-                            errors += 1
-                            logger.error(f'Failed to scrape series title_id: {title_id} manga_id: {manga_id} for service {Scraper.NAME}')
-
-                        ms = scraper.dbutil.get_manga_service(service_id, title_id)
-                        if ms is None:
-                            logger.error(f'Manga {title_id} not found on service {scraper.NAME}')
-                            errors += 1
-                            continue
-
-                        # release_interval actually gets set after this function is called,
-                        # but it is likely that it has already been set before,
-                        # as this feature requires manual configuration. That's why it
-                        # should be ok to use it here even if it is the old value.
-                        if not ms.disabled and (
-                            ms.next_update is None or ms.next_update < utcnow()
-                        ):
-                            if ms.release_interval is None:
-                                logger.warning(f'Release interval is None for manga {title_id} on service {scraper.NAME}. Disabling automatic updates for it.')
-                                scraper.dbutil.execute(
-                                    'UPDATE manga_service SET disabled=TRUE WHERE service_id = %s AND manga_id = %s',
-                                    (service_id, manga_id),
-                                )
-                            else:
-                                # If all ok, set the latest release and refetch manga_service to get the updated latest_release
-                                scraper.dbutil.update_latest_release([manga_id])
-                                ms = scraper.dbutil.get_manga_service(service_id, title_id)
-                                assert ms is not None
-                                assert (
-                                    ms.latest_release is not None
-                                    and ms.release_interval is not None
-                                )
-
-                                next_date: datetime = ms.latest_release + ms.release_interval
-                                now = utcnow()
-
-                                if ms.latest_release < now:
-                                    # If the expected update did not happen yet, postpone it slightly.
-                                    # This prevents the same manga from not being updated for a long time
-                                    # in case the update is done a bit later.
-                                    if (next_date - now) < timedelta(days=3):
-                                        next_date = now + max(scraper.min_update_interval(), timedelta(hours=6))
-                                    else:
-                                        # Default to the release interval multiplied until it is after the current time.
-                                        interval_multiplier = math.ceil((now - ms.latest_release) / ms.release_interval)
-                                        next_date = ms.latest_release + ms.release_interval * interval_multiplier
-
-                                logger.info(f'Next update for {title_id} on service {scraper.NAME} is {next_date}')
-
-                                scraper.dbutil.update_manga_next_update(
-                                    service_id, manga_id, next_date + timedelta(minutes=10)
-                                )
-                except psycopg.Error:
-                    logger.exception(f'Database error while updating manga {title_id} on service {scraper.NAME}')
-                    scraper.dbutil.update_manga_next_update(
-                        service_id, manga_id, scraper.next_update()
-                    )
-                    errors += 1
-                except Exception:
-                    logger.exception(f'Unknown error while updating manga {title_id} on service {scraper.NAME}')
-                    scraper.dbutil.update_manga_next_update(
-                        service_id, manga_id, scraper.next_update()
-                    )
-                    errors += 1
+            scraper.dirty_manga = dirty_manga
+            scraper.set_checked(service_id, True)
+            # Released only when the next updates of the batch are flushed
+            dirty_manga.release_claims(service_id, manga_ids)
 
-                scraper.dbutil.set_manga_last_checked(service_id, manga_id, utcnow())
+    # noinspection PyPep8Naming
+    async def scrape_series_async(
+        self,
+        service_id: int,
+        Scraper: type[BaseScraper],
+        manga_info: Collection[MangaServiceInfo],
+        dirty_manga: DirtyManga,
+    ) -> tuple[set[int], list[int]]:
+        """
+        Scrapes a batch of series of a single service one after another.
+        A pooled connection is only reserved while a title is being scraped.
+        Scrapers are synchronous, so they are run in a worker thread.
+        """
+        manga_ids: set[int] = set()
+        chapter_ids: list[int] = []
+        errors = 0
+
+        for info in manga_info:
+            async with self._scrape_semaphore:
+                start = time.perf_counter()
+                res, title_errors = await asyncio.to_thread(
+                    self._scrape_title_with_conn, service_id, Scraper, info, dirty_manga
+                )
+                self.batch_planner.record_latency(
+                    service_id, timedelta(seconds=time.perf_counter() - start)
+                )
 
-                if errors > 1:
-                    break
+            if res:
+                manga_ids.add(info['manga_id'])
+                chapter_ids.extend(res)
+
+            errors += title_errors
+            if errors > 1:
+                break
+
+        async with self._scrape_semaphore:
+            await asyncio.to_thread(
+                self._finish_batch_with_conn,
+                service_id,
+                Scraper,
+                [info['manga_id'] for info in manga_info],
+                dirty_manga,
+            )
 
-                idx += 1
-                if idx != len(manga_info):
-                    time.sleep(rng.randint(200, 1000) / 100)
+        return manga_ids, chapter_ids
+
+    def claim_due_services(self, conn: Connection[DictRow]) -> list[DictRow]:
+        """
+        Claims the whole services that are due for an update.
+        Works like the series claims of get_series_batches. The claim is released
+        when the service is set as checked.
+        """
+        sql = """
+            WITH due AS (
+                SELECT sw.service_id
+                FROM service_whole sw INNER JOIN services s ON sw.service_id = s.service_id
+                WHERE NOT s.disabled AND (sw.next_update IS NULL OR sw.next_update < NOW())
+                  AND (sw.claimed_until IS NULL OR sw.claimed_until < NOW())
+                FOR UPDATE OF sw SKIP LOCKED
+            )
+            UPDATE service_whole sw SET claimed_until = NOW() + %s
+            FROM due, services s
+            WHERE sw.service_id = due.service_id AND s.service_id = sw.service_id
+            RETURNING sw.service_id, sw.feed_url, s.url
+        """
+
+        with conn.cursor() as cursor:
+            cursor.execute(sql, (self.CLAIM_LEASE,))
+            return cursor.fetchall()
+
+    def scrape_whole_service(
+        self, service_id: int, feed_url: str, url: str
+    ) -> tuple[set[int], list[int]]:
+        """
+        Scrapes the feed of a whole service using its own pooled connection,
+        so that a slow or failing service does not affect the others.
+        """
+        Scraper = SCRAPERS.get(url)
+        if not Scraper:
+            logger.error(f'Failed to find scraper for {url}')
+            return set(), []
+
+        with self.conn(autocommit=True) as conn:
+            scraper = Scraper(conn, DbUtil(conn, self.es_methods))
+            logger.info(f'Updating service {url}')
 
-            scraper.set_checked(service_id, True)
+            try:
+                retval = scraper.scrape_service(service_id, feed_url, None)
+            except psycopg.Error:
+                logger.exception(f'Database error while scraping {feed_url}')
+                retval = None
+            except Exception:
+                logger.exception(f'Failed to scrape service {feed_url}')
+                retval = None
 
-            return manga_ids, chapter_ids
+            scraper.set_checked(service_id)
+
+        if not retval:
+            return set(), []
+
+        return set(retval.manga_ids), list(retval.chapter_ids)
+
+    async def force_run_async(
+        self, service_id: int, manga_id: int
+    ) -> tuple[set[int], list[int]] | None:
+        """
+        Force runs a single series in a worker thread
+        """
+        async with self._scrape_semaphore:
+            return await asyncio.to_thread(self.force_run, service_id, manga_id)
 
     def force_run(
         self, service_id: int, manga_id: int | None = None
@@ -288,7 +647,7 @@ class UpdateScheduler:
             logger.warning(f'No service found with id {service_id}')
             return None
 
-        with self.conn() as conn:
+        with self.conn(autocommit=True) as conn:
             if manga_id is not None:
                 sql = """
                     SELECT ms.service_id, s.url, ms.title_id, ms.manga_id, ms.feed_url, sw.feed_url AS service_feed_url
@@ -319,21 +678,20 @@ class UpdateScheduler:
                 feed_url: str = row['feed_url'] or row['service_feed_url']
 
                 logger.info(f'Force updating {title_id} on service {scraper.NAME}')
-                with conn.transaction():
-                    try:
-                        retval = scraper.scrape_series(
-                            title_id, service_id, manga_id, feed_url=feed_url
-                        )
-                    except psycopg.Error:
-                        logger.exception(f'Database error while scraping {service_id} {scraper.NAME}: {title_id}')
-                        return None
-                    except Exception:
-                        logger.exception(f'Failed to scrape service {scraper.NAME}')
-                        return None
+                try:
+                    retval = scraper.scrape_series(
+                        title_id, service_id, manga_id, feed_url=feed_url
+                    )
+                except psycopg.Error:
+                    logger.exception(f'Database error while scraping {service_id} {scraper.NAME}: {title_id}')
+                    return None
+                except Exception:
+                    logger.exception(f'Failed to scrape service {scraper.NAME}')
+                    return None
 
-                    if retval is None:
-                        logger.error(f'Failed to scrape series {row}')
-                        return None
+                if retval is None:
+                    logger.error(f'Failed to scrape series {row}')
+                    return None
 
                 return {manga_id}, list(retval)
 
@@ -358,148 +716,395 @@ class UpdateScheduler:
 
                 scraper = Scraper(conn, DbUtil(conn, self.es_methods))
                 logger.info(f'Updating service {row["url"]}')
-                with conn.transaction():
-                    updated = scraper.scrape_service(row['service_id'], row['feed_url'], None)
+                updated = scraper.scrape_service(row['service_id'], row['feed_url'], None)
                 if updated:
                     manga_ids.update(updated.manga_ids)
                     chapter_ids.extend(updated.chapter_ids)
 
                 return manga_ids, chapter_ids
 
-    def run_once(self) -> datetime:
-        with self.conn() as conn:
-            futures = []
-            sql: LiteralString = """
-                SELECT ms.service_id, s.url, array_agg(json_build_object('title_id', ms.title_id, 'manga_id', ms.manga_id, 'feed_url', ms.feed_url)) AS manga_info
-                FROM manga_service ms
-                INNER JOIN services s ON s.service_id=ms.service_id
-                WHERE NOT (s.disabled OR ms.disabled) AND (s.disabled_until IS NULL OR s.disabled_until < now()) AND (ms.next_update IS NULL OR ms.next_update < now())
-                GROUP BY ms.service_id, s.url
-            """
-
-            with conn.cursor() as cursor:
-                cursor.execute(sql)
+    def get_series_batches(
+        self, conn: Connection[DictRow], time_until_next_run: timedelta | None = None
+    ) -> list[tuple[int, type[BaseScraper], list[MangaServiceInfo]]]:
+        """
+        Claims the series that should be scraped in this run grouped by service.
+        The size of each batch is decided by the batch planner and only the most overdue
+        series are fetched from the database.
+
+        Claimed series get a lease that prevents other workers from claiming them
+        until the lease expires or the claim is released after scraping.
+        Series locked by other workers are skipped.
+        The claims are visible to other workers once the transaction is committed.
+
+        Args:
+            time_until_next_run: Expected time until the next run starts. Defaults to RUN_INTERVAL.
+
+        Returns:
+            List of (service_id, scraper class, series to scrape) tuples
+        """
+        sql: LiteralString = """
+            SELECT ms.service_id, s.url, COUNT(*) AS backlog
+            FROM manga_service ms
+            INNER JOIN services s ON s.service_id=ms.service_id
+            WHERE NOT (s.disabled OR ms.disabled) AND (s.disabled_until IS NULL OR s.disabled_until < now()) AND (ms.next_update IS NULL OR ms.next_update < now())
+              AND (ms.claimed_until IS NULL OR ms.claimed_until < now())
+            GROUP BY ms.service_id, s.url
+        """
+
+        scrapers: dict[int, type[BaseScraper]] = {}
+        backlogs: list[DictRow] = []
+
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+
+            for row in cursor:
+                Scraper = SCRAPERS.get(row['url'])
+                if not Scraper:
+                    logger.error(f'Failed to find scraper for {row}')
+                    continue
 
-                manga_ids: set[int] = set()
-                chapter_ids: list[int] = []
-                for row in cursor:
-                    batch_size = random.randint(3, 6)
-                    Scraper = SCRAPERS.get(row['url'])
-                    if not Scraper:
-                        logger.error(f'Failed to find scraper for {row}')
-                        continue
+                scrapers[row['service_id']] = Scraper
+                backlogs.append(row)
 
-                    futures.append(
-                        self.thread_pool.submit(
-                            self.scrape_series,
-                            row['service_id'],
-                            Scraper,
-                            row['manga_info'][:batch_size],
-                        )
-                    )
+        if not backlogs:
+            return []
 
-            sql = """SELECT s.service_id, sw.feed_url, s.url
-                     FROM service_whole sw INNER JOIN services s ON sw.service_id = s.service_id
-                     WHERE NOT s.disabled AND (sw.next_update IS NULL OR sw.next_update < NOW())"""
+        # All batches share the scrape workers, so they are sized together
+        service_ids = [row['service_id'] for row in backlogs]
+        batch_sizes = self.batch_planner.batch_sizes(
+            [(SCRAPERS_ID[row['service_id']].CONFIG, row['backlog']) for row in backlogs],
+            time_until_next_run or self.RUN_INTERVAL,
+            self.SCRAPE_WORKERS,
+        )
+        for row, batch_size in zip(backlogs, batch_sizes, strict=True):
+            logger.debug(f'Scraping {batch_size} of {row["backlog"]} due series on service {row["url"]}')
+
+        # Series that have never been scheduled are the most overdue ones
+        sql = """
+            WITH due AS (
+                SELECT due.service_id, due.manga_id
+                FROM unnest(%s::int[], %s::int[]) AS b(service_id, batch_size)
+                CROSS JOIN LATERAL (
+                    SELECT ms.service_id, ms.manga_id
+                    FROM manga_service ms
+                    WHERE ms.service_id = b.service_id AND NOT ms.disabled AND (ms.next_update IS NULL OR ms.next_update < now())
+                      AND (ms.claimed_until IS NULL OR ms.claimed_until < now())
+                    ORDER BY ms.next_update NULLS FIRST
+                    LIMIT b.batch_size
+                    FOR UPDATE SKIP LOCKED
+                ) due
+            )
+            UPDATE manga_service ms SET claimed_until = now() + %s
+            FROM due
+            WHERE ms.service_id = due.service_id AND ms.manga_id = due.manga_id
+            RETURNING ms.service_id, ms.title_id, ms.manga_id, ms.feed_url, ms.next_update
+        """
+
+        def overdue_key(row: DictRow) -> tuple[bool, datetime | None]:
+            return row['next_update'] is not None, row['next_update']
+
+        manga_info: dict[int, list[MangaServiceInfo]] = {}
+        with conn.cursor() as cursor:
+            cursor.execute(sql, (service_ids, batch_sizes, self.CLAIM_LEASE))
+            for row in sorted(cursor, key=overdue_key):
+                manga_info.setdefault(row['service_id'], []).append({
+                    'manga_id': row['manga_id'],
+                    'title_id': row['title_id'],
+                    'service_id': row['service_id'],
+                    'feed_url': row['feed_url'],
+                })
+
+        return [
+            (service_id, scrapers[service_id], infos)
+            for service_id, infos in manga_info.items()
+        ]
+
+    def run_guarded(self, time_until_next_run: timedelta | None = None) -> datetime | None:
+        """
+        Calls run_once unless another instance is already running.
+        Overlapping runs are handled according to the overlap policy of the scheduler.
+
+        Args:
+            time_until_next_run: Expected time until the next run starts. Defaults to RUN_INTERVAL.
+
+        Returns:
+            The next update time or None if this instance did not run
+        """
+        return self.run_guard.run(lambda: self.run_once(time_until_next_run))
+
+    def run_once(self, time_until_next_run: timedelta | None = None) -> datetime:
+        """
+        Args:
+            time_until_next_run: Expected time until the next run starts. Defaults to RUN_INTERVAL.
+                The per series batches are sized to finish before it.
+        """
+        with self.conn() as conn:
+            futures: list[Future[tuple[Collection[int], Collection[int]]]] = []
+            manga_ids: set[int] = set()
+            chapter_ids: list[int] = []
+            dirty_manga = DirtyManga()
 
-            services = []
-            with conn.cursor() as cursor:
-                cursor.execute(sql)
-                for row in cursor:
-                    services.append(row)
+            batches = self.get_series_batches(conn, time_until_next_run)
+            services = self.claim_due_services(conn)
+            # Commit the claims so that other workers see them and
+            # the row locks do not block the scrapers
+            conn.commit()
+
+            for service_id, Scraper, manga_info in batches:
+                futures.append(
+                    asyncio.run_coroutine_threadsafe(
+                        self.scrape_series_async(service_id, Scraper, manga_info, dirty_manga),
+                        self._loop,
+                    )
+                )
 
             for service in services:
-                service_id = service['service_id']
-                feed_url = service['feed_url']
-                url = service['url']
+                futures.append(
+                    self.thread_pool.submit(
+                        self.scrape_whole_service,
+                        service['service_id'],
+                        service['feed_url'],
+                        service['url'],
+                    )
+                )
 
-                Scraper = SCRAPERS.get(url)
-                if not Scraper:
-                    logger.error(f'Failed to find scraper for {service}')
+            # Scheduled runs wait for their scrapes on the event loop, so they are
+            # waited in a worker thread to not block handling the finished batches
+            futures.append(
+                asyncio.run_coroutine_threadsafe(
+                    asyncio.to_thread(self.do_scheduled_runs), self._loop
+                )
+            )
+
+            # Each batch has committed its chapters and their outbox entries when it finishes,
+            # so its notifications are delivered right away instead of after the whole run
+            for r in as_completed(futures):
+                try:
+                    res = r.result()
+                except Exception:
+                    logger.exception('Failed to scrape a batch')
                     continue
 
-                scraper = Scraper(conn, DbUtil(conn, self.es_methods))
-                logger.info(f'Updating service {url}')
+                if isinstance(res, tuple):
+                    manga_ids.update(res[0])
+                    chapter_ids.extend(res[1])
+                    if res[1]:
+                        self.request_notification_delivery()
+
+            self.flush_updates(conn, dirty_manga, manga_ids)
+            # Also delivers the retries that became due and entries left behind by a crashed worker
+            self.request_notification_delivery()
+
+            next_update = self.get_next_update(conn)
+            if next_update is None:
+                return utcnow() + timedelta(hours=1)
+            return next_update
+
+    @staticmethod
+    def get_next_update(conn: Connection[DictRow]) -> datetime | None:
+        """
+        Finds the time when the next series or service becomes due.
+        The earliest next update of each service is looked up from the
+        manga_service_next_update_due_index, so the cost depends on the amount
+        of services instead of the amount of series.
+
+        Returns:
+            The next update time or None if there are no enabled series
+        """
+        sql = """
+            WITH whole AS (
+                SELECT MIN(GREATEST(sw.next_update, s.disabled_until)) AS update
+                FROM service_whole sw
+                INNER JOIN services s ON s.service_id = sw.service_id
+                WHERE NOT s.disabled
+            )
+            SELECT MIN(LEAST(GREATEST(due.next_update, s.disabled_until), whole.update)) AS update
+            FROM services s
+            CROSS JOIN whole
+            CROSS JOIN LATERAL (
+                SELECT 1 FROM manga_service ms
+                WHERE ms.service_id = s.service_id AND NOT ms.disabled
+                LIMIT 1
+            ) has_series
+            LEFT JOIN LATERAL (
+                SELECT ms.next_update FROM manga_service ms
+                WHERE ms.service_id = s.service_id AND NOT ms.disabled AND ms.next_update IS NOT NULL
+                ORDER BY ms.next_update NULLS FIRST
+                LIMIT 1
+            ) due ON TRUE
+            WHERE NOT s.disabled
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            return row['update'] if row else None
+
+    def process_updates(
+        self,
+        conn: Connection[DictRow],
+        dirty_manga: DirtyManga,
+        manga_ids: set[int],
+    ) -> None:
+        """
+        Flushes the updates collected during the run, including the release intervals
+        of the updated manga, and delivers notifications of the new chapters in the background
+        """
+        self.flush_updates(conn, dirty_manga, manga_ids)
+        self.request_notification_delivery()
+
+    def flush_updates(
+        self, conn: Connection[DictRow], dirty_manga: DirtyManga, manga_ids: set[int]
+    ) -> None:
+        """
+        Flushes the updates collected during the run, including the release intervals of the updated manga
+        """
+        dirty_manga.mark_updated(manga_ids)
+        dirty_manga.flush(DbUtil(conn, self.es_methods))
+
+    def request_notification_delivery(self) -> Future[None]:
+        """
+        Delivers the notification outbox in the background.
+        Requests made before the previous request has started are coalesced into it,
+        as the delivery handles every entry committed before it starts.
+
+        Returns:
+            Future of the delivery
+        """
+        with self._delivery_lock:
+            pending = self._pending_delivery
+            if pending is not None and not pending.running() and not pending.done():
+                return pending
+
+            self._pending_delivery = self.notification_pool.submit(self._deliver_notifications_logged)
+            return self._pending_delivery
+
+    def _deliver_notifications_logged(self) -> None:
+        try:
+            self.deliver_notifications()
+        except Exception:
+            logger.exception('Failed to deliver notifications')
+
+    def get_retry_delay(self, attempts: int) -> timedelta:
+        return min(self.NOTIFICATION_RETRY_DELAY * 2 ** (attempts - 1), self.NOTIFICATION_MAX_RETRY_DELAY)
+
+    def deliver_notifications(self) -> int:
+        """
+        Delivers the due entries of the notification outbox in batches until none are left.
+        New chapters are sent to every notification following them. Failed deliveries are added
+        back to the outbox for the failed notification only and retried with an exponential backoff.
+
+        Returns:
+            Amount of outbox entries handled
+        """
+        handled = 0
+        while True:
+            with self.conn() as conn:
+                # Committed right away so that no transaction is open while sending
+                entries = DbUtil(conn, self.es_methods).claim_notification_outbox(
+                    self.NOTIFICATION_BATCH_SIZE, self.NOTIFICATION_LEASE
+                )
 
-                with conn.transaction():
-                    try:
-                        retval = scraper.scrape_service(service_id, feed_url, None)
-                    except psycopg.Error:
-                        logger.exception(f'Database error while scraping {feed_url}')
-                        scraper.set_checked(service_id)
-                        continue
-                    except Exception:
-                        logger.exception(f'Failed to scrape service {feed_url}')
-                        scraper.set_checked(service_id)
-                        continue
+            if not entries:
+                return handled
 
-                scraper.set_checked(service_id)
-                if retval:
-                    manga_ids.update(retval.manga_ids)
-                    chapter_ids.extend(retval.chapter_ids)
+            self._deliver_outbox_entries(entries)
+            handled += len(entries)
 
-            conn.commit()
+            if len(entries) < self.NOTIFICATION_BATCH_SIZE:
+                return handled
 
-            m_ids, c_ids = self.do_scheduled_runs()
-            manga_ids.update(m_ids)
-            chapter_ids.extend(c_ids)
+    def _deliver_outbox_entries(self, entries: list[NotificationOutboxEntry]) -> None:
+        done: list[int] = []
+        postponed: list[NotificationOutboxEntry] = []
+        retries: list[tuple[int, int, int, int, datetime]] = []
 
-            for r in futures:
-                res = r.result()
-                if isinstance(res, tuple):
-                    manga_ids.update(res[0])
-                    chapter_ids.extend(res[1])
+        fan_out: list[NotificationOutboxEntry] = []
+        retried: dict[int, list[NotificationOutboxEntry]] = {}
+        for entry in entries:
+            if entry.attempts > self.NOTIFICATION_MAX_ATTEMPTS:
+                logger.warning(f'Dropping notification of chapter {entry.chapter_id} after {entry.attempts - 1} attempts')
+                done.append(entry.outbox_id)
+            elif entry.notification_id is None:
+                fan_out.append(entry)
+            else:
+                retried.setdefault(entry.notification_id, []).append(entry)
 
-            with conn.transaction():
-                if manga_ids:
-                    logger.debug(f'Updating interval of {len(manga_ids)} manga')
-                    dbutil = DbUtil(conn, self.es_methods)
-                    with conn.cursor() as cursor:
-                        dbutil.update_latest_release(list(manga_ids), cur=cursor)
-                        for manga_id in manga_ids:
-                            dbutil.update_chapter_interval(manga_id, cur=cursor)
+        # Each notification is retried separately, so that it does not resend the chapters to other notifications
+        groups: list[tuple[list[NotificationOutboxEntry], set[int] | None]] = [
+            (group, {notification_id}) for notification_id, group in retried.items()
+        ]
+        if fan_out:
+            groups.insert(0, (fan_out, None))
 
+        for group, notification_ids in groups:
             try:
-                self.send_notifications(manga_ids, chapter_ids)
+                failed = self.send_notifications(
+                    {e.manga_id for e in group}, [e.chapter_id for e in group], notification_ids
+                )
             except Exception:
                 logger.exception('Failed to send notifications')
+                postponed.extend(group)
+                continue
+
+            done.extend(e.outbox_id for e in group)
+            attempts = {e.chapter_id: e.attempts for e in group}
+            now = utcnow()
+            for notification_id, chapters in failed.items():
+                for chapter in chapters:
+                    chapter_id = cast(int, chapter.chapter_id)
+                    chapter_attempts = attempts[chapter_id]
+                    if chapter_attempts >= self.NOTIFICATION_MAX_ATTEMPTS:
+                        logger.warning(
+                            f'Dropping notification {notification_id} of chapter {chapter_id} after {chapter_attempts} attempts'
+                        )
+                        continue
 
-            sql = """
-            SELECT MIN(t.update) AS update FROM (
-                SELECT
-                   LEAST(
-                       GREATEST(MIN(ms.next_update), s.disabled_until),
-                       (
-                           SELECT MIN(GREATEST(sw.next_update, s2.disabled_until))
-                           FROM service_whole sw
-                               INNER JOIN services s2 ON s2.service_id = sw.service_id
-                           WHERE s2.disabled=FALSE
-                       )
-                   ) AS update
-                FROM manga_service ms
-                INNER JOIN services s ON s.service_id = ms.service_id
-                WHERE s.disabled=FALSE AND ms.disabled=FALSE
-                GROUP BY s.service_id, ms.service_id
-            ) AS t
-            """
-            with conn.cursor() as cursor:
-                cursor.execute(sql)
-                next_update_row = cursor.fetchone()
-                if not next_update_row:
-                    return utcnow() + timedelta(hours=1)
-                return next_update_row['update']
-
-    def send_notifications(self, manga_ids: set[int], chapter_ids: list[int]) -> None:
+                    retries.append((
+                        chapter_id,
+                        chapter.manga_id,
+                        notification_id,
+                        chapter_attempts,
+                        now + self.get_retry_delay(chapter_attempts),
+                    ))
+
+        with self.conn() as conn:
+            dbutil = DbUtil(conn, self.es_methods)
+            dbutil.delete_notification_outbox(done)
+            dbutil.add_notification_retries(retries)
+            now = utcnow()
+            dbutil.reschedule_notification_outbox([
+                (e.outbox_id, now + self.get_retry_delay(e.attempts)) for e in postponed
+            ])
+
+    def send_notifications(
+        self,
+        manga_ids: set[int],
+        chapter_ids: list[int],
+        notification_ids: Collection[int] | None = None,
+    ) -> dict[int, list[Chapter]]:
+        """
+        Sends the given chapters to the notifications following them
+
+        Args:
+            notification_ids: Only send to these notifications if given
+
+        Returns:
+            Dict of notification id to the chapters of the failed notifications
+        """
         if not (manga_ids and chapter_ids):
-            return
+            return {}
 
         with self.conn() as conn:
             dbutil = DbUtil(conn, self.es_methods)
 
             partial_notifications = dbutil.get_notifications_by_manga_ids(list(manga_ids))
+            if notification_ids is not None:
+                partial_notifications = [
+                    pn for pn in partial_notifications if pn.notification_id in notification_ids
+                ]
             manga_ids = {pn.manga_id for pn in partial_notifications}
             if not manga_ids:
-                return
+                return {}
 
             def get_manga_id(chapter: Chapter) -> int:
                 return chapter.manga_id
@@ -536,23 +1141,26 @@ class UpdateScheduler:
                 if v
             }
 
-            for notification_id, chapters_notif in mapped_notifications.items():
-                notification = dbutil.get_notification_info(notification_id)
-                notifier = NOTIFIERS[notification.notification_type]()
-
-                input_fields = dbutil.get_notification_inputs(notification_id)
-
-                try:
-                    sent, success = notifier.send_notification(
-                        chapters_notif, notification, input_fields
-                    )
-                except Exception:
-                    logger.exception('Failed to send notification')
-                    sent = 0
-                    success = False
-
-                dbutil.update_notification_stats(
-                    notification_id,
-                    sent,
-                    0 if success else 1
+            notification_infos = dbutil.get_notifications_info(mapped_notifications.keys())
+            notification_inputs = dbutil.get_notifications_inputs(mapped_notifications.keys())
+            jobs = [
+                NotificationJob(
+                    NOTIFIERS[notification_infos[notification_id].notification_type](),
+                    chapters_notif,
+                    notification_infos[notification_id],
+                    notification_inputs[notification_id],
                 )
+                for notification_id, chapters_notif in mapped_notifications.items()
+            ]
+
+            results = self.notification_dispatcher.dispatch(jobs)
+            dbutil.update_notifications_stats([
+                (result.notification_id, result.sent, 0 if result.success else 1)
+                for result in results
+            ])
+
+            return {
+                result.notification_id: notifications[result.notification_id]
+                for result in results
+                if not result.success
+            }
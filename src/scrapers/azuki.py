@@ -2,6 +2,7 @@ import abc
 import logging
 import re
 from abc import ABC
+from collections.abc import Iterable
 from datetime import datetime, timezone
 from typing import cast, override
 
@@ -189,12 +190,12 @@ class Azuki(BaseScraperWhole):
 
     @staticmethod
     def parse_chapters[TChapter: ParsedChapter](
-        rows: list[etree._Element], chapter_cls: type[TChapter], group_id: int
+        rows: list[etree._Element], chapter_cls: type[TChapter]
     ) -> list[TChapter]:
         chapters = []
         now = utctoday()
         for row in rows:
-            c: TChapter = chapter_cls(row, group_id=group_id)
+            c: TChapter = chapter_cls(row)
             if c.invalid or c.release_date > now:
                 continue
 
@@ -202,7 +203,7 @@ class Azuki(BaseScraperWhole):
 
         return chapters
 
-    def get_manga_chapters(self, title_id: str, group_id: int) -> list[MangaChapter] | None:
+    def get_manga_chapters(self, title_id: str) -> list[MangaChapter] | None:
         r = self.fetch_url(self.MANGA_URL_FORMAT.format(title_id))
         if r is None:
             return None
@@ -212,7 +213,7 @@ class Azuki(BaseScraperWhole):
         chapter_rows = root.xpath(
             ".//azuki-chapter-row-list//li[contains(@class, 'm-chapter-row') and not(contains(@class, 'm-chapter-row--upcoming'))]"
         )
-        chapters = self.parse_chapters(chapter_rows, MangaChapter, group_id)
+        chapters = self.parse_chapters(chapter_rows, MangaChapter)
 
         try:
             manga_title = root.cssselect('div.o-series-summary h1')[0].text.strip()  # type: ignore[union-attr]
@@ -228,12 +229,21 @@ class Azuki(BaseScraperWhole):
     def scrape_series(
         self, title_id: str, service_id: int, manga_id: int, feed_url: str | None = None
     ) -> set[int] | None:
-        group_id = self.dbutil.get_or_create_group(self.NAME).group_id
-        chapters = self.get_manga_chapters(title_id, group_id)
+        return self.fetch_then_persist(
+            lambda: self.get_manga_chapters(title_id),
+            lambda chapters: self.add_series_chapters(chapters, service_id),
+        )
 
-        if chapters is None:
-            return None
+    def set_group(self, chapters: Iterable[ParsedChapter]) -> None:
+        """
+        Sets the group of chapters parsed during the fetch phase. Must be called while persisting.
+        """
+        group_id = self.dbutil.get_or_create_group(self.NAME).group_id
+        for c in chapters:
+            c.group_id = group_id
 
+    def add_series_chapters(self, chapters: list[MangaChapter], service_id: int) -> set[int]:
+        self.set_group(chapters)
         all_chapters = set(chapters)
         new_chapters = self.dbutil.get_only_latest_entries(service_id, chapters)
         old_chapters = all_chapters - set(new_chapters)
@@ -250,6 +260,22 @@ class Azuki(BaseScraperWhole):
         feed_url: str,
         last_update: datetime | None,
     ) -> ScrapeServiceRetVal | None:
+        def add_chapters(chapters: list[ReleaseChapter]) -> ScrapeServiceRetVal | None:
+            if not chapters:
+                return ScrapeServiceRetVal(manga_ids=set(), chapter_ids=set())
+
+            self.set_group(chapters)
+            return self.handle_adding_chapters(chapters, service_id)
+
+        return self.fetch_then_persist(
+            lambda: self.get_new_releases(service_id, feed_url),
+            add_chapters,
+        )
+
+    def get_new_releases(self, service_id: int, feed_url: str) -> list[ReleaseChapter] | None:
+        """
+        Fetches the latest releases and the titles of the new chapters
+        """
         r = self.fetch_url(feed_url)
         if r is None:
             return None
@@ -257,12 +283,11 @@ class Azuki(BaseScraperWhole):
         root = etree.HTML(r.text)
         chapter_rows = root.cssselect('table tbody tr')
 
-        group_id = self.dbutil.get_or_create_group(self.NAME).group_id
-        chapters = self.parse_chapters(chapter_rows, ReleaseChapter, group_id)
+        chapters = self.parse_chapters(chapter_rows, ReleaseChapter)
 
         chapters = list(self.dbutil.get_only_latest_entries(service_id, chapters))
         if not chapters:
-            return ScrapeServiceRetVal(manga_ids=set(), chapter_ids=set())
+            return chapters
 
         logger.debug(f'{len(chapters)} new chapters on {self.NAME}')
 
@@ -271,7 +296,7 @@ class Azuki(BaseScraperWhole):
         if len(grouped) <= 3:
             for key, manga_chapters in grouped.items():
                 logger.debug(f'Fetching chapter titles for {key}')
-                named_chapters = self.get_manga_chapters(key, group_id)
+                named_chapters = self.get_manga_chapters(key)
                 if not named_chapters:
                     continue
 
@@ -284,4 +309,4 @@ class Azuki(BaseScraperWhole):
 
                     temp._chapter_title = c.chapter_title
 
-        return self.handle_adding_chapters(chapters, service_id)
+        return chapters
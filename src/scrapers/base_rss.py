@@ -263,6 +263,7 @@ class BaseRSS(BaseScraperWhole, ABC):
         pass
 
     def get_feed_chapters(self, feed_url: str) -> list[RSSChapter] | None:
+        self.rate_limiter.acquire()
         feed = feedparser.parse(feed_url)
         try:
             is_valid_feed(feed)
@@ -273,11 +274,10 @@ class BaseRSS(BaseScraperWhole, ABC):
         return self.parse_feed(feed.entries, self.get_group_id())
 
     def add_from_feed_url(self, service_id: int, feed_url: str) -> ScrapeServiceRetVal | None:
-        entries = self.get_feed_chapters(feed_url)
-        if entries is None:
-            return None
-
-        return self.handle_adding_chapters(entries, service_id) or ScrapeServiceRetVal()
+        return self.fetch_then_persist(
+            lambda: self.get_feed_chapters(feed_url),
+            lambda entries: self.handle_adding_chapters(entries, service_id) or ScrapeServiceRetVal(),
+        )
 
     @override
     def scrape_service(
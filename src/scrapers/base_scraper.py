@@ -1,7 +1,7 @@
 import abc
 import logging
 from abc import ABC
-from collections.abc import Collection, Iterable, Mapping, Sequence
+from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
 from datetime import datetime, timedelta, timezone
 from inspect import isabstract
 from itertools import groupby
@@ -20,9 +20,11 @@ from src.db.models.chapter import Chapter
 from src.db.models.chapter import Chapter as ChapterModel
 from src.db.models.manga import MangaService
 from src.db.models.services import ServiceConfig
+from src.utils.rate_limiter import TokenBucket, get_service_rate_limiter
 from src.utils.utilities import get_latest_chapters, requests_session, utcnow
 
 if TYPE_CHECKING:
+    from src.dirty_manga import DirtyManga
     from src.utils.dbutils import DbUtil
 
 logger = logging.getLogger(__name__)
@@ -284,6 +286,12 @@ class BaseScraper(abc.ABC):
         else:
             self._dbutil = dbutil
 
+        self.dirty_manga: DirtyManga | None = None
+        """
+        Set by the scheduler during a run. Latest chapter and service check updates
+        are collected into it and written when it is flushed instead of immediately.
+        """
+
     @property
     def conn(self) -> Connection[DictRow]:
         return self._conn
@@ -292,10 +300,21 @@ class BaseScraper(abc.ABC):
     def dbutil(self) -> 'DbUtil':
         return self._dbutil
 
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """
+        Rate limiter shared by everything that makes requests to this service
+        """
+        return get_service_rate_limiter(self.CONFIG)
+
     def set_checked(self, service_id: int, is_manga: bool = False) -> None:  # noqa: ARG002
+        now = utcnow()
+        disabled_until = now + self.min_update_interval()
+        if self.dirty_manga is not None:
+            self.dirty_manga.set_service_checked(service_id, now, disabled_until)
+            return
+
         with self.conn.cursor() as cursor:
-            now = utcnow()
-            disabled_until = now + self.min_update_interval()
             sql: LiteralString = (
                 'UPDATE services SET last_check = %s, disabled_until = %s WHERE service_id=%s'
             )
@@ -319,6 +338,10 @@ class BaseScraper(abc.ABC):
         self, title_id: str, service_id: int, manga_id: int, feed_url: str | None
     ) -> set[int] | None:
         """
+        Scrapes a single series. The scheduler does not wrap this call in a transaction,
+        so implementations should use fetch_then_persist to keep network requests
+        out of the transaction that writes the results.
+
         Returns:
             Set of new chapter ids.
             Returns None if updating failed
@@ -332,8 +355,33 @@ class BaseScraper(abc.ABC):
         feed_url: str,
         last_update: datetime | None,
     ) -> ScrapeServiceRetVal | None:
+        """
+        Scrapes the whole service. Like scrape_series this is not called inside a transaction.
+        """
         raise NotImplementedError
 
+    def fetch_then_persist[T, R](
+        self, fetch: Callable[[], T | None], persist: Callable[[T], R]
+    ) -> R | None:
+        """
+        Runs a scrape in two phases. The fetch phase does the network requests outside of
+        a transaction and should only read from the database. The persist phase writes
+        the fetched data inside a single short transaction and must not do network requests.
+
+        Args:
+            fetch: Fetches the data. Returns None if fetching failed
+            persist: Writes the fetched data to the database
+
+        Returns:
+            The return value of persist or None if fetching failed
+        """
+        fetched = fetch()
+        if fetched is None:
+            return None
+
+        with self.conn.transaction():
+            return persist(fetched)
+
     def add_service(self) -> int | None:
         sql: LiteralString = 'SELECT 1 FROM services WHERE url=%s OR service_id=%s'
         with self.conn.cursor() as cur:
@@ -416,9 +464,11 @@ class BaseScraper(abc.ABC):
             }
             for c in chapters
         ]
-        self.dbutil.update_latest_chapter(
-            tuple(c for c in get_latest_chapters(chapter_rows).values())
-        )
+        latest_chapters = tuple(c for c in get_latest_chapters(chapter_rows).values())
+        if self.dirty_manga is not None:
+            self.dirty_manga.add_latest_chapters(latest_chapters)
+        else:
+            self.dbutil.update_latest_chapter(latest_chapters)
 
     def add_new_manga_with_dupe_check(
         self,
@@ -466,6 +516,7 @@ class BaseScraper(abc.ABC):
     def fetch_url(
         self, url: str, headers: dict[str, str] | None = None
     ) -> requests.Response | None:
+        self.rate_limiter.acquire()
         try:
             with requests_session() as session:
                 r = session.get(url, headers=headers)
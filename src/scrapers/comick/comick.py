@@ -1,6 +1,6 @@
 import logging
 import re
-from collections.abc import Collection, Iterable
+from collections.abc import Iterable
 from datetime import datetime, timedelta
 from json.decoder import JSONDecodeError
 from typing import cast, override
@@ -101,7 +101,7 @@ class Comick(BaseScraperWhole):
     def __init__(self, conn: Connection[DictRow], dbutil: DbUtil | None = None):
         super().__init__(conn, dbutil)
 
-        self.api = ComickAPI()
+        self.api = ComickAPI(rate_limiter=self.rate_limiter)
 
     @staticmethod
     def parse_feed(
@@ -132,57 +132,33 @@ class Comick(BaseScraperWhole):
 
         return chapters
 
-    def get_group_ids_by_names(self, group_names: Collection[str]) -> dict[str, int]:
-        if len(group_names) == 0:
-            return {}
-
-        format_args = self.dbutil.get_format_args(group_names)
-        sql = f'SELECT name, group_id FROM groups WHERE name IN ({format_args})'
-        result: dict[str, int] = {}
-        for row in self.dbutil.execute(sql, group_names, fetch=True):
-            result[row['name']] = row['group_id']
-
-        return result
-
     def map_and_add_group_ids(self, entries: list[Chapter]) -> list[Chapter]:
         """
         Maps the correct group ids to the given chapters
         """
         valid_chapters: list[Chapter] = []
-        existing: dict[str, int] = {}
         no_group: list[Chapter] = []
 
-        # Add group id to chapters and add them to valid_chapters
-        def map_chapters(chapters: list[Chapter]) -> list[Chapter]:
-            not_found: list[Chapter] = []
-            for c in reversed(chapters):
-                if c.group is None:
-                    no_group.append(c)
-                    continue
-
-                if c.group not in existing:
-                    not_found.append(c)
-                    continue
-
-                c.group_id = existing[c.group]
-                valid_chapters.append(c)
-
-            return not_found
-
-        # Find existing groups by comick id and add them
+        # Find or create the groups of the chapters by their names
         group_names: set[str] = {c.group for c in entries if c.group is not None}
-        existing = self.get_group_ids_by_names(group_names)
-        missing_group = map_chapters(entries)
+        existing = {
+            g.name: g.group_id
+            for g in self.dbutil.get_or_create_groups([GroupPartial(name=name) for name in group_names])
+        }
 
-        # Add new groups if they exist
-        if missing_group:
-            for group in self.dbutil.add_new_groups([
-                GroupPartial(name=c.group)
-                for c in missing_group
-            ]):
-                existing[group.name] = group.group_id
+        # Add group id to chapters and add them to valid_chapters
+        missing_group: list[Chapter] = []
+        for c in reversed(entries):
+            if c.group is None:
+                no_group.append(c)
+                continue
 
-            missing_group = map_chapters(missing_group)
+            if c.group not in existing:
+                missing_group.append(c)
+                continue
+
+            c.group_id = existing[c.group]
+            valid_chapters.append(c)
 
         # If no groups were found use No group
         if missing_group:
@@ -224,10 +200,17 @@ class Comick(BaseScraperWhole):
         Handles fetching the chapter feed and adding the results to the database
         and other required operations
         """
-        parsed = self.fetch_chapters(feed_url, title_id=title_id, limit=limit)
-        if parsed is None:
-            return None
+        return self.fetch_then_persist(
+            lambda: self.fetch_chapters(feed_url, title_id=title_id, limit=limit),
+            lambda parsed: self.persist_update(parsed, service_id, title_id),
+        )
 
+    def persist_update(
+        self, parsed: list[Chapter], service_id: int, title_id: str | None
+    ) -> ScrapeServiceRetVal:
+        """
+        Adds the fetched chapters and manga to the database
+        """
         if not parsed:
             return ScrapeServiceRetVal()
 
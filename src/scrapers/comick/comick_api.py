@@ -1,21 +1,19 @@
 import logging
 import ssl
 from collections.abc import Iterable
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 from typing import Any, Literal, override
 
 import requests
 from pydantic import BaseModel, ValidationError
-from ratelimit import rate_limited, sleep_and_retry
 from requests.adapters import HTTPAdapter
 
 from src.enums import Status as MangaStatus
+from src.utils.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
-api_rate_limiter = rate_limited(5, 2)
-
 type SortOrder = Literal['new', 'hot']
 
 
@@ -108,8 +106,11 @@ class CustomHTTPAdapter(HTTPAdapter):
 
 
 class ComickAPI:
-    def __init__(self, url: str = 'https://api.comick.fun'):
+    def __init__(
+        self, url: str = 'https://api.comick.fun', rate_limiter: TokenBucket | None = None
+    ):
         self.base_url = url
+        self.rate_limiter = rate_limiter or TokenBucket(5, timedelta(seconds=2))
 
     @staticmethod
     def get_session() -> requests.Session:
@@ -125,8 +126,6 @@ class ComickAPI:
             'User-Agent': 'Android',
         }
 
-    @sleep_and_retry
-    @api_rate_limiter
     def get_chapters(
         self,
         *,
@@ -142,6 +141,7 @@ class ComickAPI:
         if languages:
             params.append(f'lang={",".join(languages)}')
 
+        self.rate_limiter.acquire()
         session = self.get_session()
         r = session.get(
             f'{self.base_url}/chapter/?{"&".join(params)}',
@@ -150,8 +150,6 @@ class ComickAPI:
 
         return request_to_model(r, ChapterResultWithManga)
 
-    @sleep_and_retry
-    @api_rate_limiter
     def get_manga_chapters(
         self,
         manga_id: str,
@@ -168,6 +166,7 @@ class ComickAPI:
         if languages:
             params.append(f'lang={",".join(languages)}')
 
+        self.rate_limiter.acquire()
         session = self.get_session()
         r = session.get(
             f'{self.base_url}/comic/{manga_id}/chapters?{"&".join(params)}',
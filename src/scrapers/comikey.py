@@ -1,6 +1,4 @@
-import random
 import re
-import time
 from typing import override
 
 import requests
@@ -28,10 +26,10 @@ class Comikey(BaseRSS):
         if partial_id in self.id_cache:
             return self.id_cache[partial_id]
 
+        self.rate_limiter.acquire()
         r = requests.head(self.URL + f'/comics/{partial_id}', allow_redirects=True)
         real_id = '/'.join(r.url.rstrip('/').split('/')[-2:])
         self.id_cache[partial_id] = real_id
-        time.sleep(random.uniform(0.5, 1.5))
         return real_id
 
     @override
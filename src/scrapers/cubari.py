@@ -5,6 +5,7 @@ from typing import cast, override
 
 from lxml import etree
 
+from src.db.models.groups import GroupPartial
 from src.scrapers.base_scraper import (
     BaseChapterSimple,
     BaseScraper,
@@ -143,18 +144,15 @@ class Cubari(BaseScraper):
         self, rows: list[etree._Element], manga_title: str | None = None
     ) -> list[ParsedChapter]:
         chapters = []
-        group_name_to_id: dict[str, int] = {}
+        group_names = [get_group_name(row) for row in rows]
+        group_name_to_id = {
+            g.name: g.group_id
+            for g in self.dbutil.get_or_create_groups([GroupPartial(name=name) for name in set(group_names)])
+        }
 
-        def get_group_id(name: str) -> int:
-            if name not in group_name_to_id:
-                group = self.dbutil.get_or_create_group(name)
-                group_name_to_id[name] = group.group_id
-            return group_name_to_id[name]
-
-        for row in rows:
-            group_name = get_group_name(row)
+        for row, group_name in zip(rows, group_names, strict=True):
             c = ParsedChapter(
-                row, group_id=get_group_id(group_name),
+                row, group_id=group_name_to_id[group_name],
                 manga_title=manga_title
             )
             if c.invalid:
@@ -186,11 +184,12 @@ class Cubari(BaseScraper):
     def scrape_series(
         self, title_id: str, service_id: int, manga_id: int, feed_url: str | None = None
     ) -> set[int] | None:
-        chapters = self.get_manga_chapters(title_id)
-
-        if chapters is None:
-            return None
+        return self.fetch_then_persist(
+            lambda: self.get_manga_chapters(title_id),
+            lambda chapters: self.add_series_chapters(chapters, service_id),
+        )
 
+    def add_series_chapters(self, chapters: list[ParsedChapter], service_id: int) -> set[int]:
         all_chapters = set(chapters)
         new_chapters = self.dbutil.get_only_latest_entries(service_id, chapters)
         old_chapters = all_chapters - set(new_chapters)
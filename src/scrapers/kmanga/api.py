@@ -1,7 +1,7 @@
 import json
 import logging
 import math
-from datetime import datetime
+from datetime import datetime, timedelta
 from datetime import timezone as tz
 from hashlib import sha256, sha512
 from typing import Annotated, Any, Literal, TypedDict
@@ -11,6 +11,7 @@ import requests
 from lxml import etree
 from pydantic import BaseModel, ValidateAs
 
+from src.utils.rate_limiter import TokenBucket
 from src.utils.utilities import dict_to_model, requests_session
 
 logger = logging.getLogger(__name__)
@@ -112,8 +113,11 @@ def get_headers(params: dict | None) -> dict[str, str]:
 
 
 class KMangaAPI:
-    def __init__(self, url: str = 'https://api.kmanga.kodansha.com'):
+    def __init__(
+        self, url: str = 'https://api.kmanga.kodansha.com', rate_limiter: TokenBucket | None = None
+    ):
         self.base_url = url
+        self.rate_limiter = rate_limiter or TokenBucket(1, timedelta(seconds=3))
 
     def _validate_response(self, r: requests.Response, path: str, params: dict | None = None):
         if not r.ok:
@@ -132,6 +136,7 @@ class KMangaAPI:
 
         logger.info('Fetching KManga latest updates with date %s', params['base_date'])
 
+        self.rate_limiter.acquire()
         with requests_session() as session:
             r = session.request(
                 'GET', f'{self.base_url}{path}', headers=get_headers(params), params=params
@@ -142,6 +147,7 @@ class KMangaAPI:
             return dict_to_model(r.json(), LatestUpdatesResponse)
 
     def get_title_chapters(self, title_id: str) -> list[TitleChaptersList] | None:
+        self.rate_limiter.acquire()
         with requests_session() as session:
             r = session.get(f'https://kmanga.kodansha.com/title/{title_id}')
 
@@ -181,6 +187,7 @@ class KMangaAPI:
             headers['Accept'] = 'application/json'
             path = 'episode/list'
 
+            self.rate_limiter.acquire()
             with requests_session() as session:
                 r = session.request('POST', f'{self.base_url}/{path}', headers=headers, data=params)
 
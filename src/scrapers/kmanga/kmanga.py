@@ -1,7 +1,5 @@
 import logging
-import random
 import re
-import time
 from datetime import datetime, timedelta
 from typing import cast, override
 
@@ -22,7 +20,7 @@ from src.scrapers.base_scraper import (
 from src.utils.dbutils import DbUtil
 from src.utils.utilities import utcnow
 
-from .api import KMangaAPI, KMangaEpisode
+from .api import KMangaAPI, KMangaEpisode, LatestUpdatesResponse
 
 logger = logging.getLogger(__name__)
 
@@ -134,7 +132,7 @@ class KManga(BaseScraperWhole):
     def __init__(self, conn: Connection[DictRow], dbutil: DbUtil | None = None):
         super().__init__(conn, dbutil)
 
-        self.api = KMangaAPI()
+        self.api = KMangaAPI(rate_limiter=self.rate_limiter)
         self._group: Group | None = None
 
     def get_group(self) -> Group:
@@ -189,11 +187,14 @@ class KManga(BaseScraperWhole):
     def scrape_series(
         self, title_id: str, service_id: int, manga_id: int, feed_url: str | None = None
     ) -> set[int] | None:
-        chapters = self.get_manga_chapters(title_id)
-
-        if chapters is None:
-            return None
+        return self.fetch_then_persist(
+            lambda: self.get_manga_chapters(title_id),
+            lambda chapters: self.add_series_chapters(chapters, service_id, manga_id),
+        )
 
+    def add_series_chapters(
+        self, chapters: list[KMangaChapter], service_id: int, manga_id: int
+    ) -> set[int]:
         retval = self.handle_adding_chapters(chapters, service_id, strip_chapter_prefix=True)
 
         # The scheduler normally does this, but only for non-disabled series
@@ -201,13 +202,7 @@ class KManga(BaseScraperWhole):
 
         return set() if not retval else retval.chapter_ids
 
-    @override
-    def scrape_service(
-        self,
-        service_id: int,
-        feed_url: str,
-        last_update: datetime | None,
-    ) -> ScrapeServiceRetVal | None:
+    def fetch_latest_updates(self) -> LatestUpdatesResponse | None:
         latest_updates = self.api.get_latest_updates(utcnow())
 
         if latest_updates.status != 'success':
@@ -218,6 +213,17 @@ class KManga(BaseScraperWhole):
             )
             return None
 
+        return latest_updates
+
+    def add_latest_titles(
+        self, latest_updates: LatestUpdatesResponse, service_id: int
+    ) -> list[MangaServicePartialWithId | MangaServiceWithId]:
+        """
+        Adds the new titles of the latest updates as disabled series
+
+        Returns:
+            The new titles and the existing titles that should be scraped
+        """
         title_ids = [str(title.title_id) for title in latest_updates.title_list]
         existing_titles = list(self.dbutil.find_added_titles(service_id, title_ids))
         existing_title_ids = {title.title_id for title in existing_titles}
@@ -245,6 +251,22 @@ class KManga(BaseScraperWhole):
             if title.last_check is None or (title.last_check - now) > timedelta(days=1):
                 titles_to_update.append(title)
 
+        return titles_to_update
+
+    @override
+    def scrape_service(
+        self,
+        service_id: int,
+        feed_url: str,
+        last_update: datetime | None,
+    ) -> ScrapeServiceRetVal | None:
+        titles_to_update = self.fetch_then_persist(
+            self.fetch_latest_updates,
+            lambda latest_updates: self.add_latest_titles(latest_updates, service_id),
+        )
+        if titles_to_update is None:
+            return None
+
         manga_ids = set()
         chapter_ids = set()
 
@@ -269,9 +291,6 @@ class KManga(BaseScraperWhole):
             manga_ids.add(manga_id)
             chapter_ids.update(scrape_value)
 
-            # Sleep for a random time after each scrape
-            time.sleep(random.random() * 5)
-
         return ScrapeServiceRetVal(
             manga_ids=manga_ids,
             chapter_ids=chapter_ids,
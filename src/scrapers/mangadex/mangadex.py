@@ -1,6 +1,6 @@
 import logging
 import re
-from collections.abc import Iterable, Sequence
+from collections.abc import Iterable
 from datetime import datetime, timedelta
 from json.decoder import JSONDecodeError
 from typing import cast, override
@@ -11,7 +11,7 @@ from requests.exceptions import RetryError
 
 from src.constants import NO_GROUP
 from src.db.models.authors import AuthorPartial, MangaArtist, MangaAuthor
-from src.db.models.groups import Group, GroupPartial
+from src.db.models.groups import GroupPartial
 from src.db.models.manga import MangaInfo
 from src.scrapers.base_scraper import (
     BaseChapterSimple,
@@ -129,7 +129,7 @@ class MangaDex(BaseScraperWhole):
     def __init__(self, conn: Connection[DictRow], dbutil: DbUtil | None = None):
         super().__init__(conn, dbutil)
 
-        self.api = MangadexAPI()
+        self.api = MangadexAPI(rate_limiter=self.rate_limiter)
 
     @staticmethod
     def parse_feed(entries: Iterable[ChapterResult]) -> list[Chapter]:
@@ -243,87 +243,33 @@ class MangaDex(BaseScraperWhole):
         self.dbutil.add_manga_authors(manga_author)
         self.dbutil.add_manga_artists(manga_artist)
 
-    def get_group_ids_by_mangadex_id(self, group_ids: Sequence[str]) -> dict[str, int]:
-        if len(group_ids) == 0:
-            return {}
-
-        format_args = self.dbutil.get_format_args(group_ids)
-        sql = f'SELECT mangadex_id::text, group_id FROM groups WHERE mangadex_id IN ({format_args})'
-        result: dict[str, int] = {}
-        for row in self.dbutil.execute(sql, group_ids, fetch=True):
-            result[row['mangadex_id']] = row['group_id']
-
-        return result
-
     def map_and_add_group_ids(self, entries: list[Chapter]) -> list[Chapter]:
         """
         Maps the correct group ids to the given chapters
         """
         valid_chapters: list[Chapter] = []
-        existing: dict[str, int] = {}
         no_group = [e for e in entries if not e.mangadex_group]
 
-        # Add group id to chapters and add them to valid_chapters
-        def map_chapters(chapters: list[Chapter]) -> list[Chapter]:
-            not_found: list[Chapter] = []
-            for c in reversed(chapters):
-                if not c.mangadex_group:
-                    continue
-
-                if c.mangadex_group.id not in existing:
-                    not_found.append(c)
-                    continue
-
-                c.group_id = existing[c.mangadex_group.id]
-                valid_chapters.append(c)
-
-            return not_found
-
-        # Find existing groups by mangadex id and add them
-        group_ids: set[str] = {c.mangadex_group.id for c in entries if c.mangadex_group}
-        existing = self.get_group_ids_by_mangadex_id(list(group_ids))
-        missing_group = map_chapters(entries)
-
-        # Find groups with duplicate name
-        existing_not_mangadex = self.dbutil.find_existing_groups([
-            c.group for c in missing_group if c.group
+        # Find or create the groups of the chapters by their mangadex ids
+        groups = self.dbutil.get_or_create_groups([
+            GroupPartial(name=c.mangadex_group.attributes.name, mangadex_id=c.mangadex_group.id)
+            for c in entries
+            if c.mangadex_group
         ])
+        existing = {cast(str, g.mangadex_id): g.group_id for g in groups}
 
-        # Set mangadex id for existing groups
-        do_mangadex_id_update: dict[str | None, Group] = {}
-        for group in existing_not_mangadex:
-            if group.mangadex_id is not None:
-                logger.warning(
-                    f'Duplicate group name found {group.name} with different id {group.mangadex_id}. Will be treated as the same group'
-                )
-
-            do_mangadex_id_update[group.name] = group
-
-        # Set mangadex id for existing groups and add group ids to chapters
-        if do_mangadex_id_update:
-            for chapter in missing_group:
-                found_group = do_mangadex_id_update.get(chapter.group)
-                if found_group is None or chapter.mangadex_group is None:
-                    continue
-
-                mangadex_id = chapter.mangadex_group.id
-                existing[mangadex_id] = found_group.group_id
-                found_group.mangadex_id = mangadex_id
-
-            self.dbutil.update_group_mangadex_ids(do_mangadex_id_update.values())
-
-            missing_group = map_chapters(missing_group)
+        # Add group id to chapters and add them to valid_chapters
+        missing_group: list[Chapter] = []
+        for c in reversed(entries):
+            if not c.mangadex_group:
+                continue
 
-        # Add new groups if they exist
-        if missing_group:
-            for group in self.dbutil.add_new_groups([
-                GroupPartial(name=c.mangadex_group.attributes.name, mangadex_id=c.mangadex_group.id)
-                for c in missing_group
-                if c.mangadex_group
-            ]):
-                existing[cast(str, group.mangadex_id)] = group.group_id
+            if c.mangadex_group.id not in existing:
+                missing_group.append(c)
+                continue
 
-            missing_group = map_chapters(missing_group)
+            c.group_id = existing[c.mangadex_group.id]
+            valid_chapters.append(c)
 
         # If no groups were found use No group
         if missing_group:
@@ -367,30 +313,49 @@ class MangaDex(BaseScraperWhole):
         Handles fetching the chapter feed and adding the results to the database
         and other required operations
         """
+        return self.fetch_then_persist(
+            lambda: self.fetch_update(service_id, feed_url, title_id, limit),
+            lambda update: self.persist_update(update, service_id),
+        )
+
+    def fetch_update(
+        self, service_id: int, feed_url: str, title_id: str | None, limit: int
+    ) -> tuple[list[Chapter], dict[str, MangaResult]] | None:
+        """
+        Fetches the new chapters and the info of their manga
+        """
         parsed = self.fetch_chapters(feed_url, title_id=title_id, limit=limit)
         if parsed is None:
             return None
 
-        if not parsed:
-            return ScrapeServiceRetVal()
+        entries = list(self.get_new_entries(service_id, parsed) or []) if parsed else []
+        if not entries:
+            return entries, {}
+
+        # Fetch for all manga as this information is used later on
+        return entries, self.fetch_manga_infos(list({e.title_id for e in entries}))
 
-        entries = self.get_new_entries(service_id, parsed)
+    def persist_update(
+        self, update: tuple[list[Chapter], dict[str, MangaResult]], service_id: int
+    ) -> ScrapeServiceRetVal:
+        """
+        Adds the fetched chapters and manga to the database
+        """
+        entries, manga_infos = update
         if not entries:
             return ScrapeServiceRetVal()
 
         # Add group ids to chapters
-        entries = self.map_and_add_group_ids(list(entries))
+        entries = self.map_and_add_group_ids(entries)
 
         titles = self.group_by_manga(entries)
 
         manga_ids: set[int] = set()
         chapters = self.map_already_added_titles(service_id, titles, manga_ids)
 
-        # Fetch manga title and other info and discard manga that were not found
-        # manga title set to temp as it will be replaced later
+        # Discard manga that were not found.
+        # Manga title set to temp as it will be replaced later
         mangas = self.titles_dict_to_manga_service(titles, service_id, True, manga_title='temp')
-        # Fetch for all manga as this information is used later on
-        manga_infos = self.fetch_manga_infos(list({e.title_id for e in entries}))
         idx = len(mangas)
         for m in reversed(mangas):
             idx -= 1
@@ -419,11 +384,10 @@ class MangaDex(BaseScraperWhole):
 
         # Update titles and manga infos for new chapters
         try:
-            format_args = self.dbutil.get_format_args(manga_ids)
-            sql = f'SELECT manga_id, title_id FROM manga_service WHERE manga_id IN ({format_args})'
+            sql = 'SELECT manga_id, title_id FROM manga_service WHERE manga_id = ANY(%s)'
             mangadex2db = {
                 row['title_id']: row['manga_id']
-                for row in self.dbutil.execute(sql, list(manga_ids))
+                for row in self.dbutil.execute(sql, (self.dbutil.array_arg(manga_ids),))
             }
             db2result: dict[int, MangaResult] = {}
 
@@ -1,15 +1,15 @@
 import logging
 from collections.abc import Iterable
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 from itertools import chain
 from typing import Generic, Literal, TypedDict, TypeVar
 
 import requests
 from pydantic import BaseModel, Field, field_validator, model_validator
-from ratelimit import rate_limited, sleep_and_retry
 
 from src.enums import Status as MangaStatus
+from src.utils.rate_limiter import TokenBucket
 from src.utils.utilities import dict_to_model, requests_session
 
 logger = logging.getLogger(__name__)
@@ -281,20 +281,18 @@ def request_to_model[TModel: BaseModel](
                 raise
 
 
-api_rate_limiter = rate_limited(5, 1)
-
-
 class MangadexAPI:
-    def __init__(self, url: str = 'https://api.mangadex.org'):
+    def __init__(
+        self, url: str = 'https://api.mangadex.org', rate_limiter: TokenBucket | None = None
+    ):
         self.base_url = url
+        self.rate_limiter = rate_limiter or TokenBucket(5, timedelta(seconds=1))
 
     @staticmethod
     def join_array(ids: list[str], key: str) -> str:
         key = key + '[]'
         return f'{key}={f"&{key}=".join(ids)}'
 
-    @sleep_and_retry
-    @api_rate_limiter
     def get_manga(
         self,
         manga_ids: str | list[str],
@@ -322,13 +320,12 @@ class MangadexAPI:
 
         params.append(f'limit={len(manga_ids)}')
 
+        self.rate_limiter.acquire()
         with requests_session() as session:
             r = session.get(f'{self.base_url}/manga?{"&".join(params)}')
 
             return request_to_model(r, MangaResult, continue_on_error=True)
 
-    @sleep_and_retry
-    @api_rate_limiter
     def get_chapters(
         self,
         sort_by: SortColumns,
@@ -364,6 +361,7 @@ class MangadexAPI:
 
         params.append(f'includeFutureUpdates={"1" if include_future_updates else "0"}')
 
+        self.rate_limiter.acquire()
         with requests_session() as session:
             r = session.get(f'{self.base_url}/chapter?{"&".join(params)}')
 
@@ -334,8 +334,8 @@ class MangaPlus(BaseScraperWhole):
 
         return int(match.groups()[0]), None
 
-    @staticmethod
-    def parse_series(title_id: str) -> ResponseWrapper | None:
+    def parse_series(self, title_id: str) -> ResponseWrapper | None:
+        self.rate_limiter.acquire()
         try:
             with requests_session() as session:
                 r = session.get(MangaPlus.API.format(title_id), headers=get_request_headers(), proxies=get_proxies())
@@ -349,8 +349,8 @@ class MangaPlus(BaseScraperWhole):
 
         return ResponseWrapper(r.content)
 
-    @staticmethod
-    def get_all_titles(api_url: str) -> AllTitlesViewWrapper | None:
+    def get_all_titles(self, api_url: str) -> AllTitlesViewWrapper | None:
+        self.rate_limiter.acquire()
         try:
             with requests_session() as session:
                 r = session.get(api_url, headers=get_request_headers(), proxies=get_proxies())
@@ -373,11 +373,13 @@ class MangaPlus(BaseScraperWhole):
         feed_url: str,
         last_update: datetime | None,
     ) -> ScrapeServiceRetVal | None:
-        self.dbutil.update_service_whole(service_id, timedelta(days=1) + self.min_update_interval())
-        all_titles = self.get_all_titles(feed_url)
-        if not all_titles:
-            return None
+        return self.fetch_then_persist(
+            lambda: self.get_all_titles(feed_url) or None,
+            lambda all_titles: self.add_new_titles(all_titles, service_id),
+        )
 
+    def add_new_titles(self, all_titles: AllTitlesViewWrapper, service_id: int) -> None:
+        self.dbutil.update_service_whole(service_id, timedelta(days=1) + self.min_update_interval())
         titles = all_titles.titles
         if not titles:
             return None
@@ -407,10 +409,14 @@ class MangaPlus(BaseScraperWhole):
     def scrape_series(
         self, title_id: str, service_id: int, manga_id: int, feed_url: str | None = None
     ) -> set[int] | None:
-        parsed = self.parse_series(title_id)
-        if parsed is None:
-            return None
+        return self.fetch_then_persist(
+            lambda: self.parse_series(title_id),
+            lambda parsed: self.handle_parsed_series(parsed, title_id, service_id, manga_id),
+        )
 
+    def handle_parsed_series(
+        self, parsed: ResponseWrapper, title_id: str, service_id: int, manga_id: int
+    ) -> set[int] | None:
         # If manga has been removed and returns not found disabled it.
         if parsed.error_result and parsed.error_result.english_popup.subject.lower() == 'not found':
             logger.info(f'MANGA Plus API returned not found for {title_id}. Disabling it.')
@@ -12,6 +12,7 @@ from lxml import etree
 from src.errors import FeedHttpError, InvalidFeedError
 from src.scrapers.base_scraper import BaseChapterSimple, BaseScraper
 from src.utils.utilities import (
+    FeedType,
     get_latest_chapters,
     is_valid_feed,
     match_title,
@@ -141,6 +142,13 @@ class Reddit(BaseScraper):
         if feed_url is None:
             raise ValueError('feed_url cannot be None')
 
+        return self.fetch_then_persist(
+            lambda: self.fetch_feed(feed_url),
+            lambda feed: self.add_feed_chapters(feed, service_id, manga_id, feed_url),
+        )
+
+    def fetch_feed(self, feed_url: str) -> FeedType | None:
+        self.rate_limiter.acquire()
         feed = feedparser.parse(feed_url)
         try:
             is_valid_feed(feed)
@@ -148,6 +156,11 @@ class Reddit(BaseScraper):
             logger.exception(f'Failed to fetch feed {feed_url}')
             return None
 
+        return feed
+
+    def add_feed_chapters(
+        self, feed: FeedType, service_id: int, manga_id: int, feed_url: str
+    ) -> set[int]:
         self.dbutil.set_manga_last_checked(service_id, manga_id, utcnow())
         self.dbutil.update_manga_next_update(service_id, manga_id, self.next_update())
 
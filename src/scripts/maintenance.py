@@ -34,6 +34,7 @@ if __name__ == '__main__':
             with conn.cursor() as cur:
                 if args.update_interval:
                     logger.info(f'Updating interval for {args.manga}')
+                    dbutil.rebuild_release_stats([args.manga], cur=cur)
                     dbutil.update_chapter_interval(args.manga, cur=cur)
 
                 if args.update_estimate:
@@ -1,6 +1,8 @@
 import contextlib
 import os
 import time
+from collections.abc import Generator
+from unittest.mock import patch
 
 import pytest
 from elasticsearch import Elasticsearch, NotFoundError
@@ -11,6 +13,8 @@ from src.setup_logging import setup
 from src.tests.scrapers.testing_scraper import DummyScraper, DummyScraper2
 from src.tests.testing_utils import Postgresql, create_db, get_conn, start_db, teardown_db
 from src.utils.dbutils import DbUtil
+from src.utils.group_cache import clear_group_cache
+from src.utils.known_chapters import set_known_chapters_enabled
 from src.utils.utilities import inject_service_values
 
 ELASTIC_INDEX = 'manga_test'
@@ -32,6 +36,20 @@ def es():
     client.close()
 
 
+@pytest.fixture(autouse=True)
+def _clear_caches() -> None:
+    # Tests modify chapters and groups directly in the database, which the caches would not see
+    set_known_chapters_enabled(False)
+    clear_group_cache()
+
+
+@pytest.fixture(autouse=True)
+def _skip_rate_limit_waits() -> Generator[None]:
+    # Scrapers wait for the rate limit of their service before every request
+    with patch('src.utils.rate_limiter.time.sleep'):
+        yield
+
+
 @pytest.fixture
 def esm(es: Elasticsearch) -> ElasticMethods:
     return ElasticMethods(es)
@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock
+
+from src.db.utilities import execute_values
+
+
+def test_execute_values_pages():
+    cur = MagicMock()
+    cur.fetchall.side_effect = lambda: [object()]
+    values = [(i, str(i)) for i in range(5)]
+
+    result: list[object] = execute_values(cur, 'INSERT INTO t VALUES %s', values, page_size=4, fetch=True)
+
+    assert len(result) == 2
+    statements = [c.args[0] for c in cur.execute.call_args_list]
+    assert statements == [
+        'INSERT INTO t VALUES (%s,%s),(%s,%s),(%s,%s),(%s,%s)',
+        'INSERT INTO t VALUES (%s,%s)',
+    ]
+
+    args = [arg for c in cur.execute.call_args_list for arg in c.args[1]]
+    assert args == [val for row in values for val in row]
+
+
+def test_execute_values_single_statement():
+    cur = MagicMock()
+    values = [(i,) for i in range(150)]
+
+    execute_values(cur, 'INSERT INTO t VALUES %s', values, page_size=len(values))
+
+    cur.execute.assert_called_once()
+
+
+def test_execute_values_prepares_many_pages():
+    cur = MagicMock()
+
+    execute_values(cur, 'INSERT INTO t VALUES %s', [(i,) for i in range(3)], page_size=1)
+    assert not any(c.kwargs['prepare'] for c in cur.execute.call_args_list)
+
+    cur.reset_mock()
+    execute_values(cur, 'INSERT INTO t VALUES %s', [(i,) for i in range(4)], page_size=1)
+    assert all(c.kwargs['prepare'] for c in cur.execute.call_args_list)
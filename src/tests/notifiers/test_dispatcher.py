@@ -0,0 +1,101 @@
+import threading
+import unittest
+from datetime import datetime, timezone
+from typing import override
+
+from src.db.models.notifications import InputField, NotificationOptions, UserNotification
+from src.enums import NotificationType
+from src.notifier.base_notifier import NotificationChapter, NotifierBase
+from src.notifier.dispatcher import NotificationDispatcher, NotificationJob, NotificationResult
+
+
+class RecordingNotifier(NotifierBase):
+    def __init__(self, sent: list[int], barrier: threading.Barrier | None = None):
+        self.sent = sent
+        self.barrier = barrier
+
+    @override
+    def send_notification(
+        self,
+        chapters: list[NotificationChapter],
+        options: NotificationOptions,
+        input_fields: list[InputField],
+    ) -> tuple[int, bool]:
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+
+        assert isinstance(options, UserNotification)
+        self.sent.append(options.notification_id)
+        return 1, True
+
+
+class FailingNotifier(NotifierBase):
+    @override
+    def send_notification(
+        self,
+        chapters: list[NotificationChapter],
+        options: NotificationOptions,
+        input_fields: list[InputField],
+    ) -> tuple[int, bool]:
+        raise Exception('mock error')
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    @staticmethod
+    def create_notification(notification_id: int, destination: str) -> UserNotification:
+        return UserNotification(
+            notification_id=notification_id,
+            notification_type=NotificationType.Webhook,
+            user_id=1,
+            times_run=0,
+            times_failed=0,
+            failed_in_row=0,
+            disabled=False,
+            created=datetime.now(timezone.utc),
+            destination=destination,
+            group_by_manga=False,
+        )
+
+    def test_keeps_destination_order(self):
+        dispatcher = NotificationDispatcher()
+        sent: list[int] = []
+        notifier = RecordingNotifier(sent)
+
+        jobs = [
+            NotificationJob(notifier, [], self.create_notification(i, 'https://localhost/hook'), [])
+            for i in range(10)
+        ]
+        results = dispatcher.dispatch(jobs)
+        dispatcher.close()
+
+        assert sent == list(range(10))
+        assert results == [NotificationResult(i, 1, True) for i in range(10)]
+
+    def test_sends_destinations_in_parallel(self):
+        dispatcher = NotificationDispatcher(max_workers=2, max_per_host=2)
+        sent: list[int] = []
+        # Both sends must be running at the same time to pass the barrier
+        notifier = RecordingNotifier(sent, threading.Barrier(2))
+
+        results = dispatcher.dispatch([
+            NotificationJob(notifier, [], self.create_notification(1, 'https://localhost/hook1'), []),
+            NotificationJob(notifier, [], self.create_notification(2, 'https://localhost/hook2'), []),
+        ])
+        dispatcher.close()
+
+        assert sorted(sent) == [1, 2]
+        assert all(result.success for result in results)
+
+    def test_failed_notification(self):
+        dispatcher = NotificationDispatcher()
+
+        results = dispatcher.dispatch([
+            NotificationJob(FailingNotifier(), [], self.create_notification(1, 'https://localhost/hook'), []),
+        ])
+        dispatcher.close()
+
+        assert results == [NotificationResult(1, 0, False)]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -209,6 +209,39 @@ class TestWebhook(unittest.TestCase):
         assert sent == expected_calls
         assert not success
 
+    @responses.activate
+    def test_webhook_retries_when_rate_limited(self):
+        test_url = 'https://localhost:3000'
+        responses.add(responses.POST, test_url, status=429, headers={'Retry-After': '0'})
+        responses.add(responses.POST, test_url, body='OK')
+
+        notifier = WebhookNotifier()
+        options = NotificationOptions(destination=test_url, group_by_manga=False)
+
+        sent, success = notifier.send_notification(
+            [self.get_notification_chapter()], options=options, input_fields=self.get_input_fields()
+        )
+
+        assert len(responses.calls) == 2
+        assert sent == 1
+        assert success
+
+    @responses.activate
+    def test_webhook_not_retried_when_retry_after_too_long(self):
+        test_url = 'https://localhost:3000'
+        responses.add(responses.POST, test_url, status=429, headers={'Retry-After': '3600'})
+
+        notifier = WebhookNotifier()
+        options = NotificationOptions(destination=test_url, group_by_manga=False)
+
+        sent, success = notifier.send_notification(
+            [self.get_notification_chapter()], options=options, input_fields=self.get_input_fields()
+        )
+
+        assert len(responses.calls) == 1
+        assert sent == 1
+        assert not success
+
 
 if __name__ == '__main__':
     unittest.main()
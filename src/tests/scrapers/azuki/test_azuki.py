@@ -11,6 +11,7 @@ import src.scrapers.azuki
 from src.constants import DEFAULT_RETRY_POLICY, NO_GROUP
 from src.scrapers.azuki import Azuki, ParsedChapter
 from src.tests.testing_utils import BaseTestClasses, ChapterTestModel
+from src.utils.rate_limiter import TokenBucket
 from src.utils.utilities import utctoday
 
 
@@ -129,6 +130,16 @@ class AzukiTest(BaseTestClasses.DatabaseTestCase, BaseTestClasses.ModelAssertion
     def get_scraper(self) -> Azuki:
         return Azuki(self.conn, self.dbutil)
 
+    @responses.activate
+    def test_fetch_url_waits_for_rate_limit(self):
+        url = Azuki.MANGA_URL_FORMAT.format('grand-blue-dreaming')
+        responses.add(responses.GET, url, body='')
+
+        with patch.object(TokenBucket, 'acquire') as acquire_mock:
+            assert self.get_scraper().fetch_url(url) is not None
+
+        acquire_mock.assert_called_once()
+
     @responses.activate
     def test_parse_manga_page(self):
         title_id = 'grand-blue-dreaming'
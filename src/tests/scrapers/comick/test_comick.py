@@ -16,6 +16,7 @@ from src.db.models.manga import MangaService
 from src.scrapers.comick.comick import Comick
 from src.scrapers.comick.comick_api import ChapterResultWithManga
 from src.tests.testing_utils import BaseTestClasses, ChapterTestModel
+from src.utils.group_cache import clear_group_cache
 
 TITLE_ID = 'xui1JrAT'  # Example title ID for testing fetching manga data
 
@@ -109,6 +110,7 @@ class ComickTests(BaseTestClasses.DatabaseTestCase, BaseTestClasses.ModelAsserti
             USING chapters
             WHERE chapters.group_id=groups.group_id AND chapters.service_id=%s
         """, (Comick.ID,))
+        clear_group_cache()
 
     def set_up_api(self):
         chapter_params = {
@@ -6,6 +6,7 @@ import responses
 from src.constants import NO_GROUP
 from src.scrapers.cubari import Cubari
 from src.tests.testing_utils import BaseTestClasses, ChapterTestModel
+from src.utils.group_cache import clear_group_cache
 
 TITLE_ID = 'gist/OPM'  # Example title ID for testing fetching manga data
 
@@ -64,6 +65,7 @@ class CubariTests(BaseTestClasses.DatabaseTestCase, BaseTestClasses.ModelAsserti
             USING chapters
             WHERE chapters.group_id=groups.group_id AND chapters.service_id=%s
         """, (Cubari.ID,))
+        clear_group_cache()
 
     @responses.activate
     def test_parse_manga_page(self):
@@ -17,6 +17,7 @@ from src.scrapers.mangadex import Chapter as MangaDexChapter
 from src.scrapers.mangadex import ChapterResult, MangaDex
 from src.tests.testing_utils import BaseTestClasses, ChapterTestModel
 from src.utils.dbutils import DbUtil
+from src.utils.group_cache import clear_group_cache
 from src.utils.utilities import utcnow
 
 correct_parsed_chapters = sorted([
@@ -152,6 +153,7 @@ class MangadexTests(BaseTestClasses.DatabaseTestCase, BaseTestClasses.ModelAsser
             USING chapters
             WHERE chapters.group_id=groups.group_id AND chapters.service_id=%s
         """, (MangaDex.ID,))
+        clear_group_cache()
 
     def set_up_api(self):
         responses.add(responses.GET, f'{self.API_URL}/chapter',
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+import pytest
+
+from src.batch_planner import BatchPlanner
+from src.db.models.services import ServiceConfig
+
+SERVICE_ID = 1
+
+
+def create_config(rate_limit: int = 1, rate_limit_period: timedelta = timedelta(seconds=6)) -> ServiceConfig:
+    return ServiceConfig(
+        service_id=SERVICE_ID,
+        rate_limit=rate_limit,
+        rate_limit_period=rate_limit_period,
+    )
+
+
+def create_service_config(service_id: int, rate_limit: int = 100) -> ServiceConfig:
+    return ServiceConfig(
+        service_id=service_id,
+        rate_limit=rate_limit,
+        rate_limit_period=timedelta(seconds=1),
+    )
+
+
+def test_batch_size_without_backlog():
+    planner = BatchPlanner()
+    assert planner.batch_sizes([(create_config(), 0)], timedelta(minutes=1), 1) == [0]
+
+
+def test_batch_size_drains_small_backlog():
+    planner = BatchPlanner()
+    assert planner.batch_sizes([(create_config(), 3)], timedelta(minutes=1), 1) == [3]
+
+
+def test_batch_size_limited_by_rate_limit():
+    planner = BatchPlanner()
+    # 1 series per 6 seconds fits 10 series in a minute
+    assert planner.batch_sizes([(create_config(), 1000)], timedelta(minutes=1), 4) == [10]
+
+
+def test_batch_size_limited_by_latency():
+    planner = BatchPlanner()
+    planner.record_latency(SERVICE_ID, timedelta(seconds=20))
+
+    assert planner.batch_sizes([(create_config(rate_limit=10), 1000)], timedelta(minutes=1), 4) == [3]
+
+
+def test_batch_size_uses_time_until_next_run():
+    planner = BatchPlanner()
+    assert planner.batch_sizes([(create_config(), 1000)], timedelta(minutes=5), 1) == [50]
+
+
+def test_batch_size_scrapes_at_least_one_series():
+    planner = BatchPlanner()
+    planner.record_latency(SERVICE_ID, timedelta(minutes=1))
+
+    assert planner.batch_sizes([(create_config(), 1000)], timedelta(seconds=10), 1) == [BatchPlanner.MIN_BATCH_SIZE]
+
+
+def test_batch_size_capped():
+    planner = BatchPlanner()
+    planner.record_latency(SERVICE_ID, timedelta(seconds=0))
+
+    config = create_config(rate_limit=100, rate_limit_period=timedelta(seconds=1))
+    assert planner.batch_sizes([(config, 10_000)], timedelta(hours=10), 1) == [BatchPlanner.MAX_BATCH_SIZE]
+
+
+def test_batch_sizes_share_workers():
+    planner = BatchPlanner()
+    configs = [create_service_config(service_id) for service_id in range(4)]
+    for config in configs:
+        planner.record_latency(config.service_id, timedelta(seconds=1))
+
+    # 2 workers give 120 seconds of scraping in a minute, divided between 4 services
+    sizes = planner.batch_sizes([(config, 1000) for config in configs], timedelta(minutes=1), 2)
+    assert sizes == [30, 30, 30, 30]
+
+
+def test_batch_sizes_give_unused_time_to_other_services():
+    planner = BatchPlanner()
+    configs = [create_service_config(service_id) for service_id in range(3)]
+    for config in configs:
+        planner.record_latency(config.service_id, timedelta(seconds=1))
+
+    # The small backlog only uses 10 seconds, so the others split the remaining 110 seconds
+    sizes = planner.batch_sizes(
+        [(configs[0], 1000), (configs[1], 10), (configs[2], 1000)], timedelta(minutes=1), 2
+    )
+    assert sizes == [55, 10, 55]
+
+
+def test_latency_moving_average():
+    planner = BatchPlanner()
+    assert planner.get_latency(SERVICE_ID) == BatchPlanner.DEFAULT_LATENCY
+
+    planner.record_latency(SERVICE_ID, timedelta(seconds=10))
+    assert planner.get_latency(SERVICE_ID) == timedelta(seconds=10)
+
+    planner.record_latency(SERVICE_ID, timedelta(seconds=20))
+    expected = BatchPlanner.LATENCY_SMOOTHING * 20 + (1 - BatchPlanner.LATENCY_SMOOTHING) * 10
+    assert planner.get_latency(SERVICE_ID).total_seconds() == pytest.approx(expected)
@@ -0,0 +1,163 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from src.dirty_manga import DirtyManga
+from src.tests.scrapers.testing_scraper import DummyScraper
+from src.tests.testing_utils import BaseTestClasses
+from src.utils.utilities import utcnow
+
+
+def test_calculate_next_update_before_release():
+    now = utcnow()
+    latest_release = now + timedelta(days=1)
+
+    assert DirtyManga.calculate_next_update(
+        latest_release, timedelta(days=7), timedelta(hours=1), now
+    ) == latest_release + timedelta(days=7)
+
+
+def test_calculate_next_update_late_release():
+    now = utcnow()
+
+    assert DirtyManga.calculate_next_update(
+        now - timedelta(days=6), timedelta(days=7), timedelta(hours=1), now
+    ) == now + timedelta(hours=6)
+
+
+def test_calculate_next_update_skips_missed_releases():
+    now = utcnow()
+    latest_release = now - timedelta(days=20)
+
+    assert DirtyManga.calculate_next_update(
+        latest_release, timedelta(days=7), timedelta(hours=1), now
+    ) == latest_release + timedelta(days=21)
+
+
+class DirtyMangaTest(BaseTestClasses.DatabaseTestCase):
+    def test_flush_without_updates(self):
+        DirtyManga().flush(self.dbutil)
+
+    def test_flush_writes_collected_updates(self):
+        ms = self.create_manga_service()
+        release_date = utcnow() - timedelta(days=1)
+        chapter = self.create_db_chapter_objects(ms, 1)[0]
+        chapter.chapter_number = 5
+        chapter.release_date = release_date
+        self.dbutil.add_chapters([chapter])
+        self.dbutil.execute(
+            'UPDATE manga SET release_interval=%s WHERE manga_id=%s',
+            (timedelta(days=7), ms.manga_id)
+        )
+
+        dirty_manga = DirtyManga()
+        checked = utcnow()
+        dirty_manga.add_latest_chapters([(ms.manga_id, 4, release_date), (ms.manga_id, 5, release_date)])
+        dirty_manga.schedule_next_update(ms.service_id, ms.manga_id, timedelta(hours=1))
+        dirty_manga.set_last_checked(ms.service_id, ms.manga_id, checked)
+        dirty_manga.flush(self.dbutil)
+
+        manga = self.get_manga_db(ms.manga_id)
+        assert manga.latest_chapter == 5
+        self.assertDatesEqual(manga.latest_release, release_date)
+
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        self.assertDatesEqual(found.last_check, checked)
+        self.assertDatesEqual(
+            found.next_update, release_date + timedelta(days=7) + DirtyManga.NEXT_UPDATE_MARGIN
+        )
+
+        # Flushing clears the collected updates
+        self.dbutil.update_manga_next_update(ms.service_id, ms.manga_id, checked)
+        dirty_manga.flush(self.dbutil)
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        self.assertDatesEqual(found.next_update, checked)
+
+    def test_flush_coalesces_checks(self):
+        ms = self.create_manga_service()
+        dirty_manga = DirtyManga()
+        now = utcnow()
+
+        dirty_manga.set_next_update(ms.service_id, ms.manga_id, now + timedelta(hours=1))
+        dirty_manga.set_last_checked(ms.service_id, ms.manga_id, now - timedelta(minutes=1))
+        dirty_manga.set_last_checked(ms.service_id, ms.manga_id, now)
+        # Disabled until is in the past, so that other tests can still scrape the service
+        dirty_manga.set_service_checked(DummyScraper.ID, now, now - timedelta(minutes=1))
+
+        with patch.object(self.dbutil, 'update_manga_service_checks', wraps=self.dbutil.update_manga_service_checks) as checks_mock:
+            dirty_manga.flush(self.dbutil)
+
+        checks_mock.assert_called_once()
+        assert checks_mock.call_args.args[0] == [(ms.service_id, ms.manga_id, now, now + timedelta(hours=1), False, False)]
+
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        self.assertDatesEqual(found.last_check, now)
+        self.assertDatesEqual(found.next_update, now + timedelta(hours=1))
+
+        service = self.dbutil.get_service(DummyScraper.ID)
+        assert service is not None
+        self.assertDatesEqual(service.last_check, now)
+        self.assertDatesEqual(service.disabled_until, now - timedelta(minutes=1))
+
+    def get_claimed_until(self, service_id: int, manga_id: int) -> datetime | None:
+        return self.dbutil.execute(
+            'SELECT claimed_until FROM manga_service WHERE service_id=%s AND manga_id=%s',
+            (service_id, manga_id)
+        )[0]['claimed_until']
+
+    def test_flush_releases_claims_with_next_updates(self):
+        ms = self.create_manga_service()
+        now = utcnow()
+        self.dbutil.execute(
+            'UPDATE manga_service SET claimed_until=%s WHERE service_id=%s AND manga_id=%s',
+            (now + timedelta(minutes=30), ms.service_id, ms.manga_id)
+        )
+
+        dirty_manga = DirtyManga()
+        dirty_manga.set_next_update(ms.service_id, ms.manga_id, now + timedelta(hours=1))
+        dirty_manga.release_claims(ms.service_id, [ms.manga_id])
+
+        # The claim is kept until the next update has been written
+        assert self.get_claimed_until(ms.service_id, ms.manga_id) is not None
+
+        dirty_manga.flush(self.dbutil)
+
+        assert self.get_claimed_until(ms.service_id, ms.manga_id) is None
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        self.assertDatesEqual(found.next_update, now + timedelta(hours=1))
+
+    def test_flush_disables_and_releases_claims(self):
+        ms = self.create_manga_service()
+        now = utcnow()
+        self.dbutil.execute(
+            'UPDATE manga_service SET claimed_until=%s WHERE service_id=%s AND manga_id=%s',
+            (now + timedelta(minutes=30), ms.service_id, ms.manga_id)
+        )
+
+        dirty_manga = DirtyManga()
+        dirty_manga.disable(ms.service_id, ms.manga_id)
+        dirty_manga.release_claims(ms.service_id, [ms.manga_id])
+
+        # Nothing is written before flushing
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        assert not found.disabled
+
+        with patch.object(self.dbutil, 'update_manga_service_checks', wraps=self.dbutil.update_manga_service_checks) as checks_mock:
+            dirty_manga.flush(self.dbutil)
+
+        checks_mock.assert_called_once()
+        assert checks_mock.call_args.args[0] == [(ms.service_id, ms.manga_id, None, None, True, True)]
+
+        found = self.dbutil.get_manga_service(ms.service_id, ms.title_id)
+        assert found is not None
+        assert found.disabled
+        assert self.get_claimed_until(ms.service_id, ms.manga_id) is None
+
+
+if __name__ == '__main__':
+    unittest.main()
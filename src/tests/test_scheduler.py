@@ -1,19 +1,27 @@
+import asyncio
+import threading
+import time
 import unittest
-from datetime import timedelta
+from contextlib import AbstractContextManager
+from datetime import datetime, timedelta
 from typing import cast, override
 from unittest import mock
 from unittest.mock import MagicMock, patch
 
 import psycopg
 import pytest
+from psycopg.pq import TransactionStatus
 from psycopg.rows import class_row
 
 from src.db.models.manga import MangaServiceWithId
 from src.db.models.notifications import PartialNotificationInfo, UserNotification
 from src.db.models.scheduled_run import ScheduledRun, ScheduledRunResult
+from src.dirty_manga import DirtyManga
 from src.notifier import DiscordEmbedWebhookNotifier
+from src.run_guard import RunGuard, RunOverlapPolicy
 from src.scheduler import MangaServiceInfo, UpdateScheduler
 from src.scrapers import SCRAPERS, MangaDex, MangaPlus
+from src.scrapers.base_scraper import ScrapeServiceRetVal
 from src.tests.scrapers.testing_scraper import DummyScraper, DummyScraper2
 from src.tests.testing_utils import (
     EMPTY_SCRAPE_SERVICE,
@@ -22,6 +30,7 @@ from src.tests.testing_utils import (
     set_db_environ,
     spy_on,
 )
+from src.utils.known_chapters import get_known_chapters, known_chapters_enabled
 from src.utils.utilities import utcnow
 
 
@@ -86,6 +95,44 @@ class SchedulerRunTest(BaseTestClasses.DatabaseTestCase):
         assert not self.dbutil.get_scheduled_runs()
         self.dbutil.execute('TRUNCATE TABLE scheduled_runs')
 
+    def test_scheduled_runs_skips_claimed_runs(self):
+        manga_id = 1
+        self.dbutil.add_scheduled_runs([ScheduledRun(manga_id=manga_id, service_id=MangaPlus.ID)])
+        # Simulate another worker running the scheduled run
+        self.dbutil.claim_scheduled_runs([(manga_id, MangaPlus.ID)], timedelta(minutes=5))
+
+        try:
+            assert not self.dbutil.get_scheduled_runs()
+            assert self.scheduler.do_scheduled_runs() == EMPTY_SCRAPE_SERVICE
+            self.scraper1.scrape_series.assert_not_called()  # type: ignore[union-attr]
+            assert self.dbutil.get_all_scheduled_runs()
+        finally:
+            self.dbutil.execute('TRUNCATE TABLE scheduled_runs')
+
+    def test_scheduled_runs_run_concurrently(self):
+        manga_id = 1
+        reset_cooldown_sql = 'UPDATE services SET scheduled_runs_disabled_until=NULL WHERE service_id=ANY(%s)'
+        self.dbutil.execute(reset_cooldown_sql, ([MangaPlus.ID, MangaDex.ID],))
+        self.dbutil.add_scheduled_runs([
+            ScheduledRun(manga_id=manga_id, service_id=MangaPlus.ID),
+            ScheduledRun(manga_id=manga_id, service_id=MangaDex.ID)]
+        )
+
+        # The barrier only passes if both runs are in progress at the same time
+        barrier = threading.Barrier(2, timeout=10)
+
+        def scrape_series(*_, **__) -> list[int]:
+            barrier.wait()
+            return []
+
+        self.scraper1.scrape_series.side_effect = scrape_series  # type: ignore[union-attr]
+        self.scraper2.scrape_series.side_effect = scrape_series  # type: ignore[union-attr]
+
+        assert self.scheduler.do_scheduled_runs() == ([manga_id, manga_id], [])
+        assert not barrier.broken
+        assert not self.dbutil.get_all_scheduled_runs()
+        self.dbutil.execute(reset_cooldown_sql, ([MangaPlus.ID, MangaDex.ID],))
+
     def test_scheduled_runs_limit(self):
         limit = 1
         DummyScraper.CONFIG.scheduled_runs_enabled = True
@@ -168,6 +215,315 @@ class SchedulerRunTest(BaseTestClasses.DatabaseTestCase):
             self.dbutil.execute(sql, [DummyScraper.ID])
             self.dbutil.execute('TRUNCATE TABLE scheduled_runs')
 
+    def test_get_next_update_matches_full_scan(self):
+        now = utcnow()
+        ms1 = self.create_manga_service(DummyScraper)
+        ms2 = self.create_manga_service(DummyScraper)
+        self.dbutil.update_manga_next_update(ms1.service_id, ms1.manga_id, now - timedelta(days=3650))
+        self.dbutil.update_manga_next_update(ms2.service_id, ms2.manga_id, now + timedelta(days=1))
+
+        sql = """
+            SELECT MIN(t.update) AS update FROM (
+                SELECT
+                   LEAST(
+                       GREATEST(MIN(ms.next_update), s.disabled_until),
+                       (
+                           SELECT MIN(GREATEST(sw.next_update, s2.disabled_until))
+                           FROM service_whole sw
+                               INNER JOIN services s2 ON s2.service_id = sw.service_id
+                           WHERE s2.disabled=FALSE
+                       )
+                   ) AS update
+                FROM manga_service ms
+                INNER JOIN services s ON s.service_id = ms.service_id
+                WHERE s.disabled=FALSE AND ms.disabled=FALSE
+                GROUP BY s.service_id, ms.service_id
+            ) AS t
+        """
+        expected = self.dbutil.execute(sql)[0]['update']
+
+        assert expected is not None
+        self.assertDatesEqual(UpdateScheduler.get_next_update(self.conn), expected)
+
+        self.dbutil.execute('UPDATE manga_service SET disabled=TRUE WHERE manga_id=ANY(%s)', ([ms1.manga_id, ms2.manga_id],))
+
+    def test_get_sleep_time(self):
+        scheduler = self.scheduler
+        assert scheduler.get_sleep_time(None) == scheduler.MAX_SLEEP
+        assert scheduler.get_sleep_time(utcnow() - timedelta(hours=1)) == scheduler.MIN_SLEEP
+        assert scheduler.get_sleep_time(utcnow() + timedelta(days=1)) == scheduler.MAX_SLEEP
+
+        sleep_time = scheduler.get_sleep_time(utcnow() + timedelta(minutes=1))
+        assert timedelta(seconds=55) < sleep_time <= timedelta(minutes=1)
+
+    def test_run_forever_runs_until_stopped(self):
+        runs = 0
+
+        def run_once(_time_until_next_run: timedelta | None) -> datetime:
+            nonlocal runs
+            runs += 1
+            if runs == 2:
+                self.scheduler.stop()
+
+            return utcnow()
+
+        try:
+            with patch.object(self.scheduler, 'run_once', side_effect=run_once), \
+                    patch.object(self.scheduler, 'MIN_SLEEP', timedelta(0)):
+                self.scheduler.run_forever()
+        finally:
+            self.scheduler._stop_event.clear()
+
+        assert runs == 2
+
+    def test_run_forever_plans_batches_for_run_interval(self):
+        def run_once(_time_until_next_run: timedelta | None) -> datetime:
+            self.scheduler.stop()
+            return utcnow()
+
+        try:
+            with patch.object(self.scheduler, 'run_once', side_effect=run_once) as run_once_mock:
+                self.scheduler.run_forever()
+        finally:
+            self.scheduler._stop_event.clear()
+
+        run_once_mock.assert_called_once_with(self.scheduler.RUN_INTERVAL)
+
+    def test_run_forever_continues_after_error(self):
+        runs = 0
+
+        def run_once(_time_until_next_run: timedelta | None) -> datetime:
+            nonlocal runs
+            runs += 1
+            if runs == 1:
+                raise ValueError('mock error')
+
+            self.scheduler.stop()
+            return utcnow()
+
+        try:
+            with patch.object(self.scheduler, 'run_once', side_effect=run_once), \
+                    patch.object(self.scheduler, 'MAX_SLEEP', timedelta(0)):
+                self.scheduler.run_forever()
+        finally:
+            self.scheduler._stop_event.clear()
+
+        assert runs == 2
+
+    def test_listen_scheduled_runs_runs_on_insert(self):
+        started = threading.Event()
+
+        def run_scheduled_runs() -> None:
+            started.set()
+            self.scheduler.stop()
+
+        try:
+            with patch.object(self.scheduler, 'run_scheduled_runs', side_effect=run_scheduled_runs), \
+                    patch.object(self.scheduler, 'LISTEN_TIMEOUT', timedelta(milliseconds=100)), \
+                    patch.object(self.scheduler, 'SCHEDULED_RUN_DEBOUNCE', timedelta(0)):
+                listener = threading.Thread(target=self.scheduler.listen_scheduled_runs)
+                listener.start()
+
+                # Notifications sent before the listener has started listening are lost
+                for _ in range(50):
+                    self.dbutil.add_scheduled_runs([ScheduledRun(manga_id=1, service_id=MangaPlus.ID)])
+                    if started.wait(0.1):
+                        break
+
+                listener.join(timeout=5)
+        finally:
+            self.scheduler._stop_event.clear()
+            self.dbutil.execute('TRUNCATE TABLE scheduled_runs')
+
+        assert started.is_set()
+        assert not listener.is_alive()
+
+    def test_listen_scheduled_runs_clears_removed_chapters(self):
+        ms = self.create_manga_service(DummyScraper)
+        chapter = self.create_chapters(ms, 1)[0]
+        listener = threading.Thread(target=self.scheduler.listen_scheduled_runs)
+
+        try:
+            with patch.object(self.scheduler, 'LISTEN_TIMEOUT', timedelta(milliseconds=100)):
+                listener.start()
+                for _ in range(50):
+                    if known_chapters_enabled():
+                        break
+                    time.sleep(0.1)
+
+                # Known chapters are only used while removed chapters are listened for
+                assert known_chapters_enabled()
+
+                known = get_known_chapters(ms.service_id)
+                self.dbutil.execute('DELETE FROM chapters WHERE chapter_id=%s', (chapter.chapter_id,))
+                for _ in range(50):
+                    if get_known_chapters(ms.service_id) is not known:
+                        break
+                    time.sleep(0.1)
+
+                assert get_known_chapters(ms.service_id) is not known
+        finally:
+            self.scheduler.stop()
+            listener.join(timeout=5)
+            self.scheduler._stop_event.clear()
+
+        assert not known_chapters_enabled()
+
+    def get_overlap_count(self) -> int:
+        return self.dbutil.execute('SELECT overlap_count FROM scheduler_run_state')[0]['overlap_count']
+
+    def test_run_guarded_skips_overlapping_run(self):
+        overlaps = self.get_overlap_count()
+        # Simulate another instance holding the run lock
+        self.dbutil.execute('SELECT pg_advisory_lock(%s)', (RunGuard.LOCK_KEY,))
+        try:
+            with patch.object(self.scheduler.run_guard, 'policy', RunOverlapPolicy.SKIP), \
+                    patch.object(self.scheduler, 'run_once') as run_once_mock:
+                assert self.scheduler.run_guarded() is None
+        finally:
+            self.dbutil.execute('SELECT pg_advisory_unlock(%s)', (RunGuard.LOCK_KEY,))
+
+        run_once_mock.assert_not_called()
+        assert self.get_overlap_count() == overlaps + 1
+
+    def test_run_guarded_concurrent_ignores_run_lock(self):
+        overlaps = self.get_overlap_count()
+        next_update = utcnow()
+        # Simulate another worker running at the same time
+        self.dbutil.execute('SELECT pg_advisory_lock(%s)', (RunGuard.LOCK_KEY,))
+        try:
+            with patch.object(self.scheduler.run_guard, 'policy', RunOverlapPolicy.CONCURRENT), \
+                    patch.object(self.scheduler, 'run_once', return_value=next_update) as run_once_mock:
+                assert self.scheduler.run_guarded() == next_update
+        finally:
+            self.dbutil.execute('SELECT pg_advisory_unlock(%s)', (RunGuard.LOCK_KEY,))
+
+        run_once_mock.assert_called_once()
+        assert self.get_overlap_count() == overlaps
+
+    def test_run_guarded_coalesces_overlapping_runs(self):
+        next_update = utcnow()
+        other_instance = RunGuard(self.scheduler.pool, RunOverlapPolicy.COALESCE)
+        other_run = MagicMock()
+        runs = 0
+
+        def run_once(_time_until_next_run: timedelta | None) -> datetime:
+            nonlocal runs
+            runs += 1
+            if runs == 1:
+                # Both overlapping runs are coalesced into a single extra run
+                assert other_instance.run(other_run) is None
+                assert other_instance.run(other_run) is None
+
+            return next_update
+
+        with patch.object(self.scheduler.run_guard, 'policy', RunOverlapPolicy.COALESCE), \
+                patch.object(self.scheduler, 'run_once', side_effect=run_once):
+            assert self.scheduler.run_guarded() == next_update
+
+        other_run.assert_not_called()
+        assert runs == 2
+
+    def get_outbox(self, chapter_ids: list[int]) -> list[dict]:
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            cur.execute(
+                'SELECT chapter_id, notification_id, attempts, next_attempt FROM notification_outbox '
+                'WHERE chapter_id = ANY(%s) ORDER BY chapter_id',
+                (chapter_ids,)
+            )
+            return cur.fetchall()
+
+    @patch.object(DiscordEmbedWebhookNotifier, 'send_notification')
+    def test_deliver_notifications(self, notify_mock: MagicMock):
+        self.dbutil.execute('DELETE FROM notification_outbox')
+        ms = self.create_manga_service()
+        notif1 = self.create_notification()
+        self.create_notification_manga(notif1.notification_id, ms.manga_id)
+        notif2 = self.create_notification()
+        self.create_notification_manga(notif2.notification_id, ms.manga_id)
+
+        # Inserting chapters adds them to the outbox
+        chapter_ids = [cast(int, c.chapter_id) for c in self.create_chapters(ms, 2)]
+        outbox = self.get_outbox(chapter_ids)
+        assert [(r['chapter_id'], r['notification_id']) for r in outbox] == [(c, None) for c in chapter_ids]
+
+        def send_notification(chapters: list, notification: UserNotification, _input_fields: list) -> tuple[int, bool]:
+            return len(chapters), notification.notification_id != notif2.notification_id
+
+        notify_mock.side_effect = send_notification
+        start = utcnow()
+        assert self.scheduler.deliver_notifications() == 2
+        assert notify_mock.call_count == 2
+
+        # Only the failed notification is retried
+        outbox = self.get_outbox(chapter_ids)
+        assert [(r['chapter_id'], r['notification_id'], r['attempts']) for r in outbox] == [
+            (c, notif2.notification_id, 1) for c in chapter_ids
+        ]
+        for row in outbox:
+            assert row['next_attempt'] >= start + self.scheduler.NOTIFICATION_RETRY_DELAY
+
+        # Retries are not delivered before they are due
+        notify_mock.reset_mock()
+        assert self.scheduler.deliver_notifications() == 0
+        notify_mock.assert_not_called()
+
+        self.dbutil.execute('UPDATE notification_outbox SET next_attempt=NOW() WHERE chapter_id = ANY(%s)', (chapter_ids,))
+        notify_mock.side_effect = None
+        notify_mock.return_value = 2, True
+        assert self.scheduler.deliver_notifications() == 2
+
+        notify_mock.assert_called_once()
+        assert notify_mock.call_args.args[1].notification_id == notif2.notification_id
+        assert len(notify_mock.call_args.args[0]) == 2
+        assert self.get_outbox(chapter_ids) == []
+
+        info = self.dbutil.get_notification_info(notif2.notification_id)
+        assert info.times_run == 4
+        assert info.times_failed == 1
+        assert info.failed_in_row == 0
+
+    def test_deliver_notifications_drops_after_max_attempts(self):
+        self.dbutil.execute('DELETE FROM notification_outbox')
+        ms = self.create_manga_service()
+        notif = self.create_notification()
+        self.create_notification_manga(notif.notification_id, ms.manga_id)
+        chapter_ids = [cast(int, c.chapter_id) for c in self.create_chapters(ms, 1)]
+        self.dbutil.execute(
+            'UPDATE notification_outbox SET notification_id=%s, attempts=%s WHERE chapter_id = ANY(%s)',
+            (notif.notification_id, self.scheduler.NOTIFICATION_MAX_ATTEMPTS - 1, chapter_ids)
+        )
+
+        with patch.object(DiscordEmbedWebhookNotifier, 'send_notification', return_value=(0, False)) as notify_mock:
+            assert self.scheduler.deliver_notifications() == 1
+
+        notify_mock.assert_called_once()
+        assert self.get_outbox(chapter_ids) == []
+
+    def test_request_notification_delivery_coalesces_requests(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def deliver() -> int:
+            started.set()
+            release.wait(5)
+            return 0
+
+        with patch.object(self.scheduler, 'deliver_notifications', side_effect=deliver) as deliver_mock:
+            running = self.scheduler.request_notification_delivery()
+            assert started.wait(5)
+
+            # The running delivery might miss new entries, so a new one is queued
+            queued = self.scheduler.request_notification_delivery()
+            assert queued is not running
+            assert self.scheduler.request_notification_delivery() is queued
+
+            release.set()
+            running.result()
+            queued.result()
+
+        assert deliver_mock.call_count == 2
+
     @patch.object(DiscordEmbedWebhookNotifier, 'send_notification')
     def test_send_notifications(self, notify_mock: MagicMock):
         ms1 = self.create_manga_service()
@@ -264,18 +620,106 @@ class SchedulerScrapeServiceTest(BaseTestClasses.DatabaseTestCase):
             'feed_url': ms.feed_url
         }
 
-    def test_scrape_service_successfully(self):
+    def test_fetch_then_persist_fetches_outside_transaction(self):
+        statuses: list[TransactionStatus] = []
+
+        with self.scheduler.conn(autocommit=True) as conn:
+            scraper = DummyScraper(conn, self.dbutil)
+
+            def fetch() -> int:
+                statuses.append(conn.info.transaction_status)
+                return 1
+
+            def persist(fetched: int) -> int:
+                statuses.append(conn.info.transaction_status)
+                return fetched + 1
+
+            assert scraper.fetch_then_persist(fetch, persist) == 2
+            assert scraper.fetch_then_persist(lambda: None, persist) is None
+
+        assert statuses == [TransactionStatus.IDLE, TransactionStatus.INTRANS]
+
+    def test_scrape_whole_service(self):
+        ms1 = self.create_manga_service(DummyScraper)
+        self.scraper1.scrape_service.return_value = ScrapeServiceRetVal(  # type: ignore[union-attr]
+            manga_ids={ms1.manga_id}, chapter_ids={1, 2}
+        )
+
+        manga_ids, chapter_ids = self.scheduler.scrape_whole_service(
+            MangaPlus.ID, MangaPlus.FEED_URL, MangaPlus.URL
+        )
+
+        assert manga_ids == {ms1.manga_id}
+        assert sorted(chapter_ids) == [1, 2]
+        self.scraper1.scrape_service.assert_called_once_with(MangaPlus.ID, MangaPlus.FEED_URL, None)  # type: ignore[union-attr]
+        self.scraper1.set_checked.assert_called_once_with(MangaPlus.ID)  # type: ignore[union-attr]
+
+    def test_scrape_whole_service_error_is_isolated(self):
+        self.scraper1.scrape_service.side_effect = Exception('mock error')  # type: ignore[union-attr]
+
+        assert self.scheduler.scrape_whole_service(
+            MangaPlus.ID, MangaPlus.FEED_URL, MangaPlus.URL
+        ) == (set(), [])
+        self.scraper1.set_checked.assert_called_once_with(MangaPlus.ID)  # type: ignore[union-attr]
+
+    def test_scrape_whole_service_without_scraper(self):
+        assert self.scheduler.scrape_whole_service(-1, 'feed', 'invalid_url') == (set(), [])
+
+    def patch_batch_sizes(self, batch_size: int) -> AbstractContextManager[MagicMock]:
+        def batch_sizes(services: list, *_) -> list[int]:
+            return [batch_size] * len(services)
+
+        return patch.object(self.scheduler.batch_planner, 'batch_sizes', side_effect=batch_sizes)
+
+    def test_get_series_batches_returns_most_overdue_first(self):
+        now = utcnow()
+        mss = [self.create_manga_service(DummyScraper2) for _ in range(3)]
+        for idx, ms in enumerate(mss):
+            self.dbutil.update_manga_next_update(ms.service_id, ms.manga_id, now - timedelta(days=idx + 1))
+
+        with self.patch_batch_sizes(1000), \
+                self.scheduler.conn() as conn:
+            batches = {service_id: infos for service_id, _, infos in self.scheduler.get_series_batches(conn)}
+
+        expected = [ms.title_id for ms in reversed(mss)]
+        title_ids = [info['title_id'] for info in batches[DummyScraper2.ID]]
+        assert [title_id for title_id in title_ids if title_id in expected] == expected
+
+        # Claimed series are not returned again until released
+        with self.patch_batch_sizes(1000), \
+                self.scheduler.conn() as conn:
+            batches = {service_id: infos for service_id, _, infos in self.scheduler.get_series_batches(conn)}
+
+        claimed_titles = [info['title_id'] for info in batches.get(DummyScraper2.ID, [])]
+        assert not set(claimed_titles).intersection(expected)
+
+        self.dbutil.release_manga_service_claims(DummyScraper2.ID, [ms.manga_id for ms in mss])
+
+        with self.patch_batch_sizes(1), \
+                self.scheduler.conn() as conn:
+            batches = {service_id: infos for service_id, _, infos in self.scheduler.get_series_batches(conn)}
+
+        assert len(batches[DummyScraper2.ID]) == 1
+        assert all(len(infos) == 1 for infos in batches.values())
+
+        self.dbutil.execute('UPDATE manga_service SET claimed_until=NULL')
+        for ms in mss:
+            self.dbutil.execute('UPDATE manga_service SET disabled=TRUE WHERE manga_id=%s', (ms.manga_id,))
+
+    def test_scrape_series_async_successfully(self):
         ms1 = self.create_manga_service(DummyScraper)
         mock_chapters = [1, 2, 3]
         self.scraper1.scrape_series.return_value = mock_chapters  # type: ignore[union-attr]
 
-        manga_info = self.create_manga_info(ms1)
-
-        manga_ids, chapter_ids = self.scheduler.scrape_series(
-            DummyScraper.ID,
-            lambda *_, **__: self.scraper1,  # type: ignore[arg-type]
-            [manga_info]
-        )
+        manga_ids, chapter_ids = asyncio.run_coroutine_threadsafe(
+            self.scheduler.scrape_series_async(
+                DummyScraper.ID,
+                lambda *_, **__: self.scraper1,  # type: ignore[arg-type]
+                [self.create_manga_info(ms1)],
+                DirtyManga(),
+            ),
+            self.scheduler._loop
+        ).result()
 
         assert manga_ids == {ms1.manga_id}
         assert chapter_ids == mock_chapters
@@ -283,7 +727,7 @@ class SchedulerScrapeServiceTest(BaseTestClasses.DatabaseTestCase):
         assert self.scraper1.scrape_series.call_count == 1  # type: ignore[union-attr]
         assert self.scraper1.set_checked.call_count == 1  # type: ignore[union-attr]
 
-    def test_scrape_service_stops_after_2_errors(self):
+    def test_scrape_series_async_stops_after_2_errors(self):
         ms1 = self.create_manga_service(DummyScraper)
         assert ms1.next_update is None
 
@@ -292,11 +736,16 @@ class SchedulerScrapeServiceTest(BaseTestClasses.DatabaseTestCase):
         self.scraper1.next_update.return_value = next_update  # type: ignore[union-attr]
 
         manga_info = self.create_manga_info(ms1)
-        manga_ids, chapter_ids = self.scheduler.scrape_series(
-            DummyScraper.ID,
-            lambda *_, **__: self.scraper1,  # type: ignore[arg-type]
-            [manga_info, manga_info, manga_info]
-        )
+        dirty_manga = DirtyManga()
+        manga_ids, chapter_ids = asyncio.run_coroutine_threadsafe(
+            self.scheduler.scrape_series_async(
+                DummyScraper.ID,
+                lambda *_, **__: self.scraper1,  # type: ignore[arg-type]
+                [manga_info, manga_info, manga_info],
+                dirty_manga,
+            ),
+            self.scheduler._loop
+        ).result()
 
         assert len(manga_ids) == 0
         assert chapter_ids == []
@@ -305,11 +754,13 @@ class SchedulerScrapeServiceTest(BaseTestClasses.DatabaseTestCase):
         assert self.scraper1.set_checked.call_count == 1  # type: ignore[union-attr]
         assert self.scraper1.next_update.call_count == 2  # type: ignore[union-attr]
 
+        # Next updates are written when the updates of the run are flushed
+        dirty_manga.flush(self.dbutil)
         ms = self.dbutil.get_manga_service(ms1.service_id, ms1.title_id)
         assert ms is not None
         self.assertDatesEqual(ms.next_update, next_update)
 
-    def test_scrape_service_stops_after_none_returned_2_times(self):
+    def test_scrape_series_async_stops_after_none_returned_2_times(self):
         ms1 = self.create_manga_service(DummyScraper)
         self.scraper1.scrape_series.return_value = None  # type: ignore[union-attr]
         self.scraper1.next_update.return_value = utcnow() + timedelta(hours=1)  # type: ignore[union-attr]
@@ -320,11 +771,15 @@ class SchedulerScrapeServiceTest(BaseTestClasses.DatabaseTestCase):
         get_scraper.NAME = self.scraper1.NAME  # type: ignore[attr-defined]
 
         manga_info = self.create_manga_info(ms1)
-        manga_ids, chapter_ids = self.scheduler.scrape_series(
-            DummyScraper.ID,
-            get_scraper,  # type: ignore[arg-type]
-            [manga_info, manga_info, manga_info]
-        )
+        manga_ids, chapter_ids = asyncio.run_coroutine_threadsafe(
+            self.scheduler.scrape_series_async(
+                DummyScraper.ID,
+                get_scraper,  # type: ignore[arg-type]
+                [manga_info, manga_info, manga_info],
+                DirtyManga(),
+            ),
+            self.scheduler._loop
+        ).result()
 
         assert len(manga_ids) == 0
         assert chapter_ids == []
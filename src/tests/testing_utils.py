@@ -26,6 +26,7 @@ from src.scheduler import LoggingCursor
 from src.scrapers.base_scraper import BaseChapter, BaseChapterSimple, BaseScraper
 from src.tests.scrapers.testing_scraper import DummyScraper
 from src.utils.dbutils import DbUtil
+from src.utils.known_chapters import clear_known_chapters
 from src.utils.utilities import FeedType, utcnow
 
 originalParse = feedparser.parse
@@ -218,6 +219,7 @@ class BaseTestClasses:
         def delete_chapters(self, service_id: int):
             self.dbutil.execute('DELETE FROM chapters WHERE service_id=%s',
                                 (service_id,))
+            clear_known_chapters(service_id)
 
         # region DbUtil wrappers
 
@@ -2,12 +2,15 @@ import statistics
 import unittest
 from datetime import datetime, timedelta, timezone
 from typing import override
+from unittest.mock import patch
+from uuid import uuid4
 
 import psycopg
 import pytest
 
 from src.constants import NO_GROUP
 from src.db.models.chapter import Chapter as ChapterModel
+from src.db.models.groups import GroupPartial
 from src.db.models.manga import (
     Manga,
     MangaService,
@@ -19,6 +22,8 @@ from src.db.models.services import Service
 from src.scrapers.base_scraper import BaseChapterSimple
 from src.tests.scrapers.testing_scraper import DummyScraper, DummyScraper2
 from src.tests.testing_utils import BaseTestClasses, Chapter, spy_on
+from src.utils.dbutils import DbUtil
+from src.utils.group_cache import get_group_cache
 from src.utils.utilities import utcnow
 
 testing_series = {
@@ -540,6 +545,113 @@ class TestDbUtil(BaseDbutilTest):
             self.assertDatesAlmostEqual(service_whole.last_check, now)
             self.assertDatesAlmostEqual(service_whole.next_update, now + update_interval)
 
+    def test_add_chapters_with_copy(self):
+        ms = self.create_manga_service()
+        chapters = self.create_db_chapter_objects(ms, 5)
+
+        with patch.object(DbUtil, 'CHAPTERS_COPY_THRESHOLD', 1), \
+                self.conn.transaction(), self.conn.cursor() as cur:
+            inserted = self.dbutil.add_chapters(chapters[:3], cur=cur)
+            # Already existing chapters are skipped and the staging table is cleared between copies
+            inserted_again = self.dbutil.add_chapters(chapters, cur=cur)
+
+        assert [c.chapter_identifier for c in inserted] == [c.chapter_identifier for c in chapters[:3]]
+        assert [c.chapter_identifier for c in inserted_again] == [c.chapter_identifier for c in chapters[3:]]
+
+        rows = self.dbutil.execute(
+            'SELECT * FROM chapters WHERE manga_id=%s AND service_id=%s', (ms.manga_id, ms.service_id), fetch=True
+        )
+        assert len(rows) == len(chapters)
+        for c in chapters:
+            row = next(r for r in rows if r['chapter_identifier'] == c.chapter_identifier)
+            assert row['title'] == c.title
+            assert row['chapter_number'] == c.chapter_number
+            self.assertDatesEqual(row['release_date'], c.release_date)
+
+    def test_add_chapters_copy_falls_back_to_insert(self):
+        ms = self.create_manga_service()
+        chapters = self.create_db_chapter_objects(ms, 2)
+
+        with patch.object(DbUtil, 'CHAPTERS_COPY_THRESHOLD', 1), \
+                patch.object(DbUtil, '_copy_chapters', side_effect=psycopg.NotSupportedError):
+            inserted = self.dbutil.add_chapters(chapters)
+
+        assert {c.chapter_identifier for c in inserted} == {c.chapter_identifier for c in chapters}
+
+    def test_add_chapters_with_single_statement(self):
+        ms = self.create_manga_service()
+        chapters = self.create_db_chapter_objects(ms, 150)
+
+        with self.conn.transaction(), self.conn.cursor() as cur, \
+                patch.object(cur, 'execute', wraps=cur.execute) as execute_mock:
+            inserted = self.dbutil.add_chapters(chapters, cur=cur)
+
+        # The sql does not depend on the amount of chapters
+        execute_mock.assert_called_once()
+        assert {c.chapter_identifier for c in inserted} == {c.chapter_identifier for c in chapters}
+
+    def test_get_or_create_groups(self):
+        existing = self.dbutil.get_or_create_group(self.get_str_id())
+        mangadex_id = str(uuid4())
+        new_name = self.get_str_id()
+
+        groups = self.dbutil.get_or_create_groups([
+            GroupPartial(name=new_name),
+            GroupPartial(name=existing.name, mangadex_id=mangadex_id),
+            GroupPartial(name=new_name),
+        ])
+
+        assert [g.name for g in groups] == [new_name, existing.name]
+        # Existing group found by name gets the mangadex id
+        assert groups[1].group_id == existing.group_id
+        assert groups[1].mangadex_id == mangadex_id
+        assert self.dbutil.find_existing_groups([existing.name])[0].mangadex_id == mangadex_id
+
+        # Found groups are cached
+        with self.conn.transaction(), self.conn.cursor() as _cur:
+            cur = spy_on(_cur)
+            assert self.dbutil.get_or_create_groups([GroupPartial(name=existing.name)], cur=cur) == [existing]
+            cur.execute.assert_not_called()  # type: ignore[union-attr]
+
+            # Updated mangadex ids are cached when they are found the next time
+            assert self.dbutil.get_or_create_groups([GroupPartial(name='', mangadex_id=mangadex_id)], cur=cur) == [groups[1]]
+            assert self.dbutil.get_or_create_groups([GroupPartial(name='', mangadex_id=mangadex_id)], cur=cur) == [groups[1]]
+            cur.execute.assert_called_once()  # type: ignore[union-attr]
+
+            # Created groups are cached when they are found the next time
+            cur.execute.reset_mock()  # type: ignore[union-attr]
+            assert self.dbutil.get_or_create_groups([GroupPartial(name=new_name)], cur=cur) == [groups[0]]
+            assert self.dbutil.get_or_create_groups([GroupPartial(name=new_name)], cur=cur) == [groups[0]]
+            cur.execute.assert_called_once()  # type: ignore[union-attr]
+
+    def test_get_or_create_groups_does_not_cache_rolled_back_mangadex_id(self):
+        existing = self.dbutil.get_or_create_group(self.get_str_id())
+        mangadex_id = str(uuid4())
+
+        def update_and_rollback() -> None:
+            with self.conn.transaction(), self.conn.cursor() as cur:
+                self.dbutil.get_or_create_groups([GroupPartial(name=existing.name, mangadex_id=mangadex_id)], cur=cur)
+                raise ValueError('Rollback')
+
+        with pytest.raises(ValueError):
+            update_and_rollback()
+
+        assert get_group_cache().get(GroupPartial(name='', mangadex_id=mangadex_id)) is None
+
+    def test_add_new_groups_with_single_statement(self):
+        groups = [
+            GroupPartial(name=self.get_str_id(), mangadex_id=str(uuid4()) if i % 2 else None)
+            for i in range(10)
+        ]
+
+        with self.conn.transaction(), self.conn.cursor() as cur, \
+                patch.object(cur, 'execute', wraps=cur.execute) as execute_mock:
+            added = list(self.dbutil.add_new_groups(groups, cur=cur))
+
+        # The sql does not depend on the amount of groups
+        execute_mock.assert_called_once()
+        assert {(g.name, g.mangadex_id) for g in added} == {(g.name, g.mangadex_id) for g in groups}
+
 
 class TestGetService(BaseDbutilTest):
     @staticmethod
@@ -796,6 +908,98 @@ class TestUpdateInterval(BaseDbutilTest):
         assert self.dbutil.update_chapter_interval(m.manga_id or -1)
         assert self.get_manga_db(m.manga_id).release_interval == interval
 
+    def test_update_chapter_intervals_matches_single_updates(self):
+        manga = [self.setup_manga() for _ in range(4)]
+        t = utcnow()
+
+        def add_chapters(m: MangaServiceWithId, intervals: list[timedelta]) -> None:
+            release_date = t
+            chapters = []
+            for chapter_number, interval in enumerate(intervals, start=1):
+                release_date += interval
+                chapters.append(self.get_chapter(m, chapter_number, release_date))
+
+            self.dbutil.add_chapters(chapters)
+
+        # Valid interval, median fallback, too small intervals and more than 30 chapters
+        add_chapters(manga[0], [timedelta(days=7)] * 10)
+        add_chapters(manga[1], [timedelta(days=7) + timedelta(hours=8) * i for i in range(10)])
+        add_chapters(manga[2], [timedelta(hours=1)] * 10)
+        add_chapters(manga[3], [timedelta(days=3)] * 40)
+
+        manga_ids = [m.manga_id for m in manga] + [-1]
+        updated = self.dbutil.update_chapter_intervals(manga_ids)
+        batch_intervals = [self.get_manga_db(m.manga_id).release_interval for m in manga]
+
+        self.dbutil.execute('UPDATE manga SET release_interval=NULL WHERE manga_id=ANY(%s)', (manga_ids,))
+        single_updated = {m.manga_id for m in manga if self.dbutil.update_chapter_interval(m.manga_id)}
+        single_intervals = [self.get_manga_db(m.manga_id).release_interval for m in manga]
+
+        assert updated == single_updated == {manga[0].manga_id, manga[1].manga_id, manga[3].manga_id}
+        assert batch_intervals == single_intervals
+
+    def test_rebuild_release_stats(self):
+        m = self.setup_manga()
+        t = utcnow()
+
+        # Chapters added out of order mark the stats stale until they are rebuilt
+        self.dbutil.add_chapters([self.get_chapter(m, i, t + timedelta(days=7) * i) for i in range(5, 11)])
+        self.dbutil.add_chapters([self.get_chapter(m, i, t + timedelta(days=7) * i) for i in range(1, 5)])
+        self.dbutil.rebuild_release_stats([m.manga_id])
+
+        row = self.dbutil.execute(
+            'SELECT last_chapter_number, recent_intervals FROM manga_release_stats WHERE manga_id=%s',
+            (m.manga_id,), fetch=True
+        )[0]
+        assert row['last_chapter_number'] == 10
+        assert row['recent_intervals'] == [timedelta(days=7)] * 9
+
+        assert self.dbutil.update_chapter_intervals([m.manga_id]) == {m.manga_id}
+        manga = self.get_manga_db(m.manga_id)
+        assert manga.release_interval == timedelta(days=7)
+        assert manga.estimated_release == t + timedelta(days=77)
+
+    def assert_weekly_interval(self, m: MangaServiceWithId, t: datetime, last_chapter: int) -> None:
+        assert self.dbutil.update_chapter_intervals([m.manga_id]) == {m.manga_id}
+        manga = self.get_manga_db(m.manga_id)
+        assert manga.release_interval == timedelta(days=7)
+        assert manga.estimated_release == t + timedelta(days=7) * (last_chapter + 1)
+
+    def test_update_chapter_intervals_descending_inserts(self):
+        m = self.setup_manga()
+        t = utcnow()
+
+        self.dbutil.add_chapters([self.get_chapter(m, i, t + timedelta(days=7) * i) for i in range(10, 0, -1)])
+        self.assert_weekly_interval(m, t, 10)
+
+    def test_update_chapter_intervals_mixed_inserts(self):
+        m = self.setup_manga()
+        t = utcnow()
+
+        for chapter_numbers in ([5, 2, 8], [1, 10], [3, 9, 4], [7, 6]):
+            self.dbutil.add_chapters([
+                self.get_chapter(m, i, t + timedelta(days=7) * i) for i in chapter_numbers
+            ])
+
+        self.assert_weekly_interval(m, t, 10)
+
+    def test_update_chapter_intervals_after_delete(self):
+        m = self.setup_manga()
+        t = utcnow()
+
+        self.dbutil.add_chapters([self.get_chapter(m, i, t + timedelta(days=7) * i) for i in range(1, 11)])
+        self.dbutil.add_chapters([
+            self.get_chapter(m, i, t + timedelta(days=70) + timedelta(hours=1) * i) for i in range(11, 14)
+        ])
+        self.dbutil.execute(
+            'DELETE FROM chapters WHERE manga_id=%s AND chapter_number > 10', (m.manga_id,)
+        )
+
+        self.assert_weekly_interval(m, t, 10)
+
+    def test_update_chapter_intervals_without_manga(self):
+        assert self.dbutil.update_chapter_intervals([]) == set()
+
 
 class TestUpdateMangaTitle(BaseDbutilTest):
     def gen_title(self) -> str:
@@ -896,8 +1100,8 @@ class TestUpdateMangaTitle(BaseDbutilTest):
                 cur=cur
             )
 
-            # Get latest entries should chunk the updates
-            assert cur.execute.call_count == 4  # type: ignore[union-attr]
+            # All identifiers are passed in a single array parameter
+            assert cur.execute.call_count == 1  # type: ignore[union-attr]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+from src.db.models.chapter import Chapter as DbChapter
+from src.scrapers.base_scraper import BaseChapterSimple
+from src.tests.testing_utils import BaseTestClasses, spy_on
+from src.utils.known_chapters import (
+    BloomFilter,
+    KnownChapters,
+    get_known_chapters,
+    set_known_chapters_enabled,
+)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    values = [f'chapter_{i}' for i in range(1000)]
+    for value in values:
+        bloom.add(value)
+
+    assert all(value in bloom for value in values)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f'chapter_{i}')
+
+    false_positives = sum(f'other_{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+class KnownChaptersTest(BaseTestClasses.DatabaseTestCase):
+    def test_split(self):
+        ms = self.create_manga_service()
+        chapters = self.create_chapters(ms, 3)
+        identifiers = [c.chapter_identifier for c in chapters]
+        new_identifier = self.get_str_id()
+        inserted_identifier = self.get_str_id()
+        known = get_known_chapters(ms.service_id)
+
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            existing, unknown = known.split([*identifiers, new_identifier], cur=cur)
+
+        assert existing == set(identifiers)
+        assert unknown == set()
+
+        # Inserted chapters might exist, so they are checked from the database
+        known.add_inserted([inserted_identifier])
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            existing, unknown = known.split([new_identifier, inserted_identifier], cur=cur)
+
+        assert existing == set()
+        assert unknown == {inserted_identifier}
+
+    def test_split_refreshes_chapters_added_elsewhere(self):
+        ms = self.create_manga_service()
+        known = get_known_chapters(ms.service_id)
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            known.split([], cur=cur)
+
+        chapter = self.create_db_chapter_objects(ms, 1)[0]
+        self.dbutil.execute(
+            'INSERT INTO chapters (manga_id, service_id, title, chapter_number, chapter_identifier, release_date, group_id) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            (ms.manga_id, ms.service_id, chapter.title, chapter.chapter_number,
+             chapter.chapter_identifier, chapter.release_date, chapter.group_id)
+        )
+
+        with patch.object(KnownChapters, 'REFRESH_INTERVAL', timedelta(0)), \
+                self.conn.transaction(), self.conn.cursor() as cur:
+            existing, _ = known.split([chapter.chapter_identifier], cur=cur)
+
+        assert existing == {chapter.chapter_identifier}
+
+    def insert_chapter(self, chapter: DbChapter, chapter_id: int | None = None) -> None:
+        self.dbutil.execute(
+            'INSERT INTO chapters (chapter_id, manga_id, service_id, title, chapter_number, chapter_identifier, release_date, group_id) '
+            "VALUES (COALESCE(%s, nextval('chapters_chapter_id_seq')), %s, %s, %s, %s, %s, %s, %s)",
+            (chapter_id, chapter.manga_id, chapter.service_id, chapter.title, chapter.chapter_number,
+             chapter.chapter_identifier, chapter.release_date, chapter.group_id)
+        )
+
+    def test_split_refreshes_chapters_committed_out_of_order(self):
+        ms = self.create_manga_service()
+        self.create_chapters(ms, 1)
+        known = get_known_chapters(ms.service_id)
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            known.split([], cur=cur)
+
+        # The first chapter gets the smaller id but is committed after the second one
+        first, second = self.create_db_chapter_objects(ms, 2)
+        first_id = self.dbutil.execute("SELECT nextval('chapters_chapter_id_seq') AS id")[0]['id']
+        self.insert_chapter(second)
+
+        with patch.object(KnownChapters, 'REFRESH_INTERVAL', timedelta(0)):
+            with self.conn.transaction(), self.conn.cursor() as cur:
+                existing, _ = known.split([second.chapter_identifier], cur=cur)
+            assert existing == {second.chapter_identifier}
+
+            self.insert_chapter(first, first_id)
+            with self.conn.transaction(), self.conn.cursor() as cur:
+                existing, _ = known.split([first.chapter_identifier], cur=cur)
+
+        assert existing == {first.chapter_identifier}
+
+    def test_get_only_latest_entries_without_known_chapters(self):
+        ms = self.create_manga_service()
+        chapters = self.create_chapters(ms, 2)
+        entries = [
+            BaseChapterSimple(chapter_title='', chapter_identifier=c.chapter_identifier, title_id='', chapter_number=0)
+            for c in chapters
+        ]
+
+        with self.conn.transaction(), self.conn.cursor() as _cur:
+            cur = spy_on(_cur)
+            new_entries = self.dbutil.get_only_latest_entries(ms.service_id, entries, cur=cur)
+
+            # Only the existence query is made, the chapters of the service are not read
+            cur.execute.assert_called_once()  # type: ignore[union-attr]
+
+        assert not new_entries
+
+    def test_get_only_latest_entries_uses_known_chapters(self):
+        set_known_chapters_enabled(True)
+        ms = self.create_manga_service()
+        chapters = self.create_chapters(ms, 2)
+        new_identifier = self.get_str_id()
+        entries = [
+            BaseChapterSimple(chapter_title='', chapter_identifier=identifier, title_id='', chapter_number=0)
+            for identifier in [chapters[0].chapter_identifier, chapters[1].chapter_identifier, new_identifier]
+        ]
+
+        with patch.object(KnownChapters, 'RECENT_SIZE', 1):
+            with self.conn.transaction(), self.conn.cursor() as cur:
+                get_known_chapters(ms.service_id).split([], cur=cur)
+
+            with self.conn.transaction(), self.conn.cursor() as _cur:
+                cur = spy_on(_cur)
+                new_entries = self.dbutil.get_only_latest_entries(ms.service_id, entries, cur=cur)
+
+                # Only the chapter that did not fit in the recent chapters is checked from the database
+                cur.execute.assert_called_once()  # type: ignore[union-attr]
+                assert cur.execute.call_args.args[1] == (ms.service_id, [chapters[0].chapter_identifier])  # type: ignore[union-attr]
+
+        assert [e.chapter_identifier for e in new_entries] == [new_identifier]
+
+
+if __name__ == '__main__':
+    unittest.main()
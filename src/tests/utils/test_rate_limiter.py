@@ -0,0 +1,74 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.db.models.services import ServiceConfig
+from src.utils.rate_limiter import TokenBucket, get_service_rate_limiter
+
+
+@pytest.fixture
+def monotonic():
+    with patch('src.utils.rate_limiter.time.monotonic') as mock:
+        mock.return_value = 100.0
+        yield mock
+
+
+@pytest.mark.usefixtures('monotonic')
+def test_token_bucket_allows_burst():
+    limiter = TokenBucket(3, timedelta(seconds=3))
+
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve() == pytest.approx(1)
+    assert limiter.reserve() == pytest.approx(2)
+
+
+def test_token_bucket_refills(monotonic: MagicMock):
+    limiter = TokenBucket(2, timedelta(seconds=10))
+
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(5)
+
+    # Bucket never fills above its capacity
+    monotonic.return_value += 1000
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(5)
+
+
+@pytest.mark.usefixtures('monotonic')
+def test_token_bucket_acquire_sleeps():
+    limiter = TokenBucket(1, timedelta(seconds=2))
+
+    with patch('src.utils.rate_limiter.time.sleep') as sleep_mock:
+        limiter.acquire()
+        sleep_mock.assert_not_called()
+
+        limiter.acquire()
+        sleep_mock.assert_called_once_with(pytest.approx(2))
+
+
+@pytest.mark.usefixtures('monotonic')
+def test_token_bucket_acquire_async_sleeps():
+    limiter = TokenBucket(1, timedelta(seconds=2))
+
+    with patch('src.utils.rate_limiter.asyncio.sleep', new_callable=AsyncMock) as sleep_mock:
+        asyncio.run(limiter.acquire_async())
+        sleep_mock.assert_not_called()
+
+        asyncio.run(limiter.acquire_async())
+        sleep_mock.assert_called_once_with(pytest.approx(2))
+
+
+@pytest.mark.usefixtures('monotonic')
+def test_get_service_rate_limiter_is_shared():
+    config = ServiceConfig(service_id=-100, rate_limit=2, rate_limit_period=timedelta(seconds=1))
+
+    limiter = get_service_rate_limiter(config)
+    assert get_service_rate_limiter(config.model_copy()) is limiter
+
+    config.rate_limit = 4
+    assert get_service_rate_limiter(config) is limiter
+    assert limiter.rate == 4
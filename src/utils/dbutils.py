@@ -13,7 +13,7 @@ from functools import wraps
 from itertools import groupby, pairwise
 from typing import TYPE_CHECKING, Any, LiteralString, TypeVar, cast, overload
 
-from psycopg import Connection, Cursor
+from psycopg import Connection, Cursor, NotSupportedError, ProgrammingError
 from psycopg.rows import DictRow, RowFactory, class_row, dict_row
 
 from src.db.errors import RowNotFound
@@ -31,13 +31,15 @@ from src.db.models.manga import (
 )
 from src.db.models.notifications import (
     InputField,
+    NotificationOutboxEntry,
     PartialNotificationInfo,
     UserNotification,
 )
 from src.db.models.scheduled_run import ScheduledRun, ScheduledRunResult
 from src.db.models.services import Service, ServiceConfig, ServiceWhole
-from src.db.utilities import execute_values
 from src.elasticsearch.methods import ElasticMethods
+from src.utils.group_cache import get_group_cache
+from src.utils.known_chapters import get_known_chapters, known_chapters_enabled
 from src.utils.utilities import round_seconds, utcnow
 
 if TYPE_CHECKING:
@@ -110,6 +112,9 @@ class OptionalTransaction[Row = DictRow]:
 
 
 class DbUtil:
+    CHAPTERS_COPY_THRESHOLD = 500
+    """add_chapters streams at least this many chapters with COPY instead of a single VALUES list"""
+
     def __init__(self, conn: Connection[DictRow], es: ElasticMethods | None):
         self._conn = conn
         self._es = es
@@ -132,6 +137,31 @@ class DbUtil:
         length = val if isinstance(val, int) else len(val)
         return ','.join(['%s'] * length)
 
+    @staticmethod
+    def array_arg[V](values: Iterable[V]) -> list[V]:
+        """
+        Converts the values to a list that is passed to the database as a single array parameter.
+        Used with "= ANY(%s)" instead of "IN (%s, %s, ...)", so that the sql does not depend on
+        the amount of values and its plan and prepared statement can be reused.
+        Duplicate values are removed.
+        """
+        return list(dict.fromkeys(values))
+
+    @staticmethod
+    def array_columns(rows: Iterable[Sequence[Any]], cols_count: int) -> list[list[Any]]:
+        """
+        Transposes the rows into one list per column. Each list is passed to the database
+        as a single array parameter and expanded with "unnest(%s::int[], %s::text[], ...)",
+        so that bulk statements have the same sql regardless of the amount of rows
+        and their plan and prepared statement can be reused.
+        """
+        columns: list[list[Any]] = [[] for _ in range(cols_count)]
+        for row in rows:
+            for column, value in zip(columns, row, strict=True):
+                column.append(value)
+
+        return columns
+
     @staticmethod
     def fetchone_or_throw(cur: Cursor[T]) -> T:
         row = cur.fetchone()
@@ -177,6 +207,35 @@ class DbUtil:
         sql = 'UPDATE manga_service SET next_update=%s WHERE manga_id=%s AND service_id=%s'
         cur.execute(sql, (next_update, manga_id, service_id))
 
+    @OptionalTransaction()
+    def update_manga_service_checks(
+        self,
+        data: Collection[tuple[int, int, datetime | None, datetime | None, bool, bool]],
+        *,
+        cur: CursorType = NotImplemented,
+    ) -> None:
+        """
+        Updates the last check, next update, disabled status and scheduler claim
+        of multiple manga services with a single row update each
+        Args:
+            data: iterable of tuples [service_id, manga_id, last_check, next_update, disable, release_claim].
+                None dates leave the column unchanged.
+        """
+        if not data:
+            return
+
+        sql = """
+            UPDATE manga_service ms
+            SET last_check=COALESCE(v.last_check, ms.last_check),
+                next_update=COALESCE(v.next_update, ms.next_update),
+                disabled=ms.disabled OR v.disable,
+                claimed_until=CASE WHEN v.release_claim THEN NULL ELSE ms.claimed_until END
+            FROM unnest(%s::int[], %s::int[], %s::timestamptz[], %s::timestamptz[], %s::bool[], %s::bool[])
+                AS v(service_id, manga_id, last_check, next_update, disable, release_claim)
+            WHERE ms.service_id=v.service_id AND ms.manga_id=v.manga_id
+        """
+        cur.execute(sql, self.array_columns(data, 6))
+
     @OptionalTransaction()
     def get_service_manga(
         self,
@@ -238,19 +297,46 @@ class DbUtil:
     @OptionalTransaction()
     def get_scheduled_runs(self, *, cur: CursorType = NotImplemented) -> list[ScheduledRunResult]:
         """
-        Get scheduled runs ordered by creation time. Checks if runs are on cooldown
+        Get scheduled runs ordered by creation time. Checks if runs are on cooldown.
+        Runs claimed by another worker are skipped. The returned runs stay locked
+        until the transaction ends, so they should be claimed in the same transaction.
         """
         sql = """
             SELECT sr.manga_id, sr.service_id, ms.title_id FROM scheduled_runs sr
             LEFT JOIN manga_service ms ON sr.manga_id = ms.manga_id AND sr.service_id = ms.service_id
             INNER JOIN services s ON s.service_id = sr.service_id
-            WHERE s.scheduled_runs_disabled_until IS NULL OR s.scheduled_runs_disabled_until < NOW()
+            WHERE (s.scheduled_runs_disabled_until IS NULL OR s.scheduled_runs_disabled_until < NOW())
+              AND (sr.claimed_until IS NULL OR sr.claimed_until < NOW())
             ORDER BY created_at
+            FOR UPDATE OF sr SKIP LOCKED
         """
 
         cur.execute(sql)
         return list(map(ScheduledRunResult.model_validate, cur))
 
+    @OptionalTransaction()
+    def claim_scheduled_runs(
+        self, runs: list[tuple[int, int]], lease: timedelta, *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Claims the given scheduled runs so that other workers do not run them.
+        The claim is released when the runs are deleted after running them.
+
+        Args:
+            runs: List of manga id, service id pairs
+            lease: How long the runs are reserved for this worker
+        """
+        if not runs:
+            return
+
+        sql = """
+            UPDATE scheduled_runs sr SET claimed_until = NOW() + %s
+            FROM unnest(%s::int[], %s::int[]) AS c(manga_id, service_id)
+            WHERE sr.manga_id = c.manga_id AND sr.service_id = c.service_id
+        """
+        manga_ids, service_ids = zip(*runs, strict=True)
+        cur.execute(sql, (lease, list(manga_ids), list(service_ids)))
+
     @OptionalTransaction()
     def get_all_scheduled_runs(
         self, *, cur: CursorType = NotImplemented
@@ -273,15 +359,14 @@ class DbUtil:
         if not service_ids:
             return
 
-        format_args = self.get_format_args(service_ids)
         sql = (
             'UPDATE services s '
             'SET scheduled_runs_disabled_until=NOW() + sc.scheduled_run_interval '
             'FROM service_config sc '
-            f'WHERE sc.service_id = s.service_id AND s.service_id IN ({format_args})'
+            'WHERE sc.service_id = s.service_id AND s.service_id = ANY(%s)'
         )
 
-        cur.execute(sql, service_ids)
+        cur.execute(sql, (self.array_arg(service_ids),))
 
     @OptionalTransaction()
     def delete_scheduled_runs(
@@ -301,18 +386,24 @@ class DbUtil:
 
         sql = """
             DELETE FROM scheduled_runs sr
-            USING (VALUES %s) AS c(manga_id, service_id)
+            USING unnest(%s::int[], %s::int[]) AS c(manga_id, service_id)
             WHERE sr.manga_id = c.manga_id AND sr.service_id = c.service_id
         """
-        execute_values(cur, sql, to_delete, page_size=len(to_delete))
+        cur.execute(sql, self.array_columns(to_delete, 2))
         return cur.rowcount
 
     @OptionalTransaction()
     def add_scheduled_runs(
         self, runs: list[ScheduledRun], *, cur: CursorType = NotImplemented
     ) -> None:
-        sql = 'INSERT INTO scheduled_runs (manga_id, service_id, created_by) VALUES %s'
-        execute_values(cur, sql, [(sr.manga_id, sr.service_id, sr.created_by) for sr in runs])
+        if not runs:
+            return
+
+        sql = """
+            INSERT INTO scheduled_runs (manga_id, service_id, created_by)
+            SELECT * FROM unnest(%s::int[], %s::smallint[], %s::int[])
+        """
+        cur.execute(sql, self.array_columns(((sr.manga_id, sr.service_id, sr.created_by) for sr in runs), 3))
 
     @OptionalTransaction()
     def update_chapter_interval(self, manga_id: int, *, cur: CursorType = NotImplemented) -> bool:
@@ -325,9 +416,96 @@ class DbUtil:
               ORDER BY chapter_number DESC
               LIMIT 30"""
         cur.execute(sql, (manga_id,))
+        interval = self.calculate_release_interval(manga_id, cur)
+        if interval is None:
+            return False
+
+        sql = 'UPDATE manga SET release_interval=%s WHERE manga_id=%s'
+        logger.info(f'Interval for {manga_id} set to {interval}')
+        cur.execute(sql, (interval, manga_id))
+        return True
+
+    @OptionalTransaction()
+    def update_chapter_intervals(
+        self, manga_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> set[int]:
+        """
+        Updates the release intervals and estimated releases of multiple manga at once.
+        The intervals are calculated from the release statistics in manga_release_stats,
+        which are kept up to date by a trigger when chapters are added, so chapters are not scanned.
+        Statistics marked stale by chapters added out of order, moved or deleted are rebuilt first.
+
+        Returns:
+            Ids of the manga whose release interval was updated
+        """
+        if not manga_ids:
+            return set()
+
+        sql = """
+              SELECT rebuild_manga_release_stats(ARRAY(
+                  SELECT manga_id FROM manga_release_stats WHERE manga_id = ANY(%s) AND stale
+              ))"""
+        cur.execute(sql, (list(manga_ids),))
+
+        sql = """
+              SELECT manga_id, last_release_date, recent_intervals
+              FROM manga_release_stats
+              WHERE manga_id = ANY(%s)"""
+        cur.execute(sql, (list(manga_ids),))
+
+        values: list[tuple[int, timedelta, datetime]] = []
+        found = set()
+        for row in cur.fetchall():
+            manga_id = row['manga_id']
+            found.add(manga_id)
+            interval = self.release_interval_from_differences(manga_id, row['recent_intervals'])
+            if interval is None:
+                continue
+
+            logger.info(f'Interval for {manga_id} set to {interval}')
+            values.append((manga_id, interval, row['last_release_date'] + interval))
+
+        for manga_id in set(manga_ids) - found:
+            maintenance.info(f'Not enough chapters to calculate release interval for {manga_id}')
+
+        if not values:
+            return set()
+
+        sql = """
+            UPDATE manga m SET release_interval=v.release_interval, estimated_release=v.estimated_release
+            FROM unnest(%s::int[], %s::interval[], %s::timestamptz[]) AS v(manga_id, release_interval, estimated_release)
+            WHERE m.manga_id = v.manga_id
+        """
+        cur.execute(sql, self.array_columns(values, 3))
+        return {manga_id for manga_id, _, _ in values}
+
+    @OptionalTransaction()
+    def rebuild_release_stats(
+        self, manga_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Rebuilds the release statistics of the given manga from their chapters.
+        Stale statistics are rebuilt automatically by update_chapter_intervals.
+        """
+        if not manga_ids:
+            return
+
+        cur.execute('SELECT rebuild_manga_release_stats(%s)', (list(manga_ids),))
+
+    @staticmethod
+    def calculate_release_interval(manga_id: int, rows: Iterable[DictRow]) -> timedelta | None:
+        """
+        Calculates the release interval from the release dates of the latest chapters
+        Args:
+            manga_id: id of the manga. Only used for logging
+            rows: release_date and chapter_number of the latest chapters ordered by chapter number descending
+
+        Returns:
+            The release interval or None if it could not be calculated
+        """
         chapters = []
         last = None
-        for c in cur:
+        for c in rows:
             if not last:
                 last = c
                 chapters.append(c)
@@ -338,15 +516,31 @@ class DbUtil:
             last = c
             chapters.append(c)
 
-        if len(chapters) < 2:
+        # Iterate over pairs of pairwise chapters
+        differences = [a['release_date'] - b['release_date'] for a, b in pairwise(chapters)]
+        return DbUtil.release_interval_from_differences(manga_id, differences)
+
+    @staticmethod
+    def release_interval_from_differences(
+        manga_id: int, differences: Collection[timedelta]
+    ) -> timedelta | None:
+        """
+        Calculates the release interval from the release date differences of consecutive chapters
+        Args:
+            manga_id: id of the manga. Only used for logging
+            differences: Release date differences between consecutive chapters
+
+        Returns:
+            The release interval or None if it could not be calculated
+        """
+        if not differences:
             maintenance.info(f'Not enough chapters to calculate release interval for {manga_id}')
-            return False
+            return None
 
         intervals = []
         accuracy = 60 * 60 * 4  # 4h
-        # Iterate over pairs of pairwise chapters
-        for a, b in pairwise(chapters):
-            t = round_seconds((a['release_date'] - b['release_date']).total_seconds(), accuracy)
+        for difference in differences:
+            t = round_seconds(difference.total_seconds(), accuracy)
             # Ignore updates within 4 hours of each other
             if t < accuracy:
                 continue
@@ -356,7 +550,7 @@ class DbUtil:
             maintenance.info(
                 f'Not enough valid intervals to calculate release interval for {manga_id}'
             )
-            return False
+            return None
 
         # mode does not raise error since 3.8
         # https://docs.python.org/3/library/statistics.html#statistics.mode
@@ -369,11 +563,7 @@ class DbUtil:
             interval_seconds = modes[0]
 
         # TODO add warning when interval differs too much from mean
-        interval = timedelta(seconds=interval_seconds)
-        sql = 'UPDATE manga SET release_interval=%s WHERE manga_id=%s'
-        logger.info(f'Interval for {manga_id} set to {interval}')
-        cur.execute(sql, (interval, manga_id))
-        return True
+        return timedelta(seconds=interval_seconds)
 
     @OptionalTransaction()
     def get_chapters_by_id(
@@ -514,24 +704,21 @@ class DbUtil:
 
             manga_titles[manga_title] = manga
 
-        # Create args in the format %s, %s, ...
-        args = list(manga_titles.keys())
-        format_args = ','.join(['%s' for _ in args])
         already_exist = []
 
         if duplicates:
             logger.warning(f'All duplicates found {duplicates}')
 
-        if format_args:
+        if manga_titles:
             # This sql filters out manga in this service already. This is because
             # this function assumes all series added in this function are new
             sql = (
-                f'SELECT MIN(manga.manga_id) as manga_id, LOWER(title) as title, COUNT(manga.manga_id) as count '
-                f'FROM manga LEFT JOIN manga_service ms ON ms.service_id=%s AND manga.manga_id=ms.manga_id '
-                f'WHERE ms.manga_id IS NULL AND LOWER(title) IN ({format_args}) GROUP BY LOWER(title)'
+                'SELECT MIN(manga.manga_id) as manga_id, LOWER(title) as title, COUNT(manga.manga_id) as count '
+                'FROM manga LEFT JOIN manga_service ms ON ms.service_id=%s AND manga.manga_id=ms.manga_id '
+                'WHERE ms.manga_id IS NULL AND LOWER(title) = ANY(%s) GROUP BY LOWER(title)'
             )
 
-            cur.execute(sql, (service_id, *args))
+            cur.execute(sql, (service_id, self.array_arg(manga_titles.keys())))
 
             for row in cur:
                 if row['count'] == 1:
@@ -611,12 +798,13 @@ class DbUtil:
         ]
 
         # Assume that RETURNING returns records in order
-        sql = (
-            'INSERT INTO manga '
-            '(title, release_interval, latest_release, estimated_release, latest_chapter, views) '
-            'VALUES %s RETURNING title, manga_id'
-        )
-        rows = execute_values(cur, sql, args, page_size=len(args), fetch=True)
+        sql = """
+            INSERT INTO manga (title, release_interval, latest_release, estimated_release, latest_chapter, views)
+            SELECT * FROM unnest(%s::text[], %s::interval[], %s::timestamptz[], %s::timestamptz[], %s::int[], %s::int[])
+            RETURNING title, manga_id
+        """
+        cur.execute(sql, self.array_columns(args, 6))
+        rows = cur.fetchall()
 
         try:
             elastic_data = []
@@ -679,13 +867,18 @@ class DbUtil:
             )
             for m in mangas
         ]
-        sql = (
-            'INSERT INTO manga_service '
-            '(manga_id, service_id, disabled, last_check, title_id, next_update, latest_chapter, latest_decimal, feed_url)  '
-            'VALUES %s RETURNING manga_id, title_id'
-        )
+        sql = """
+            INSERT INTO manga_service
+                (manga_id, service_id, disabled, last_check, title_id, next_update, latest_chapter, latest_decimal, feed_url)
+            SELECT * FROM unnest(
+                %s::int[], %s::smallint[], %s::bool[], %s::timestamptz[], %s::text[],
+                %s::timestamptz[], %s::int[], %s::int[], %s::text[]
+            )
+            RETURNING manga_id, title_id
+        """
 
-        rows = execute_values(cur, sql, args, page_size=len(args), fetch=True)
+        cur.execute(sql, self.array_columns(args, 9))
+        rows = cur.fetchall()
 
         for row, manga in zip(rows, mangas, strict=True):
             if row['title_id'] != manga.title_id:
@@ -752,7 +945,7 @@ class DbUtil:
         cur.execute('UPDATE services SET last_check=%s WHERE service_id=%s', [now, service_id])
 
         cur.execute(
-            'UPDATE service_whole SET last_check=%s, next_update=%s WHERE service_id=%s',
+            'UPDATE service_whole SET last_check=%s, next_update=%s, claimed_until=NULL WHERE service_id=%s',
             [now, now + update_interval, service_id],
         )
 
@@ -764,9 +957,8 @@ class DbUtil:
         if len(title_ids) == 0:
             return None
 
-        format_ids = self.get_format_args(title_ids)
-        sql = f'SELECT * FROM manga_service WHERE service_id=%s AND title_id IN ({format_ids})'
-        cur.execute(sql, [service_id, *title_ids])
+        sql = 'SELECT * FROM manga_service WHERE service_id=%s AND title_id = ANY(%s)'
+        cur.execute(sql, (service_id, self.array_arg(title_ids)))
         for row in cur:
             yield MangaServicePartialWithId(**row)
 
@@ -798,11 +990,8 @@ class DbUtil:
         if not manga_ids:
             return []
 
-        sql = (
-            f'SELECT * FROM manga_service ms WHERE manga_id IN ({self.get_format_args(manga_ids)})'
-        )
-
-        cur.execute(sql, manga_ids)
+        sql = 'SELECT * FROM manga_service ms WHERE manga_id = ANY(%s)'
+        cur.execute(sql, (self.array_arg(manga_ids),))
         return [MangaServicePartialWithId.model_validate(row) for row in cur]
 
     @OptionalTransaction()
@@ -831,17 +1020,31 @@ class DbUtil:
         cur.execute(sql, (manga_ids,))
         return list(map(MangaForNotifications.model_validate, cur))
 
+    @OptionalTransaction()
+    def get_release_schedules(
+        self, manga_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> dict[int, tuple[datetime | None, timedelta | None]]:
+        """
+        Returns:
+            The latest release and release interval of each of the given manga by manga id
+        """
+        if not manga_ids:
+            return {}
+
+        sql = 'SELECT manga_id, latest_release, release_interval FROM manga WHERE manga_id = ANY(%s)'
+        cur.execute(sql, (list(manga_ids),))
+        return {row['manga_id']: (row['latest_release'], row['release_interval']) for row in cur}
+
     @OptionalTransaction()
     def update_latest_release(
         self, manga_ids: list[int], *, cur: CursorType = NotImplemented
     ) -> None:
-        format_ids = self.get_format_args(manga_ids)
         sql = (
             'UPDATE manga m SET latest_release=c.release_date FROM '
-            f'(SELECT MAX(release_date), manga_id FROM chapters WHERE manga_id IN ({format_ids}) GROUP BY manga_id) as c(release_date, manga_id)'
+            '(SELECT MAX(release_date), manga_id FROM chapters WHERE manga_id = ANY(%s) GROUP BY manga_id) as c(release_date, manga_id)'
             'WHERE m.manga_id=c.manga_id'
         )
-        cur.execute(sql, manga_ids)
+        cur.execute(sql, (self.array_arg(manga_ids),))
 
     @overload
     def add_chapters(
@@ -904,18 +1107,79 @@ class DbUtil:
                 for chapter in chapters
             ]
 
+        if known_chapters_enabled():
+            identifiers_by_service: dict[int, list[str]] = {}
+            for row in data:
+                identifiers_by_service.setdefault(row[1], []).append(row[5])
+            for chapter_service_id, identifiers in identifiers_by_service.items():
+                get_known_chapters(chapter_service_id).add_inserted(identifiers)
+
+        if len(data) >= self.CHAPTERS_COPY_THRESHOLD:
+            try:
+                # Savepoint so that a failed copy can fall back to a regular insert.
+                # Also makes sure the staging rows live in a transaction on autocommit connections.
+                with cur.connection.transaction():
+                    return self._copy_chapters(data, fetch=fetch, cur=cur)
+            except (NotSupportedError, ProgrammingError):
+                logger.exception('Failed to copy chapters. Falling back to a regular insert')
+
         sql = (
             'INSERT INTO chapters (manga_id, service_id, title, chapter_number, chapter_decimal, chapter_identifier, release_date, group_id) '
-            'VALUES %s ON CONFLICT DO NOTHING'
+            'SELECT * FROM unnest(%s::int[], %s::smallint[], %s::text[], %s::int[], %s::smallint[], %s::text[], %s::timestamptz[], %s::int[]) '
+            'ON CONFLICT DO NOTHING'
         )
         if fetch:
             sql += ' RETURNING chapter_id, manga_id, chapter_number, chapter_decimal, release_date, chapter_identifier'
 
-        retval = execute_values(cur, sql, data, page_size=max(len(data), 300), fetch=fetch)
-        if not retval:
+        cur.execute(sql, self.array_columns(data, 8))
+        if not fetch:
             return []
 
-        return list(map(InsertedChapter.model_validate, retval))
+        return list(map(InsertedChapter.model_validate, cur.fetchall()))
+
+    @staticmethod
+    def _copy_chapters(data: list[tuple], *, fetch: bool, cur: CursorType) -> list[InsertedChapter]:
+        """
+        Streams the chapters with a binary COPY into a staging table and inserts them from there.
+        Avoids building and parsing a huge VALUES list for big inserts.
+        Must be called inside a transaction.
+        """
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS chapters_staging (
+                manga_id            INT,
+                service_id          SMALLINT,
+                title               TEXT,
+                chapter_number      INT,
+                chapter_decimal     SMALLINT,
+                chapter_identifier  TEXT,
+                release_date        TIMESTAMPTZ,
+                group_id            INT
+            ) ON COMMIT DELETE ROWS
+        """)
+
+        copy_sql = (
+            'COPY chapters_staging (manga_id, service_id, title, chapter_number, chapter_decimal, chapter_identifier, release_date, group_id) '
+            'FROM STDIN (FORMAT BINARY)'
+        )
+        with cur.copy(copy_sql) as copy:
+            copy.set_types(['int4', 'int2', 'text', 'int4', 'int2', 'text', 'timestamptz', 'int4'])
+            for row in data:
+                copy.write_row(row)
+
+        sql = (
+            'INSERT INTO chapters (manga_id, service_id, title, chapter_number, chapter_decimal, chapter_identifier, release_date, group_id) '
+            'SELECT manga_id, service_id, title, chapter_number, chapter_decimal, chapter_identifier, release_date, group_id '
+            'FROM chapters_staging ON CONFLICT DO NOTHING'
+        )
+        if fetch:
+            sql += ' RETURNING chapter_id, manga_id, chapter_number, chapter_decimal, release_date, chapter_identifier'
+
+        cur.execute(sql)
+        inserted = list(map(InsertedChapter.model_validate, cur.fetchall())) if fetch else []
+
+        # Rows are only removed automatically on commit. Clear them for the next copy in the same transaction.
+        cur.execute('TRUNCATE chapters_staging')
+        return inserted
 
     @OptionalTransaction()
     def update_latest_chapter(
@@ -933,9 +1197,8 @@ class DbUtil:
         if not data:
             return
 
-        format_ids = ','.join(['%s'] * len(data))
-        sql = f'SELECT latest_chapter, manga_id FROM manga WHERE manga_id IN ({format_ids})'
-        cur.execute(sql, [d[0] for d in data])
+        sql = 'SELECT latest_chapter, manga_id FROM manga WHERE manga_id = ANY(%s)'
+        cur.execute(sql, (self.array_arg(d[0] for d in data),))
         rows = cur.fetchall()
         if not rows:
             return
@@ -948,10 +1211,10 @@ class DbUtil:
 
         sql = (
             'UPDATE manga m SET latest_chapter=c.latest_chapter, estimated_release=c.release_date + release_interval FROM '
-            ' (VALUES %s) AS c(manga_id, latest_chapter, release_date) '
+            ' unnest(%s::int[], %s::int[], %s::timestamptz[]) AS c(manga_id, latest_chapter, release_date) '
             'WHERE c.manga_id=m.manga_id'
         )
-        execute_values(cur, sql, data)
+        cur.execute(sql, self.array_columns(data, 3))
 
     @OptionalTransaction()
     def update_estimated_release(
@@ -997,16 +1260,18 @@ class DbUtil:
     def update_chapter_titles(
         self, service_id: int, chapters: Iterable[BaseChapter], *, cur: CursorType = NotImplemented
     ) -> None:
-        service_id = int(service_id)
+        values = [(c.title, c.chapter_identifier) for c in chapters]
+        if not values:
+            return
 
-        sql = f"""
+        sql = """
         UPDATE chapters
         SET title=c.title
-        FROM (VALUES %s) AS c(title, id)
-        WHERE service_id={service_id} AND chapter_identifier=c.id
+        FROM unnest(%s::text[], %s::text[]) AS c(title, id)
+        WHERE service_id=%s AND chapter_identifier=c.id
         """
 
-        execute_values(cur, sql, [(c.title, c.chapter_identifier) for c in chapters], page_size=200)
+        cur.execute(sql, [*self.array_columns(values, 2), int(service_id)])
 
     @OptionalTransaction()
     def get_only_latest_entries(
@@ -1017,42 +1282,47 @@ class DbUtil:
         *,
         cur: CursorType = NotImplemented,
     ) -> Collection[BaseChapter]:
+        """
+        Filters out the entries that already exist in the database.
+        When the known chapters caches are enabled, the cache of the service is checked first
+        and only the entries that might exist according to it are checked from the database.
+        """
         if not entries:
             return []
 
-        chapter_identifiers: tuple = tuple(c.chapter_identifier for c in entries)
-        chunk_size = 300
+        known_chapters = get_known_chapters(service_id) if known_chapters_enabled() else None
 
-        entries_set = set(entries)
-        output = set()
-
-        for idx in range(0, len(chapter_identifiers), chunk_size):
-            chapter_identifiers_chunk = chapter_identifiers[idx:idx + chunk_size]
-            format_args = ','.join(('%s',) * len(chapter_identifiers_chunk))
+        if manga_id:
+            sql: LiteralString = (
+                'SELECT chapter_identifier FROM chapters '
+                'WHERE service_id=%s AND manga_id=%s AND chapter_identifier = ANY(%s)'
+            )
+        else:
+            sql = (
+                'SELECT chapter_identifier FROM chapters '
+                'WHERE service_id=%s AND chapter_identifier = ANY(%s)'
+            )
 
-            if manga_id:
-                sql = (
-                    'SELECT chapter_identifier FROM chapters '
-                    f'WHERE service_id=%s AND manga_id=%s AND chapter_identifier IN ({format_args})'
+        try:
+            if known_chapters is not None:
+                existing, unknown = known_chapters.split(
+                    (c.chapter_identifier for c in entries), cur=cur
                 )
-                args = (service_id, manga_id, *chapter_identifiers_chunk)
             else:
-                sql = (
-                    'SELECT chapter_identifier FROM chapters '
-                    f'WHERE service_id=%s AND chapter_identifier IN ({format_args})'
-                )
-                args = (service_id, *chapter_identifiers_chunk)
+                existing, unknown = set(), {c.chapter_identifier for c in entries}
 
-            try:
+            if unknown:
+                args = (service_id, manga_id, list(unknown)) if manga_id else (service_id, list(unknown))
                 cur.execute(sql, args)
+                found = {r['chapter_identifier'] for r in cur}
+                if known_chapters is not None:
+                    known_chapters.add_existing(found)
+                existing.update(found)
+        except Exception:
+            logger.exception('Failed to get old chapters')
+            return list(entries)
 
-                output.update(entries_set.difference(set(r['chapter_identifier'] for r in cur)))
-
-            except Exception:
-                logger.exception('Failed to get old chapters')
-                return list(entries)
-
-        return output
+        return {c for c in entries if c.chapter_identifier not in existing}
 
     @OptionalTransaction()
     def set_manga_last_checked(
@@ -1068,6 +1338,39 @@ class DbUtil:
         )
         cur.execute(sql, [last_checked, manga_id, service_id])
 
+    @OptionalTransaction()
+    def update_services_checked(
+        self, data: Collection[tuple[int, datetime, datetime]], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Args:
+            data: iterable of tuples [service_id, last_check, disabled_until]
+        """
+        if not data:
+            return
+
+        sql = """
+            UPDATE services s SET last_check=v.last_check, disabled_until=v.disabled_until
+            FROM unnest(%s::int[], %s::timestamptz[], %s::timestamptz[]) AS v(service_id, last_check, disabled_until)
+            WHERE s.service_id=v.service_id
+        """
+        cur.execute(sql, self.array_columns(data, 3))
+
+    @OptionalTransaction()
+    def release_manga_service_claims(
+        self, service_id: int, manga_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Releases the scheduler claims of the given series so that they can be claimed again
+        """
+        if not manga_ids:
+            return
+
+        sql: LiteralString = (
+            'UPDATE manga_service SET claimed_until=NULL WHERE service_id=%s AND manga_id=ANY(%s)'
+        )
+        cur.execute(sql, (service_id, list(manga_ids)))
+
     @OptionalTransaction(class_row(Group))
     def find_existing_groups(
         self, group_names: list[str], *, cur: Cursor[Group] = NotImplemented
@@ -1075,48 +1378,121 @@ class DbUtil:
         if not group_names:
             return []
 
-        format_args = self.get_format_args(group_names)
-        sql = f'SELECT * FROM groups WHERE name IN ({format_args})'
-        cur.execute(sql, group_names)
+        sql = 'SELECT * FROM groups WHERE name = ANY(%s)'
+        cur.execute(sql, (self.array_arg(group_names),))
         return cur.fetchall()
 
     @OptionalTransaction()
     def update_group_mangadex_ids(
         self, groups: Iterable[Group], *, cur: CursorType = NotImplemented
     ) -> None:
+        values = [(g.mangadex_id, g.group_id) for g in groups]
+        if not values:
+            return
+
         sql = (
-            'UPDATE groups g SET mangadex_id=v.mangadex_id::uuid '
-            'FROM (VALUES %s) AS v(mangadex_id, group_id) '
+            'UPDATE groups g SET mangadex_id=v.mangadex_id '
+            'FROM unnest(%s::uuid[], %s::int[]) AS v(mangadex_id, group_id) '
             'WHERE g.group_id = v.group_id'
         )
 
-        execute_values(cur, sql, [(g.mangadex_id, g.group_id) for g in groups], page_size=200)
+        cur.execute(sql, self.array_columns(values, 2))
 
     @OptionalTransaction()
     def get_or_create_group(self, group_name: str, *, cur: CursorType = NotImplemented) -> Group:
-        groups = list(self.find_existing_groups([group_name], cur=cast(Cursor[Any], cur)))
-        if not groups:
-            groups = list(self.add_new_groups([GroupPartial(name=group_name)], cur=cur))
+        return self.get_or_create_groups([GroupPartial(name=group_name)], cur=cur)[0]
 
-        return groups[0]
+    @OptionalTransaction()
+    def get_or_create_groups(
+        self, groups: Iterable[GroupPartial], *, cur: CursorType = NotImplemented
+    ) -> list[Group]:
+        """
+        Finds the given groups and creates the ones that do not exist yet.
+        Groups with a mangadex id are found by it and otherwise by name.
+        If a group with a mangadex id is only found by name, the mangadex id is set to the found group.
+        Found groups are cached for the whole process, so known groups do not query the database.
+
+        Returns:
+            The groups in the order they were given without duplicates.
+            Groups that could not be created, e.g. because of a name conflict, are left out.
+        """
+        def group_key(group: GroupPartial) -> tuple[str, str]:
+            if group.mangadex_id is not None:
+                return 'mangadex_id', group.mangadex_id
+            return 'name', group.name
+
+        group_cache = get_group_cache()
+        requested = {group_key(g): g for g in groups}
+        resolved: dict[tuple[str, str], Group] = {}
+        missing: list[GroupPartial] = []
+
+        for key, group in requested.items():
+            cached = group_cache.get(group)
+            if cached is None:
+                missing.append(group)
+            else:
+                resolved[key] = cached
+
+        if not missing:
+            return list(resolved.values())
+
+        sql = 'SELECT * FROM groups WHERE name = ANY(%s) OR mangadex_id = ANY(%s::uuid[])'
+        cur.execute(sql, (
+            self.array_arg(g.name for g in missing),
+            self.array_arg(g.mangadex_id for g in missing if g.mangadex_id is not None),
+        ))
+        found_groups = [Group.model_validate(row) for row in cur]
+        # Mangadex ids set below are cached once they have been committed and read again
+        group_cache.add(found_groups)
+        by_name = {g.name: g for g in found_groups}
+        by_mangadex_id = {g.mangadex_id: g for g in found_groups if g.mangadex_id is not None}
+
+        mangadex_id_updates: list[Group] = []
+        new_groups: list[GroupPartial] = []
+        for group in missing:
+            if group.mangadex_id is None:
+                found = by_name.get(group.name)
+            else:
+                found = by_mangadex_id.get(group.mangadex_id)
+                same_name = by_name.get(group.name)
+                if found is None and same_name is not None:
+                    if same_name.mangadex_id is not None:
+                        logger.warning(
+                            f'Duplicate group name found {group.name} with different id {same_name.mangadex_id}. Will be treated as the same group'
+                        )
+
+                    found = same_name.model_copy(update={'mangadex_id': group.mangadex_id})
+                    by_name[group.name] = found
+                    by_mangadex_id[group.mangadex_id] = found
+                    mangadex_id_updates.append(found)
+
+            if found is None:
+                new_groups.append(group)
+            else:
+                resolved[group_key(group)] = found
+
+        if mangadex_id_updates:
+            self.update_group_mangadex_ids(mangadex_id_updates, cur=cur)
+
+        if new_groups:
+            for group in self.add_new_groups(new_groups, cur=cur):
+                resolved[group_key(group)] = group
+
+        return [resolved[key] for key in requested if key in resolved]
 
     @OptionalTransaction()
     def add_new_groups(
         self, groups: Collection[GroupPartial], *, cur: CursorType = NotImplemented
     ) -> Iterable[Group]:
-        sql = 'INSERT INTO groups (name, mangadex_id) VALUES %s ON CONFLICT DO NOTHING RETURNING *'
-
-        return map(
-            Group.model_validate,
-            execute_values(
-                cur,
-                sql,
-                [(g.name, g.mangadex_id) for g in groups],
-                page_size=len(groups),
-                fetch=True,
-            ),
+        sql = (
+            'INSERT INTO groups (name, mangadex_id) '
+            'SELECT * FROM unnest(%s::text[], %s::uuid[]) '
+            'ON CONFLICT DO NOTHING RETURNING *'
         )
 
+        cur.execute(sql, self.array_columns(((g.name, g.mangadex_id) for g in groups), 2))
+        return map(Group.model_validate, cur.fetchall())
+
     @OptionalTransaction()
     def get_manga_ids_without_artist(
         self, manga_ids: set[int], *, cur: CursorType = NotImplemented
@@ -1127,9 +1503,8 @@ class DbUtil:
         if not manga_ids:
             return set()
 
-        format_args = self.get_format_args(manga_ids)
-        sql = f'SELECT manga_id FROM manga_artists WHERE manga_id IN ({format_args})'
-        cur.execute(sql, list(manga_ids))
+        sql = 'SELECT manga_id FROM manga_artists WHERE manga_id = ANY(%s)'
+        cur.execute(sql, (self.array_arg(manga_ids),))
         return manga_ids.difference([row['manga_id'] for row in cur])
 
     @OptionalTransaction()
@@ -1142,9 +1517,8 @@ class DbUtil:
         if not manga_ids:
             return set()
 
-        format_args = self.get_format_args(manga_ids)
-        sql = f'SELECT manga_id FROM manga_authors WHERE manga_id IN ({format_args})'
-        cur.execute(sql, list(manga_ids))
+        sql = 'SELECT manga_id FROM manga_authors WHERE manga_id = ANY(%s)'
+        cur.execute(sql, (self.array_arg(manga_ids),))
         return manga_ids.difference([row['manga_id'] for row in cur])
 
     @OptionalTransaction()
@@ -1214,11 +1588,9 @@ class DbUtil:
         if not authors:
             return []
 
-        sql = 'INSERT INTO authors (name, mangadex_id) VALUES %s RETURNING *'
-        return map(
-            Author.model_validate,
-            execute_values(cur, sql, [(a.name, a.mangadex_id) for a in authors], fetch=True),
-        )
+        sql = 'INSERT INTO authors (name, mangadex_id) SELECT * FROM unnest(%s::text[], %s::uuid[]) RETURNING *'
+        cur.execute(sql, self.array_columns(((a.name, a.mangadex_id) for a in authors), 2))
+        return map(Author.model_validate, cur.fetchall())
 
     @OptionalTransaction()
     def add_manga_artists(
@@ -1227,8 +1599,8 @@ class DbUtil:
         if not manga_artist:
             return None
 
-        sql = 'INSERT INTO manga_artists (manga_id, author_id) VALUES %s'
-        execute_values(cur, sql, [(ma.manga_id, ma.author_id) for ma in manga_artist])
+        sql = 'INSERT INTO manga_artists (manga_id, author_id) SELECT * FROM unnest(%s::int[], %s::int[])'
+        cur.execute(sql, self.array_columns(((ma.manga_id, ma.author_id) for ma in manga_artist), 2))
         return None
 
     @OptionalTransaction()
@@ -1238,8 +1610,8 @@ class DbUtil:
         if not manga_author:
             return None
 
-        sql = 'INSERT INTO manga_authors (manga_id, author_id) VALUES %s'
-        execute_values(cur, sql, [(ma.manga_id, ma.author_id) for ma in manga_author])
+        sql = 'INSERT INTO manga_authors (manga_id, author_id) SELECT * FROM unnest(%s::int[], %s::int[])'
+        cur.execute(sql, self.array_columns(((ma.manga_id, ma.author_id) for ma in manga_author), 2))
 
     @OptionalTransaction(class_row(MangaAuthor))
     def get_manga_authors(
@@ -1264,9 +1636,8 @@ class DbUtil:
         if not mangadex_ids:
             return []
 
-        format_args = self.get_format_args(mangadex_ids)
-        sql = f'SELECT * FROM authors WHERE mangadex_id IN ({format_args})'
-        cur.execute(sql, mangadex_ids)
+        sql = 'SELECT * FROM authors WHERE mangadex_id = ANY(%s::uuid[])'
+        cur.execute(sql, (self.array_arg(mangadex_ids),))
         return cur.fetchall()
 
     @OptionalTransaction()
@@ -1300,7 +1671,10 @@ class DbUtil:
         ]
         sql = f"""
             INSERT INTO manga_info as mi (manga_id, cover, bw, mu, mal, amz, ebj, engtl, raw, nu, kt, ap, al)
-            VALUES %s
+            SELECT * FROM unnest(
+                %s::int[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[],
+                %s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[]
+            )
             ON CONFLICT (manga_id) DO UPDATE SET
                 cover=COALESCE(excluded.cover, mi.cover),
                 bw=COALESCE(excluded.bw, mi.bw),
@@ -1316,7 +1690,7 @@ class DbUtil:
                 al=COALESCE(excluded.al, mi.al)
                 {',last_updated=CURRENT_TIMESTAMP' if update_last_check else ''}
         """
-        execute_values(cur, sql, data)
+        cur.execute(sql, self.array_columns(data, 13))
 
     @OptionalTransaction()
     def update_manga_titles(
@@ -1331,7 +1705,7 @@ class DbUtil:
         sql = """
             -- Select manga with new titles
             WITH to_update AS (
-                SELECT v.title, v.manga_id FROM (VALUES %s) AS v(manga_id, title)
+                SELECT v.title, v.manga_id FROM unnest(%s::int[], %s::text[]) AS v(manga_id, title)
                 INNER JOIN manga m
                     ON m.manga_id = v.manga_id AND LOWER(m.title) != LOWER(v.title)
             ),
@@ -1348,20 +1722,20 @@ class DbUtil:
             ON CONFLICT DO NOTHING
         """
 
-        execute_values(cur, sql, titles)
+        cur.execute(sql, self.array_columns(titles, 2))
 
         try:
             manga_ids = list({v[0] for v in titles})
 
-            sql = f"""
+            sql = """
                 SELECT m.manga_id as _id, m.manga_id, m.title, array_remove(array_agg(ma.title), NULL) as aliases
                 FROM manga m
                 LEFT JOIN manga_alias ma ON m.manga_id = ma.manga_id
-                WHERE m.manga_id IN ({self.get_format_args(manga_ids)})
+                WHERE m.manga_id = ANY(%s)
                 GROUP BY m.manga_id
             """
 
-            cur.execute(sql, manga_ids)
+            cur.execute(sql, (manga_ids,))
             rows = cur.fetchall()
 
             logger.debug('Updating elasticsearch titles for %s', manga_ids)
@@ -1424,6 +1798,151 @@ class DbUtil:
         cur.execute(sql, (notification_id,))
         return cur.fetchall()
 
+    @OptionalTransaction(class_row(UserNotification))
+    def get_notifications_info(
+        self, notification_ids: Collection[int], *, cur: Cursor[UserNotification] = NotImplemented
+    ) -> dict[int, UserNotification]:
+        """
+        Get the info of multiple notifications with a single query
+
+        Returns:
+            Dict of notification id to notification info
+        """
+        if not notification_ids:
+            return {}
+
+        sql = (
+            'SELECT * FROM user_notifications un '
+            'INNER JOIN notification_options no ON un.notification_id = no.notification_id '
+            'WHERE un.notification_id = ANY(%s)'
+        )
+        cur.execute(sql, (list(notification_ids),))
+        return {n.notification_id: n for n in cur}
+
+    @OptionalTransaction()
+    def get_notifications_inputs(
+        self, notification_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> dict[int, list[InputField]]:
+        """
+        Get the input fields of multiple notifications with a single query
+
+        Returns:
+            Dict of notification id to the input fields of the notification.
+            Every given notification id is included even if it has no input fields.
+        """
+        inputs: dict[int, list[InputField]] = {notification_id: [] for notification_id in notification_ids}
+        if not inputs:
+            return inputs
+
+        sql = (
+            'SELECT unf.notification_id, unf.value, nf.name, nf.optional, unf.override_id FROM user_notification_fields unf '
+            'INNER JOIN notification_fields nf ON nf.field_id=unf.field_id '
+            'WHERE notification_id = ANY(%s)'
+        )
+        cur.execute(sql, (list(inputs),))
+        for row in cur:
+            inputs[row['notification_id']].append(InputField.model_validate(row))
+
+        return inputs
+
+    @OptionalTransaction()
+    def update_notifications_stats(
+        self, stats: Collection[tuple[int, int, int]], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Bulk version of update_notification_stats
+        Args:
+            stats: iterable of tuples [notification_id, runs, failed]
+        """
+        if not stats:
+            return
+
+        sql = """
+            UPDATE user_notifications un
+            SET times_run=un.times_run + v.runs,
+                times_failed=un.times_failed + v.failed,
+                failed_in_row=CASE
+                    WHEN v.failed = 0 THEN 0
+                    ELSE un.failed_in_row + v.failed
+                END
+            FROM unnest(%s::int[], %s::int[], %s::int[]) AS v(notification_id, runs, failed)
+            WHERE un.notification_id = v.notification_id
+        """
+        cur.execute(sql, self.array_columns(stats, 3))
+
+    @OptionalTransaction(class_row(NotificationOutboxEntry))
+    def claim_notification_outbox(
+        self, limit: int, lease: timedelta, *, cur: Cursor[NotificationOutboxEntry] = NotImplemented
+    ) -> list[NotificationOutboxEntry]:
+        """
+        Claims due notification outbox entries for delivery.
+        The attempt counter of the claimed entries is increased and they are hidden from
+        other workers for the duration of the lease. Entries that are not deleted
+        or rescheduled before the lease expires are delivered again.
+        """
+        sql = """
+            WITH due AS (
+                SELECT outbox_id FROM notification_outbox
+                WHERE next_attempt <= NOW()
+                ORDER BY next_attempt
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE notification_outbox o
+            SET attempts=o.attempts + 1, next_attempt=NOW() + %s
+            FROM due
+            WHERE o.outbox_id = due.outbox_id
+            RETURNING o.outbox_id, o.chapter_id, o.manga_id, o.notification_id, o.attempts
+        """
+        cur.execute(sql, (limit, lease))
+        return sorted(cur, key=lambda e: e.outbox_id)
+
+    @OptionalTransaction()
+    def delete_notification_outbox(
+        self, outbox_ids: Collection[int], *, cur: CursorType = NotImplemented
+    ) -> None:
+        if not outbox_ids:
+            return
+
+        cur.execute('DELETE FROM notification_outbox WHERE outbox_id = ANY(%s)', (list(outbox_ids),))
+
+    @OptionalTransaction()
+    def add_notification_retries(
+        self, data: Collection[tuple[int, int, int, int, datetime]], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Adds failed deliveries back to the notification outbox
+        Args:
+            data: iterable of tuples [chapter_id, manga_id, notification_id, attempts, next_attempt]
+        """
+        if not data:
+            return
+
+        sql = (
+            'INSERT INTO notification_outbox (chapter_id, manga_id, notification_id, attempts, next_attempt) '
+            'SELECT * FROM unnest(%s::bigint[], %s::int[], %s::int[], %s::int[], %s::timestamptz[])'
+        )
+        cur.execute(sql, self.array_columns(data, 5))
+
+    @OptionalTransaction()
+    def reschedule_notification_outbox(
+        self, data: Collection[tuple[int, datetime]], *, cur: CursorType = NotImplemented
+    ) -> None:
+        """
+        Args:
+            data: iterable of tuples [outbox_id, next_attempt]
+        """
+        if not data:
+            return
+
+        sql = """
+            UPDATE notification_outbox o
+            SET next_attempt=v.next_attempt
+            FROM unnest(%s::bigint[], %s::timestamptz[]) AS v(outbox_id, next_attempt)
+            WHERE o.outbox_id = v.outbox_id
+        """
+        cur.execute(sql, self.array_columns(data, 2))
+
     @OptionalTransaction()
     def update_notification_stats(
         self, notification_id: int, runs: int, failed: int, *, cur: CursorType = NotImplemented
@@ -0,0 +1,57 @@
+import threading
+from collections.abc import Iterable
+
+from src.db.models.groups import Group, GroupPartial
+
+
+class GroupCache:
+    """
+    Thread safe cache of groups by name and mangadex id.
+    Groups are never deleted, so the cached group ids stay valid.
+    Only groups read from the database should be added, as newly inserted groups
+    might still be rolled back. They are cached when they are read the next time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_name: dict[str, Group] = {}
+        self._by_mangadex_id: dict[str, Group] = {}
+
+    def get(self, group: GroupPartial) -> Group | None:
+        """
+        Get the cached group by mangadex id if the group has one and otherwise by name
+        """
+        with self._lock:
+            if group.mangadex_id is not None:
+                return self._by_mangadex_id.get(group.mangadex_id)
+
+            return self._by_name.get(group.name)
+
+    def add(self, groups: Iterable[Group]) -> None:
+        with self._lock:
+            for group in groups:
+                self._by_name[group.name] = group
+                if group.mangadex_id is not None:
+                    self._by_mangadex_id[group.mangadex_id] = group
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_name.clear()
+            self._by_mangadex_id.clear()
+
+
+_group_cache = GroupCache()
+
+
+def get_group_cache() -> GroupCache:
+    """
+    Get the process wide group cache
+    """
+    return _group_cache
+
+
+def clear_group_cache() -> None:
+    """
+    Drops all cached groups. Must be called if groups are deleted from the database.
+    """
+    _group_cache.clear()
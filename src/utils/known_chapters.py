@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from datetime import timedelta
+
+from psycopg import Cursor
+from psycopg.rows import DictRow
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Set membership filter that never gives false negatives.
+    A value that is not in the filter was never added to it. A value that is in the filter
+    was added with the probability given by the error rate, as long as the amount of
+    added values stays below the capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._capacity = max(capacity, 1)
+        self._size = math.ceil(-self._capacity * math.log(error_rate) / math.log(2) ** 2)
+        self._hashes = max(1, round(self._size / self._capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def count(self) -> int:
+        """Amount of values added to the filter. Duplicates are counted separately."""
+        return self._count
+
+    def _positions(self, value: str) -> Iterator[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        # Odd step so that the positions do not repeat with sizes divisible by two
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % self._size
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class KnownChapters:
+    """
+    Thread safe in memory cache of the chapter identifiers of a service that exist in the database.
+    Used to skip the database when checking which scraped chapters are new.
+
+    Identifiers read from the database are kept in an LRU. These are known to exist.
+    Every identifier of the service is also added to a bloom filter built from the chapters table.
+    Identifiers not found in the filter are new. Only identifiers in the filter but
+    not in the LRU have to be checked from the database.
+
+    Chapters added by other processes are read every REFRESH_INTERVAL. Until then they
+    are considered new, which is safe as inserting existing chapters does nothing.
+    Each refresh also reads again the chapters after the id read by the previous refresh,
+    as chapter ids are not committed in order.
+
+    Cached identifiers are not checked from the database, so the caches are only used while enabled
+    with set_known_chapters_enabled. The scheduler daemon enables them while it listens for
+    chapters removed from the database and clears the caches of their services.
+    """
+
+    RECENT_SIZE = 10_000
+    """How many identifiers known to exist are kept in the LRU"""
+
+    ERROR_RATE = 0.01
+    """False positive rate of the bloom filter"""
+
+    MIN_CAPACITY = 10_000
+    """Minimum capacity of the bloom filter"""
+
+    REFRESH_INTERVAL = timedelta(minutes=5)
+    """How often chapters added by other processes are read from the database"""
+
+    def __init__(self, service_id: int):
+        self.service_id = service_id
+        self._lock = threading.Lock()
+        self._bloom: BloomFilter | None = None
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self._last_chapter_id = 0
+        self._refresh_from_id = 0
+        self._refreshed = 0.0
+
+    def split(self, identifiers: Iterable[str], *, cur: Cursor[DictRow]) -> tuple[set[str], set[str]]:
+        """
+        Splits the identifiers by what is known about them.
+        Identifiers not included in either of the returned sets are new.
+
+        Returns:
+            (existing, unknown) Identifiers known to exist and identifiers that must be checked from the database
+        """
+        with self._lock:
+            bloom = self._refresh(cur)
+            existing: set[str] = set()
+            unknown: set[str] = set()
+
+            for identifier in identifiers:
+                if identifier in self._recent:
+                    self._recent.move_to_end(identifier)
+                    existing.add(identifier)
+                elif identifier in bloom:
+                    unknown.add(identifier)
+
+            return existing, unknown
+
+    def add_existing(self, identifiers: Iterable[str]) -> None:
+        """
+        Adds identifiers that were read from the database
+        """
+        with self._lock:
+            for identifier in identifiers:
+                self._add_recent(identifier)
+                if self._bloom is not None:
+                    self._bloom.add(identifier)
+
+    def add_inserted(self, identifiers: Iterable[str]) -> None:
+        """
+        Adds identifiers that are being inserted to the database.
+        The insert might still be rolled back, so they are only added to the bloom filter.
+        """
+        with self._lock:
+            if self._bloom is None:
+                return
+
+            for identifier in identifiers:
+                self._bloom.add(identifier)
+
+    def _add_recent(self, identifier: str) -> None:
+        self._recent[identifier] = None
+        self._recent.move_to_end(identifier)
+        if len(self._recent) > self.RECENT_SIZE:
+            self._recent.popitem(last=False)
+
+    def _refresh(self, cur: Cursor[DictRow]) -> BloomFilter:
+        bloom = self._bloom
+        if bloom is None or bloom.count > bloom.capacity:
+            return self._rebuild(cur)
+
+        if time.monotonic() - self._refreshed >= self.REFRESH_INTERVAL.total_seconds():
+            sql = (
+                'SELECT chapter_id, chapter_identifier FROM chapters '
+                'WHERE service_id=%s AND chapter_id > %s ORDER BY chapter_id'
+            )
+            cur.execute(sql, (self.service_id, self._refresh_from_id))
+            self._refresh_from_id = self._last_chapter_id
+            self._add_rows(bloom, cur.fetchall())
+            self._refreshed = time.monotonic()
+
+        return bloom
+
+    def _rebuild(self, cur: Cursor[DictRow]) -> BloomFilter:
+        sql = 'SELECT chapter_id, chapter_identifier FROM chapters WHERE service_id=%s ORDER BY chapter_id'
+        cur.execute(sql, (self.service_id,))
+        rows = cur.fetchall()
+
+        # Leave room for new chapters so that the filter does not need to be rebuilt often
+        bloom = BloomFilter(max(len(rows) * 2, self.MIN_CAPACITY), self.ERROR_RATE)
+        self._recent.clear()
+        previous_chapter_id = self._last_chapter_id
+        self._add_rows(bloom, rows)
+        self._refresh_from_id = previous_chapter_id or self._last_chapter_id
+        logger.info(f'Built known chapters of service {self.service_id} from {len(rows)} chapters')
+
+        self._bloom = bloom
+        self._refreshed = time.monotonic()
+        return bloom
+
+    def _add_rows(self, bloom: BloomFilter, rows: list[DictRow]) -> None:
+        for row in rows:
+            # Refreshes read some chapters again, which must not fill the filter
+            if row['chapter_identifier'] not in bloom:
+                bloom.add(row['chapter_identifier'])
+
+        # The latest chapters are the ones most likely to be seen again
+        for row in rows[-self.RECENT_SIZE:]:
+            self._add_recent(row['chapter_identifier'])
+
+        if rows:
+            self._last_chapter_id = max(self._last_chapter_id, rows[-1]['chapter_id'])
+
+
+_known_chapters: dict[int, KnownChapters] = {}
+_known_chapters_lock = threading.Lock()
+_known_chapters_enabled = threading.Event()
+
+
+def get_known_chapters(service_id: int) -> KnownChapters:
+    """
+    Get the process wide known chapters cache of a service
+    """
+    with _known_chapters_lock:
+        known = _known_chapters.get(service_id)
+        if known is None:
+            known = KnownChapters(service_id)
+            _known_chapters[service_id] = known
+
+        return known
+
+
+def known_chapters_enabled() -> bool:
+    return _known_chapters_enabled.is_set()
+
+
+def set_known_chapters_enabled(enabled: bool) -> None:
+    """
+    Enables or disables the known chapters caches and drops all cached chapters.
+    Must only be enabled while chapters removed from the database are cleared with clear_known_chapters.
+    """
+    with _known_chapters_lock:
+        if enabled:
+            _known_chapters_enabled.set()
+        else:
+            _known_chapters_enabled.clear()
+        _known_chapters.clear()
+
+
+def clear_known_chapters(service_id: int | None = None) -> None:
+    """
+    Drops the cached chapters of the given service or all services.
+    The cache is rebuilt from the database on the next use.
+    """
+    with _known_chapters_lock:
+        if service_id is None:
+            _known_chapters.clear()
+        else:
+            _known_chapters.pop(service_id, None)
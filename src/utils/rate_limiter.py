@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from src.db.models.services import ServiceConfig
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter.
+    Allows `rate` requests per `period` with bursts of up to `rate` requests.
+    Waiting callers reserve their token in advance, so they are served in the order they arrived.
+    """
+
+    def __init__(self, rate: int, period: timedelta):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._period = period
+        self._tokens = float(rate)
+        self._last_refill = time.monotonic()
+
+    @property
+    def rate(self) -> int:
+        return self._rate
+
+    @property
+    def period(self) -> timedelta:
+        return self._period
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self._rate / self._period.total_seconds()
+
+    def configure(self, rate: int, period: timedelta) -> None:
+        """
+        Changes the rate of the bucket. Reserved tokens are kept.
+        """
+        with self._lock:
+            self._refill()
+            self._rate = rate
+            self._period = period
+            self._tokens = min(self._tokens, float(rate))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self._rate), self._tokens + (now - self._last_refill) * self.tokens_per_second
+        )
+        self._last_refill = now
+
+    def reserve(self) -> float:
+        """
+        Reserves a token from the bucket.
+
+        Returns:
+            The amount of seconds the caller must wait before using the reserved token
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0
+
+            return -self._tokens / self.tokens_per_second
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available
+        """
+        if delay := self.reserve():
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """
+        Waits until a token is available without blocking the event loop
+        """
+        if delay := self.reserve():
+            await asyncio.sleep(delay)
+
+
+_service_limiters: dict[int, TokenBucket] = {}
+_service_limiters_lock = threading.Lock()
+
+
+def get_service_rate_limiter(config: ServiceConfig) -> TokenBucket:
+    """
+    Get the process wide rate limiter of a service.
+    The limiter is shared between all scrapers and threads of the service.
+    Changes to the service config are applied to the existing limiter.
+    """
+    with _service_limiters_lock:
+        limiter = _service_limiters.get(config.service_id)
+        if limiter is None:
+            limiter = TokenBucket(config.rate_limit, config.rate_limit_period)
+            _service_limiters[config.service_id] = limiter
+        elif (
+            limiter.rate != config.rate_limit
+            or limiter.period != config.rate_limit_period
+        ):
+            limiter.configure(config.rate_limit, config.rate_limit_period)
+
+        return limiter